@@ -0,0 +1,204 @@
+# benchmarks/load.py
+"""
+End-to-end load tests with a closed-loop client: `concurrency` workers each
+send their next request as soon as the previous one returns.
+
+Targets:
+    asgi     the FastAPI app in-process through httpx.ASGITransport (no server, no sockets)
+    http     the FastAPI app behind uvicorn on a local port
+    gateway  the Django gateway on a local threaded WSGI server, calling the FastAPI app over HTTP
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from socketserver import ThreadingMixIn
+from typing import Awaitable, Callable
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import httpx
+
+from benchmarks.stats import summarize
+from benchmarks.stubs import TEXT_FIXTURES, tone_wav
+
+GATEWAY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "backendRiff", "backendRiffRoot")
+GATEWAY_USER = ("bench", "bench-password")
+
+AUDIO_FIXTURE = tone_wav(3.0)
+
+
+async def run_load(send: Callable[[int], Awaitable[httpx.Response]], concurrency: int, requests: int) -> dict:
+    """Send `requests` requests from `concurrency` workers and summarize latency and throughput."""
+    latencies, errors = [], 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await send(index)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {**summarize(latencies, time.perf_counter() - started, errors), "concurrency": concurrency}
+
+
+# ------------------------ #
+# Scenarios                #
+# ------------------------ #
+def _text(index: int) -> str:
+    # Unique per request so the analysis cache doesn't turn the run into a cache benchmark
+    return f"{TEXT_FIXTURES[index % len(TEXT_FIXTURES)]} #{index}"
+
+
+def _ip(index: int) -> str:
+    # 256 distinct addresses: mostly IP-cache hits after the first round, like returning users
+    return f"203.0.113.{index % 256}"
+
+
+def fastapi_scenarios(client: httpx.AsyncClient) -> dict:
+    return {
+        "analyze_text": lambda i: client.post("/user_input/analyze_text", json={"text": _text(i)}),
+        "analyze_audio": lambda i: client.post(
+            "/user_input/analyze_audio", files={"file": ("clip.wav", AUDIO_FIXTURE, "audio/wav")}),
+        "geoip": lambda i: client.get("/geoip/", params={"ip": _ip(i)}),
+    }
+
+
+def gateway_scenarios(client: httpx.AsyncClient) -> dict:
+    return {
+        "analyze_text": lambda i: client.post("/api/analyze_text/", json={"text": _text(i)}),
+        "analyze_audio": lambda i: client.post(
+            "/api/analyze_audio/", files={"file": ("clip.wav", AUDIO_FIXTURE, "audio/wav")}),
+        "geoip": lambda i: client.get("/api/fetch_geoip/", headers={"X-Forwarded-For": _ip(i)}),
+        "spotify_profile": lambda i: client.get("/api/auth/profile/", headers={"Authorization": f"Bearer bench-{i % 64}"}),
+    }
+
+
+# ------------------------ #
+# Servers                  #
+# ------------------------ #
+class FastAPIServer:
+    """uvicorn in a background thread, sharing this process's stubs and patched URLs."""
+
+    def __init__(self, app):
+        import uvicorn
+
+        self.config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(self.config)
+        self.thread = threading.Thread(target=self.server.run, name="bench-uvicorn", daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class GatewayServer:
+    """
+    The Django gateway on a threaded WSGI server with a throwaway SQLite
+    database and one benchmark user (HTTP Basic auth, fast hasher).
+    """
+
+    def __init__(self, fastapi_url: str, upstreams_url: str):
+        self.fastapi_url = fastapi_url
+        self.upstreams_url = upstreams_url
+        self.db_dir = tempfile.TemporaryDirectory()
+
+    def __enter__(self) -> str:
+        # Read by api_gateway at import time, so set before Django loads it
+        os.environ["USER_INPUT_API_URL"] = f"{self.fastapi_url}/user_input/"
+        os.environ["GEOIP_API_URL"] = f"{self.fastapi_url}/geoip/"
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backendRiffRoot.settings")
+        sys.path.insert(0, GATEWAY_DIR)
+
+        import django
+        from django.conf import settings
+
+        settings.DATABASES["default"]["NAME"] = os.path.join(self.db_dir.name, "bench.sqlite3")
+        # Basic auth re-hashes the password on every request; don't benchmark PBKDF2
+        settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+        django.setup()
+
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.core.wsgi import get_wsgi_application
+        from userauth import views as userauth_views
+
+        call_command("migrate", verbosity=0)
+        User.objects.create_user(*GATEWAY_USER)
+        userauth_views.SPOTIFY_PROFILE_URL = f"{self.upstreams_url}/spotify/v1/me"
+        userauth_views.SPOTIFY_TOKEN_URL = f"{self.upstreams_url}/spotify/api/token"
+
+        self.server = make_server("127.0.0.1", 0, get_wsgi_application(), server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="bench-gateway", daemon=True)
+        self.thread.start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        self.db_dir.cleanup()
+
+
+# ------------------------ #
+# Runner                   #
+# ------------------------ #
+async def _run_scenarios(scenarios: dict, selected: list[str] | None, concurrency: int, requests: int) -> dict:
+    results = {}
+    for name, send in scenarios.items():
+        if selected and name not in selected:
+            continue
+        await run_load(send, concurrency, min(requests, 2 * concurrency))  # Warm pools and caches
+        results[name] = await run_load(send, concurrency, requests)
+    return results
+
+
+async def run_load_suite(targets: list[str], upstreams_url: str, concurrency: int = 16, requests: int = 400,
+                         scenarios: list[str] | None = None) -> dict:
+    from main import app
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+
+    if "asgi" in targets:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+            results["fastapi_asgi"] = await _run_scenarios(fastapi_scenarios(client), scenarios, concurrency, requests)
+
+    if "http" in targets or "gateway" in targets:
+        with FastAPIServer(app) as fastapi_url:
+            if "http" in targets:
+                async with httpx.AsyncClient(base_url=fastapi_url, limits=limits, timeout=60) as client:
+                    results["fastapi_http"] = await _run_scenarios(fastapi_scenarios(client), scenarios, concurrency, requests)
+            if "gateway" in targets:
+                with GatewayServer(fastapi_url, upstreams_url) as gateway_url:
+                    async with httpx.AsyncClient(base_url=gateway_url, limits=limits, auth=GATEWAY_USER, timeout=60) as client:
+                        results["gateway"] = await _run_scenarios(gateway_scenarios(client), scenarios, concurrency, requests)
+    return results
@@ -0,0 +1,52 @@
+# benchmarks/micro.py
+"""Per-stage micro-benchmarks on fixed text and audio fixtures."""
+import time
+from typing import Callable
+
+from benchmarks.stats import summarize
+from benchmarks.stubs import TEXT_FIXTURES, tone_wav
+from services.audio_preprocessing import decode_audio, trim_silence
+from services.encoding import encode_embedding
+
+BATCH_SIZES = (1, 8, 32)
+
+
+def _time(fn: Callable[[], object], repeat: int, warmup: int = 2) -> dict:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+def _batch(size: int) -> list[str]:
+    return [TEXT_FIXTURES[i % len(TEXT_FIXTURES)] for i in range(size)]
+
+
+def run_micro(repeat: int = 20) -> dict:
+    """Time each stage of the analysis path with whichever models are installed."""
+    from services import userinput_service
+
+    registry = userinput_service.model_registry
+    mood, emotion, encoder = registry.get("mood"), registry.get("emotion"), registry.get("intent_context")
+    audio = tone_wav(5.0)
+    samples = decode_audio(audio)
+    trimmed = trim_silence(samples)
+    embedding = encoder.encode(_batch(1), batch_size=1, convert_to_numpy=True)[0]
+
+    results = {
+        "audio_decode/5s_wav": _time(lambda: decode_audio(audio), repeat),
+        "vad/5s": _time(lambda: trim_silence(samples), repeat),
+        "whisper/5s": _time(lambda: userinput_service.transcribe_samples(trimmed), max(3, repeat // 4), warmup=1),
+        "encode_embedding/float16": _time(lambda: encode_embedding(embedding, "float16"), repeat),
+    }
+    for size in BATCH_SIZES:
+        texts = _batch(size)
+        results[f"mood/batch_{size}"] = _time(lambda: mood(texts, batch_size=len(texts)), repeat)
+        results[f"emotion/batch_{size}"] = _time(lambda: emotion(texts, batch_size=len(texts)), repeat)
+        results[f"embedding/batch_{size}"] = _time(lambda: encoder.encode(texts, batch_size=len(texts), convert_to_numpy=True), repeat)
+        results[f"analyze_texts_batch/batch_{size}"] = _time(lambda: userinput_service.analyze_texts_batch(texts), repeat)
+    return results
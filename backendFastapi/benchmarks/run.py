@@ -0,0 +1,124 @@
+# benchmarks/run.py
+"""
+Benchmark suite entry point. Runs offline: ipwho.is, Open-Meteo and Spotify
+are served by a local stub server, and `--models stub` swaps the ML models
+for tiny stubs with a fixed cost (the default; `--models real` loads the
+configured models, CPU is fine).
+
+From backendFastapi/:
+    python -m benchmarks.run micro --out micro.json
+    python -m benchmarks.run load --targets asgi,http,gateway --concurrency 16 --requests 400 --out load.json
+    python -m benchmarks.run all --out run.json
+    python -m benchmarks.run compare base.json run.json --threshold 0.10   # exit 1 on regression
+
+Results are JSON: p50/p95/p99/mean/max latency in ms and throughput per benchmark.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Benchmarks measure the service, not the caches in front of it; opt back in with BENCH_KEEP_CACHE=True
+if os.getenv("BENCH_KEEP_CACHE", "False") != "True":
+    os.environ["CACHE_ENABLED"] = "False"
+# Stubs are loaded explicitly; don't also start a background warmup of the real models
+os.environ.setdefault("WARMUP_ON_STARTUP", "False")
+
+from benchmarks.stats import compare, format_comparison
+from benchmarks.stubs import StubUpstreams, install_real_models, install_stub_models
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(args) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "models": args.models,
+        "upstream_latency_ms": args.upstream_latency_ms,
+    }
+
+
+def run(args) -> dict:
+    results = {"meta": _meta(args)}
+    if args.models == "stub":
+        install_stub_models()
+    else:
+        install_real_models()
+
+    upstreams = StubUpstreams(latency=args.upstream_latency_ms / 1000).start()
+    upstreams.point_services_at()
+    try:
+        if args.command in ("micro", "all"):
+            from benchmarks.micro import run_micro
+            results["micro"] = run_micro(repeat=args.repeat)
+        if args.command in ("load", "all"):
+            from benchmarks.load import run_load_suite
+            results["load"] = asyncio.run(run_load_suite(
+                targets=args.targets.split(","),
+                upstreams_url=upstreams.url,
+                concurrency=args.concurrency,
+                requests=args.requests,
+                scenarios=args.scenarios.split(",") if args.scenarios else None,
+            ))
+    finally:
+        upstreams.stop()
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Riff AI benchmark and load-test suite")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("micro", "load", "all"):
+        sub = subcommands.add_parser(name)
+        sub.add_argument("--models", choices=["stub", "real"], default="stub")
+        sub.add_argument("--out", help="Write results JSON here (default: stdout)")
+        sub.add_argument("--upstream-latency-ms", type=float, default=20.0, help="Delay added by the stub upstreams")
+        sub.add_argument("--repeat", type=int, default=20, help="Timed calls per micro-benchmark")
+        sub.add_argument("--targets", default="asgi,http,gateway", help="Comma-separated: asgi, http, gateway")
+        sub.add_argument("--scenarios", default="", help="Comma-separated subset, e.g. analyze_text,geoip")
+        sub.add_argument("--concurrency", type=int, default=16)
+        sub.add_argument("--requests", type=int, default=400, help="Requests per scenario")
+
+    compare_parser = subcommands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    compare_parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        report = compare(base, new, args.threshold)
+        print(json.dumps(report, indent=2) if args.json else format_comparison(report))
+        return 1 if report["regressions"] else 0
+
+    results = run(args)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
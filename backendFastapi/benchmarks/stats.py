@@ -0,0 +1,76 @@
+# benchmarks/stats.py
+import numpy as np
+
+# Metrics where a higher value is worse; throughput is the only "higher is better" figure
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms")
+
+
+def summarize(latencies: list[float], elapsed: float | None = None, errors: int = 0) -> dict:
+    """Latency percentiles in milliseconds, plus throughput when the wall time is known."""
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    summary = {"count": len(latencies), "errors": errors}
+    if len(values):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary.update({
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(values.mean()), 3),
+            "max_ms": round(float(values.max()), 3),
+        })
+    if elapsed:
+        summary["throughput_rps"] = round(len(latencies) / elapsed, 2)
+    return summary
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    """{"micro": {"mood/batch_8": {...}}} -> {"micro.mood/batch_8": {...}} for every leaf summary."""
+    flat = {}
+    for key, value in results.items():
+        if key == "meta" or not isinstance(value, dict):
+            continue
+        name = f"{prefix}.{key}" if prefix else key
+        if "count" in value:
+            flat[name] = value
+        else:
+            flat.update(_flatten(value, name))
+    return flat
+
+
+def compare(base: dict, new: dict, threshold: float = 0.10) -> dict:
+    """
+    Relative change of every latency figure and of throughput between two runs.
+    A change worse than `threshold` (0.10 = 10%) counts as a regression.
+    """
+    base_flat, new_flat = _flatten(base), _flatten(new)
+    rows, regressions = [], []
+    for name in sorted(base_flat.keys() & new_flat.keys()):
+        before, after = base_flat[name], new_flat[name]
+        for key in (*LATENCY_KEYS, "throughput_rps"):
+            if not before.get(key) or key not in after:
+                continue
+            change = (after[key] - before[key]) / before[key]
+            worse = change > threshold if key != "throughput_rps" else change < -threshold
+            row = {"benchmark": name, "metric": key, "base": before[key], "new": after[key], "change": round(change, 4)}
+            rows.append(row)
+            if worse:
+                regressions.append(row)
+    return {
+        "threshold": threshold,
+        "compared": rows,
+        "regressions": regressions,
+        "only_in_base": sorted(base_flat.keys() - new_flat.keys()),
+        "only_in_new": sorted(new_flat.keys() - base_flat.keys()),
+    }
+
+
+def format_comparison(report: dict) -> str:
+    lines = [f"{'benchmark':<44} {'metric':<15} {'base':>10} {'new':>10} {'change':>8}"]
+    regressed = {(r["benchmark"], r["metric"]) for r in report["regressions"]}
+    for row in report["compared"]:
+        flag = "  REGRESSION" if (row["benchmark"], row["metric"]) in regressed else ""
+        lines.append(
+            f"{row['benchmark']:<44} {row['metric']:<15} {row['base']:>10.2f} {row['new']:>10.2f} {row['change'] * 100:>7.1f}%{flag}"
+        )
+    lines.append(f"{len(report['regressions'])} regression(s) beyond {report['threshold'] * 100:.0f}%")
+    return "\n".join(lines)
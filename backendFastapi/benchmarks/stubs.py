@@ -0,0 +1,194 @@
+# benchmarks/stubs.py
+"""
+Offline stand-ins for the benchmark suite: tiny stub models with a fixed,
+input-size-proportional cost, and one local HTTP server that answers for
+ipwho.is, Open-Meteo and the Spotify Web API.
+"""
+import hashlib
+import io
+import json
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from services.audio_preprocessing import SAMPLE_RATE
+from services.model_registry import ModelRegistry
+from services.onnx_backend import SAMPLE_TEXTS
+
+# Mixed lengths on purpose, so batching and padding behave like real traffic
+TEXT_FIXTURES = SAMPLE_TEXTS + [
+    "I had the longest day at work and honestly I just want to lie on the floor and listen to something slow and warm",
+    "road trip with the windows down, sun is out, need songs everyone in the car can scream along to",
+    " ".join(["I keep thinking about how this year went and what comes next"] * 6),
+]
+
+
+def tone_wav(seconds: float, freq: float = 220.0) -> bytes:
+    """Mono 16 kHz PCM16 tone with a silent second on each side, so VAD has work to do."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    samples = np.concatenate([np.zeros(SAMPLE_RATE), 0.5 * np.sin(2 * np.pi * freq * t), np.zeros(SAMPLE_RATE)])
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((samples * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+# ------------------------ #
+# Stub Models              #
+# ------------------------ #
+class StubWhisper:
+    """Costs `realtime_factor` seconds per second of audio."""
+
+    def __init__(self, realtime_factor: float = 0.02):
+        self.realtime_factor = realtime_factor
+
+    def transcribe(self, samples, **options):
+        time.sleep(len(samples) / SAMPLE_RATE * self.realtime_factor)
+        return {"text": "play something upbeat for my morning run"}
+
+
+class StubClassifier:
+    """Pipeline-shaped callable: fixed overhead per call plus a per-text cost."""
+
+    def __init__(self, labels: list[str], top_k_all: bool = False, call_seconds: float = 0.002, text_seconds: float = 0.0005):
+        self.labels = labels
+        self.top_k_all = top_k_all
+        self.call_seconds = call_seconds
+        self.text_seconds = text_seconds
+
+    def __call__(self, texts, **kwargs):
+        time.sleep(self.call_seconds + self.text_seconds * len(texts))
+        results = []
+        for text in texts:
+            label = self.labels[len(text) % len(self.labels)]
+            if self.top_k_all:
+                results.append([{"label": name, "score": 0.9 if name == label else 0.02} for name in self.labels])
+            else:
+                results.append({"label": label, "score": 0.9})
+        return results
+
+
+class StubEncoder:
+    """Deterministic 768-d unit vectors derived from the text."""
+
+    def __init__(self, call_seconds: float = 0.002, text_seconds: float = 0.0005):
+        self.call_seconds = call_seconds
+        self.text_seconds = text_seconds
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        time.sleep(self.call_seconds + self.text_seconds * len(texts))
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(768))
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def install_stub_models() -> ModelRegistry:
+    """Swap the service's model registry for loaded stub models."""
+    from services import userinput_service
+
+    registry = ModelRegistry()
+    registry.register("whisper", StubWhisper, version="stub")
+    registry.register("mood", lambda: StubClassifier(["negative", "neutral", "positive"]), version="stub")
+    registry.register("emotion", lambda: StubClassifier(["joy", "sadness", "anger", "neutral"], top_k_all=True), version="stub")
+    registry.register("intent_context", StubEncoder, version="stub")
+    registry.warmup()
+    userinput_service.model_registry = registry
+    return registry
+
+
+def install_real_models() -> ModelRegistry:
+    """Load the configured models up front so load time never counts as request latency."""
+    from services import userinput_service
+
+    userinput_service.model_registry.warmup()
+    return userinput_service.model_registry
+
+
+# ------------------------ #
+# Stub Upstreams           #
+# ------------------------ #
+class StubUpstreams(ThreadingHTTPServer):
+    """
+    One local server for every third-party API, by path prefix:
+        /ipwho/<ip>              ipwho.is
+        /open-meteo/v1/forecast  Open-Meteo
+        /spotify/v1/me           Spotify profile
+        /spotify/api/token       Spotify token exchange
+    Every response waits `latency` seconds to stand in for the network.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.02):
+        super().__init__(("127.0.0.1", 0), _UpstreamHandler)
+        self.latency = latency
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StubUpstreams":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-upstreams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def point_services_at(self) -> None:
+        """Redirect the FastAPI service's upstream URLs to this server."""
+        from services import geoip_service
+
+        geoip_service.IPWHO_URL = f"{self.url}/ipwho/"
+        geoip_service.OPEN_METEO_URL = f"{self.url}/open-meteo/v1/forecast"
+
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, body: dict, status: int = 200) -> None:
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path.startswith("/ipwho/"):
+            self._respond({
+                "success": True, "latitude": 40.7, "longitude": -74.0,
+                "country": "United States", "region": "New York", "timezone": {"offset": -14400},
+            })
+        elif path == "/open-meteo/v1/forecast":
+            self._respond({"current_weather": {"weathercode": 3}})
+        elif path == "/spotify/v1/me":
+            self._respond({"id": "bench-user", "display_name": "Bench User"})
+        else:
+            self._respond({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlsplit(self.path).path == "/spotify/api/token":
+            self._respond({"access_token": "bench-access", "refresh_token": "bench-refresh", "expires_in": 3600})
+        else:
+            self._respond({"error": "not found"}, status=404)
@@ -1,16 +1,90 @@
 # main.py
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from services.geoip_service import geoip_router
-from services.userinput_service import input_router
+from services import userinput_service
+from services.userinput_service import input_router, model_registry
+from services.streaming_service import stream_router
+from services.recommend_service import load_song_index, recommend_router, song_index_status
+from services.admission import EarlyRejectMiddleware, Overloaded
+from services.executor import shutdown_executors
+from services.http_client import http_client
+from services.metrics import MetricsMiddleware, registry as metrics_registry
+from services.config import WARMUP_ON_STARTUP, METRICS_ENABLED, SERVER_TIMING_ENABLED, ADMISSION_ENABLED
 """from services.ai_model_service import ai_model_router"""
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+def start_warmup() -> dict[str, asyncio.Future]:
+    """
+    Load enabled models and open the song index in the background; /ready
+    reports 503 until the models are in. Failures are logged when they happen.
+    """
+    loop = asyncio.get_running_loop()
+    loads = {"models": loop.run_in_executor(None, model_registry.warmup), "song_index": loop.run_in_executor(None, load_song_index)}
+    for name, future in loads.items():
+        future.add_done_callback(lambda done, name=name: _log_warmup_failure(name, done))
+    return loads
+
+def _log_warmup_failure(name: str, future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Startup warmup of %s failed", name, exc_info=future.exception())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Kept on the app so the loads aren't orphaned and can be awaited if needed
+    app.state.warmup = start_warmup() if WARMUP_ON_STARTUP else {}
+    yield
+    await http_client.aclose()
+    shutdown_executors()
+    if userinput_service.analysis_cache.store is not None:
+        # Commit queued cache writes before the process exits
+        userinput_service.analysis_cache.store.close()
+
+app = FastAPI(lifespan=lifespan)
+if ADMISSION_ENABLED:
+    # Full lanes are shed before the body is read; getters so swapped-in lanes are picked up
+    app.add_middleware(EarlyRejectMiddleware, lanes={
+        "/user_input/analyze_audio": lambda: userinput_service.audio_lane,
+        "/user_input/analyze_text": lambda: userinput_service.text_lane,
+    })
+if METRICS_ENABLED or SERVER_TIMING_ENABLED:
+    app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING_ENABLED)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    # Shed load right away; clients and load balancers back off for Retry-After seconds
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
 
 # Registering the routers
 app.include_router(geoip_router, prefix="/geoip", tags=["GeoIP"])
 app.include_router(input_router, prefix="/user_input", tags=["User Input"])
+app.include_router(stream_router, prefix="/user_input", tags=["User Input"])
+app.include_router(recommend_router, prefix="/recommend", tags=["Recommendation"])
 """app.include_router(ai_model_router, prefix="/ai_model", tags=["AI Model"])"""
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the playlist generator API!"}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once every enabled model is loaded, 503 otherwise.
+    The song index is reported too, but opens on first use if it isn't yet.
+    """
+    ready = model_registry.is_ready()
+    body = {"ready": ready, "models": model_registry.status(), "song_index": song_index_status()}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """
+        Prometheus scrape endpoint: stage/request/upstream latency histograms,
+        batch sizes, queue depths, model load times and cache hit ratios.
+        """
+        return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,80 @@
+# serve.py
+"""
+Multi-worker entry point that loads the models once and shares them across
+worker processes (see services/prefork.py).
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8001
+
+Workers default to SERVE_WORKERS and torch threads per worker to
+SERVE_THREADS_PER_WORKER (0 = cores / workers, so workers don't oversubscribe
+the CPU). `uvicorn main:app` still works for single-process runs.
+"""
+import argparse
+import logging
+import sys
+
+from services.config import INFERENCE_BACKEND, SERVE_WORKERS, SERVE_THREADS_PER_WORKER
+from services.prefork import PreforkSupervisor, bind_socket, limit_worker_threads, preload_models, threads_per_worker
+
+logger = logging.getLogger("serve")
+
+
+def shared_model_names(whisper_models: list[str]) -> list[str]:
+    """Models that are safe to load before forking on this deployment."""
+    if INFERENCE_BACKEND == "onnx":
+        return whisper_models  # ORT sessions are not fork-safe; text models load per worker
+    return [*whisper_models, "mood", "emotion", "intent_context"]
+
+
+def cuda_available() -> bool:
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the Riff AI API with pre-forked workers sharing model weights")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--threads-per-worker", type=int, default=SERVE_THREADS_PER_WORKER)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(name)s %(levelname)s %(message)s")
+
+    workers = args.workers
+    if workers > 1 and cuda_available():
+        logger.warning("CUDA contexts can't be shared across fork; serving with a single worker")
+        workers = 1
+
+    from services.userinput_service import WHISPER_MODELS, model_registry
+
+    loaded = preload_models(model_registry, shared_model_names(WHISPER_MODELS))
+    logger.info(f"Preloaded in the parent: {loaded or 'nothing'}")
+
+    # Imported after preloading so the app sees loaded models and lifespan warmup has nothing left to do
+    import uvicorn
+    from main import app
+
+    sock = bind_socket(args.host, args.port)
+    threads = threads_per_worker(workers, args.threads_per_worker)
+
+    def run_worker():
+        limit_worker_threads(threads)
+        config = uvicorn.Config(app, log_level=args.log_level)
+        uvicorn.Server(config).run(sockets=[sock])
+
+    if workers == 1:
+        run_worker()
+        return 0
+
+    logger.info(f"Serving on {args.host}:{args.port} with {workers} workers x {threads} threads")
+    PreforkSupervisor(run_worker, workers).run()
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# services/admission.py
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Callable
+
+from starlette.responses import JSONResponse
+
+
+class Overloaded(Exception):
+    """Raised when a lane's queue is full; the request should be retried after `retry_after` seconds."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"The {lane} queue is full, retry in {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class AdmissionLane:
+    """
+    Bounded admission for one workload class.
+
+    Up to `max_concurrent` requests run at once and up to `max_queue` more
+    wait in FIFO order; anything beyond that is rejected right away with
+    `Overloaded` instead of queueing until the client times out. Lanes are
+    independent, so a burst in one class never takes slots from another.
+    The retry hint is the time the current queue needs to drain, based on a
+    moving average of how long admitted requests hold their slot.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, expected_seconds: float = 1.0):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max(0, max_queue)
+        self.service_seconds = expected_seconds
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.degraded = 0
+        self._degraded_lock = threading.Lock()
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _ensure_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the running loop, so (re)create lazily like MicroBatcher's queue
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self.active = self.waiting = 0
+        return self._semaphore
+
+    @property
+    def is_full(self) -> bool:
+        return self.active >= self.max_concurrent and self.waiting >= self.max_queue
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil((self.waiting + 1) * self.service_seconds / self.max_concurrent))
+
+    @asynccontextmanager
+    async def admit(self):
+        semaphore = self._ensure_semaphore()
+        if self.is_full:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            semaphore.release()
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * (time.monotonic() - started)
+
+    def count_degraded(self) -> None:
+        """Record a request served at reduced quality; safe to call from worker threads."""
+        with self._degraded_lock:
+            self.degraded += 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "degraded": self.degraded,
+            "service_seconds": round(self.service_seconds, 4),
+        }
+
+
+class EarlyRejectMiddleware:
+    """
+    Sheds requests for a full lane before the endpoint reads their body, so
+    a rejected upload isn't received and spooled first (FastAPI parses form
+    bodies before dependencies run). `admit()` stays the authoritative check.
+    `lanes` maps request paths to a getter for their lane.
+    """
+
+    def __init__(self, app, lanes: dict[str, Callable[[], AdmissionLane]]):
+        self.app = app
+        self.lanes = lanes
+
+    async def __call__(self, scope, receive, send):
+        get_lane = self.lanes.get(scope["path"]) if scope["type"] == "http" else None
+        if get_lane is not None:
+            lane = get_lane()
+            if lane.is_full:
+                lane.rejected += 1
+                error = Overloaded(lane.name, lane.retry_after())
+                response = JSONResponse({"detail": str(error)}, status_code=503, headers={"Retry-After": str(error.retry_after)})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
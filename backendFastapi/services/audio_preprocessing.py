@@ -0,0 +1,126 @@
+# services/audio_preprocessing.py
+import io
+import subprocess
+import wave
+
+import numpy as np
+
+from services.config import AUDIO_DECODE_TIMEOUT_S, VAD_THRESHOLD_DB, VAD_MIN_SILENCE_MS, VAD_PADDING_MS
+
+SAMPLE_RATE = 16000  # Whisper expects 16 kHz mono float32
+FRAME_MS = 30
+# Absolute floor so near-digital-silence is never treated as speech (dBFS)
+SILENCE_FLOOR_DB = -60.0
+
+
+class AudioDecodeError(ValueError):
+    """Raised when an upload cannot be decoded into audio samples."""
+
+
+# ------------------------ #
+# Decoding                 #
+# ------------------------ #
+def _decode_wav(audio_bytes: bytes) -> np.ndarray | None:
+    """Fast path for 16 kHz PCM WAV; returns None for anything that needs resampling."""
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getsampwidth() != 2:
+                return None
+            channels = wav.getnchannels()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _decode_ffmpeg(audio_bytes: bytes, timeout: float = AUDIO_DECODE_TIMEOUT_S) -> np.ndarray:
+    """Decode any ffmpeg-supported format through pipes, without touching disk."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+    try:
+        result = subprocess.run(cmd, input=audio_bytes, capture_output=True, check=True, timeout=timeout)
+    except FileNotFoundError as e:
+        raise AudioDecodeError("ffmpeg is not installed") from e
+    except subprocess.TimeoutExpired as e:
+        raise AudioDecodeError(f"Decoding audio took longer than {timeout:g}s") from e
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore').strip()}") from e
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio(audio_bytes: bytes) -> np.ndarray:
+    """Decode an uploaded clip into a 16 kHz mono float32 array."""
+    if not audio_bytes:
+        raise AudioDecodeError("Empty audio upload")
+    samples = _decode_wav(audio_bytes)
+    if samples is None:
+        samples = _decode_ffmpeg(audio_bytes)
+    return samples
+
+
+# ------------------------ #
+# Voice Activity Detection #
+# ------------------------ #
+def _speech_frames(samples: np.ndarray, frame_len: int, threshold_db: float) -> np.ndarray:
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1) + 1e-12)
+    level_db = 20 * np.log10(rms)
+    # Relative to the loud end of the clip, so gain differences between microphones don't matter
+    reference_db = np.percentile(level_db, 95)
+    return level_db > max(reference_db - threshold_db, SILENCE_FLOOR_DB)
+
+
+def trim_silence(
+    samples: np.ndarray,
+    threshold_db: float = VAD_THRESHOLD_DB,
+    min_silence_ms: int = VAD_MIN_SILENCE_MS,
+    padding_ms: int = VAD_PADDING_MS,
+) -> np.ndarray:
+    """
+    Energy-based VAD: drop leading/trailing silence and shorten inner pauses
+    longer than `min_silence_ms` to `padding_ms` on either side of speech.
+    Returns an empty array if no speech is found.
+    """
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    if len(samples) < frame_len:
+        return samples
+
+    speech = _speech_frames(samples, frame_len, threshold_db)
+    if not speech.any():
+        return samples[:0]
+
+    pad = padding_ms // FRAME_MS
+    min_gap = min_silence_ms // FRAME_MS
+
+    # Frame indices of each speech run start/end
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # Merge runs separated by short pauses, which are kept as-is
+    segments = [[starts[0], ends[0]]]
+    for start, end in zip(starts[1:], ends[1:]):
+        if start - segments[-1][1] < min_gap:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end])
+
+    # Pad each run, merging runs whose padding overlaps so no audio is repeated
+    n_frames = len(speech)
+    ranges = []
+    for start, end in segments:
+        first, last = max(start - pad, 0), min(end + pad, n_frames)
+        if ranges and first <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], last)
+        else:
+            ranges.append([first, last])
+    return np.concatenate([samples[first * frame_len:last * frame_len] for first, last in ranges])
@@ -0,0 +1,117 @@
+# services/batching.py
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Sequence
+
+from services.metrics import BATCH_SIZE, request_timings, timings_for
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item requests into batches.
+
+    Callers `await submit(item)`; items are queued and flushed to `batch_fn`
+    once `max_batch_size` items are waiting or the oldest item has waited
+    `max_wait_ms`. `batch_fn` takes a list of items and must return a list of
+    results in the same order. Each result (or the batch's exception) is
+    routed back to the caller that submitted the item.
+
+    If `runner` is given, `batch_fn` is executed through it (e.g. on an
+    inference thread pool) instead of on the event loop, and up to
+    `max_concurrent_batches` batches may be in flight at once.
+
+    Batches of a named batcher are recorded in the `riff_batch_size` histogram.
+    Stages timed inside `batch_fn` are added to the Server-Timing of every
+    request in the batch.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        runner: Callable[..., Awaitable[Any]] | None = None,
+        max_concurrent_batches: int = 1,
+        name: str | None = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.runner = runner
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.name = name
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        # The queue and worker are bound to the running loop, so (re)create them lazily
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            # Start the worker in an empty context so it doesn't hold on to the first caller's request state
+            self._worker = contextvars.Context().run(loop.create_task, self._run())
+        return self._queue
+
+    async def submit(self, item: Any) -> Any:
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((item, future, request_timings()))
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self) -> list:
+        queue = self._queue
+        batch = [await queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _process(self, batch: list) -> None:
+        items = [item for item, _, _ in batch]
+        if self.name is not None:
+            BATCH_SIZE.observe(len(items), self.name)
+        try:
+            with timings_for([timings for _, _, timings in batch]):
+                results = await self._call_batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} inputs")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _call_batch_fn(self, items: list) -> Sequence[Any]:
+        if self.runner is not None:
+            return await self.runner(self.batch_fn, items)
+        return self.batch_fn(items)
+
+    async def _run(self) -> None:
+        slots = asyncio.Semaphore(self.max_concurrent_batches)
+        in_flight = set()
+        while True:
+            # Wait for a free slot first so the queue keeps filling while all slots are busy
+            await slots.acquire()
+            batch = await self._collect()
+            task = asyncio.create_task(self._process(batch))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            task.add_done_callback(lambda _: slots.release())
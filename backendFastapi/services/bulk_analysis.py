@@ -0,0 +1,273 @@
+# services/bulk_analysis.py
+"""
+Offline mood / emotion / embedding analysis for large text corpora.
+
+Runs the same models and `analyze_texts_batch` as /user_input/analyze_text,
+without HTTP. Input is JSONL with one utterance per line. Texts are read in
+windows, sorted by length and cut into batches so each forward pass pads as
+little as possible, and batches are spread over a process pool.
+
+Output formats:
+    npy      OUT.npy (N x 768 float32 embeddings) + OUT.jsonl (id, mood, emotion per row)
+    parquet  OUT.parquet with id, mood, emotion and embedding columns (needs pyarrow)
+
+    python -m services.bulk_analysis utterances.jsonl OUT [--format npy|parquet] [--workers 4]
+    cat utterances.jsonl | python -m services.bulk_analysis - OUT
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from services.prefork import limit_worker_threads
+
+_analyze = None
+
+
+# ------------------------ #
+# Input                    #
+# ------------------------ #
+def read_records(path: str, text_field: str = "text", id_field: str = "id") -> Iterator[tuple[str, str]]:
+    """Yield (id, text); records without an ID are numbered by line."""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        for line_number, line in enumerate(stream):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get(id_field, line_number)), str(record.get(text_field) or "")
+
+
+def length_bucketed_batches(records: Iterable[tuple[str, str]], batch_size: int, window: int) -> Iterator[list[tuple[str, str]]]:
+    """
+    Read `window` records at a time, sort them by length and cut them into
+    batches, so texts of similar length share a batch. Memory stays bounded
+    by the window; order across the output is by batch, not by input.
+    """
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, window))
+        if not chunk:
+            return
+        chunk.sort(key=lambda record: len(record[1]))
+        for start in range(0, len(chunk), batch_size):
+            yield chunk[start:start + batch_size]
+
+
+# ------------------------ #
+# Worker Processes         #
+# ------------------------ #
+def analyze_with_models(texts: list[str]) -> list[dict]:
+    """Default analyzer: the service's own models and batch function."""
+    from services.userinput_service import FALLBACK_RESULT, NO_SPEECH_TEXT, analyze_texts_batch
+
+    results = [None] * len(texts)
+    real = [i for i, text in enumerate(texts) if text.strip() and text.strip() != NO_SPEECH_TEXT]
+    if real:
+        for i, result in zip(real, analyze_texts_batch([texts[i].strip() for i in real])):
+            results[i] = result
+    return [result if result is not None else dict(FALLBACK_RESULT) for result in results]
+
+
+def _init_worker(analyze: Callable, threads_per_worker: int) -> None:
+    global _analyze
+    # Keep each process to its share of cores instead of every BLAS pool grabbing all of them
+    limit_worker_threads(threads_per_worker)
+    if analyze is analyze_with_models:
+        # Load everything up front rather than on the first batch
+        from services.userinput_service import TEXT_MODELS, model_registry
+        model_registry.warmup(TEXT_MODELS)
+    _analyze = analyze
+
+
+def _analyze_batch(texts: list[str]) -> tuple[list[str], list[str], np.ndarray]:
+    results = _analyze(texts)
+    embeddings = np.stack([np.asarray(r["intent_context_embedding"], dtype=np.float32) for r in results])
+    return [r["mood"] for r in results], [r["emotion"] for r in results], embeddings
+
+
+# ------------------------ #
+# Output Writers           #
+# ------------------------ #
+class NpyAppender:
+    """
+    Streams rows into a .npy file. The header is written with fixed padding
+    and rewritten with the real row count on close, so the file never has to
+    be held in memory or copied.
+    """
+
+    HEADER_BYTES = 128
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "wb")
+        self.rows = 0
+        self.dim = None
+        self.file.write(b"\0" * self.HEADER_BYTES)
+
+    def append(self, rows: np.ndarray) -> None:
+        rows = np.ascontiguousarray(rows, dtype="<f4")
+        self.dim = rows.shape[1] if self.dim is None else self.dim
+        self.file.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (self.rows, self.dim or 0)
+        preamble = b"\x93NUMPY\x01\x00"
+        header_len = self.HEADER_BYTES - len(preamble) - 2
+        header = header.ljust(header_len - 1) + "\n"
+        self.file.seek(0)
+        self.file.write(preamble + header_len.to_bytes(2, "little") + header.encode("latin1"))
+        self.file.close()
+
+
+class NpyJsonlWriter:
+    def __init__(self, prefix: str):
+        self.vectors = NpyAppender(prefix + ".npy")
+        self.rows = open(prefix + ".jsonl", "w", encoding="utf-8")
+
+    def write(self, ids: list[str], moods: list[str], emotions: list[str], embeddings: np.ndarray) -> None:
+        start = self.vectors.rows
+        self.vectors.append(embeddings)
+        self.rows.write("".join(
+            json.dumps({"row": start + i, "id": id_, "mood": mood, "emotion": emotion}) + "\n"
+            for i, (id_, mood, emotion) in enumerate(zip(ids, moods, emotions))
+        ))
+
+    def close(self) -> None:
+        self.vectors.close()
+        self.rows.close()
+
+
+class ParquetWriter:
+    """One row group per batch; embeddings as a fixed-size float32 list column."""
+
+    def __init__(self, prefix: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.pq = pq
+        self.path = prefix if prefix.endswith(".parquet") else prefix + ".parquet"
+        self.writer = None
+
+    def write(self, ids: list[str], moods: list[str], emotions: list[str], embeddings: np.ndarray) -> None:
+        pa = self.pa
+        flat = pa.array(np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1))
+        table = pa.table({
+            "id": pa.array(ids, pa.string()),
+            "mood": pa.array(moods, pa.string()),
+            "emotion": pa.array(emotions, pa.string()),
+            "embedding": pa.FixedSizeListArray.from_arrays(flat, embeddings.shape[1]),
+        })
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+OUTPUT_WRITERS = {"npy": NpyJsonlWriter, "parquet": ParquetWriter}
+
+
+# ------------------------ #
+# Driver                   #
+# ------------------------ #
+def run_bulk_analysis(
+    records: Iterable[tuple[str, str]],
+    out_prefix: str,
+    output_format: str = "npy",
+    analyze: Callable[[list[str]], list[dict]] = analyze_with_models,
+    workers: int = 2,
+    batch_size: int = 64,
+    bucket_window: int | None = None,
+    progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """Analyze every record and stream the results to `out_prefix`; returns throughput stats."""
+    bucket_window = bucket_window or batch_size * workers * 16
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    writer = OUTPUT_WRITERS[output_format](out_prefix)
+    stats = {"rows": 0, "batches": 0, "padding_ratio": 0.0}
+    padded_chars = real_chars = 0
+    started = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(analyze, threads_per_worker)) as pool:
+            batches = length_bucketed_batches(records, batch_size, bucket_window)
+            in_flight = deque()
+
+            def submit_next() -> bool:
+                batch = next(batches, None)
+                if batch is None:
+                    return False
+                texts = [text for _, text in batch]
+                in_flight.append(([id_ for id_, _ in batch], texts, pool.submit(_analyze_batch, texts)))
+                return True
+
+            while len(in_flight) < 2 * workers and submit_next():
+                pass
+
+            while in_flight:
+                ids, texts, future = in_flight.popleft()
+                moods, emotions, embeddings = future.result()
+                writer.write(ids, moods, emotions, embeddings)
+
+                lengths = [len(text) for text in texts]
+                real_chars += sum(lengths)
+                padded_chars += max(lengths) * len(lengths)
+                stats["rows"] += len(ids)
+                stats["batches"] += 1
+                if progress is not None:
+                    elapsed = time.perf_counter() - started
+                    progress({"rows": stats["rows"], "rows_per_second": stats["rows"] / max(elapsed, 1e-9)})
+                submit_next()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["rows"] / max(elapsed, 1e-9), 1)
+    # Share of the batch (in characters) that was padding; bucketing keeps this low
+    stats["padding_ratio"] = round(1 - real_chars / padded_chars, 4) if padded_chars else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run mood/emotion/embedding analysis over a JSONL corpus")
+    parser.add_argument("source", help="JSONL file, or - for stdin")
+    parser.add_argument("out", help="Output prefix (OUT.npy + OUT.jsonl, or OUT.parquet)")
+    parser.add_argument("--format", choices=sorted(OUTPUT_WRITERS), default="npy")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--bucket-window", type=int, default=None, help="Records sorted together by length")
+    args = parser.parse_args()
+
+    last_report = 0.0
+
+    def report(progress_stats):
+        global last_report
+        now = time.perf_counter()
+        if now - last_report >= 1.0:
+            last_report = now
+            print(f"\r{progress_stats['rows']} rows, {progress_stats['rows_per_second']:.0f} rows/s", end="", file=sys.stderr)
+
+    result = run_bulk_analysis(
+        read_records(args.source, args.text_field, args.id_field), args.out,
+        output_format=args.format, workers=args.workers,
+        batch_size=args.batch_size, bucket_window=args.bucket_window, progress=report,
+    )
+    print(file=sys.stderr)
+    print(json.dumps(result))
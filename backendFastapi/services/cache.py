@@ -0,0 +1,271 @@
+# services/cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC, surrounding whitespace stripped and
+    inner whitespace collapsed. Case is kept, since the classifiers are cased.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_cache_key(text: str, model_versions: list[str]) -> str:
+    payload = normalize_text(text) + "\x00" + "\x00".join(model_versions)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """Rough in-memory footprint of a JSON-like value, used for the memory cap."""
+    if isinstance(value, np.ndarray):
+        return 112 + value.nbytes
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(v) for v in value)
+    if isinstance(value, str):
+        return 49 + len(value)
+    return 24
+
+
+def _encode_json(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return {"__ndarray__": value.tolist(), "dtype": str(value.dtype)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_json(value: dict) -> Any:
+    if "__ndarray__" in value:
+        return np.asarray(value["__ndarray__"], dtype=value["dtype"])
+    return value
+
+
+class SQLiteStore:
+    """
+    Small on-disk key/value store so cached results survive restarts.
+
+    Reads block, so async callers run them on an executor. Writes are
+    write-behind: `set` and `delete` only enqueue, and a writer thread applies
+    whatever has queued up in one transaction per commit. `flush` waits for
+    the queue to drain.
+
+    The connection and writer are started on first use in each process:
+    sqlite connections and threads don't survive fork, and serve.py imports
+    the service (creating the store) in the parent before forking its workers.
+    """
+
+    def __init__(self, path: str, max_batch: int = 256):
+        self.path = path
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._writes: queue.Queue | None = None
+        self._writer: threading.Thread | None = None
+        self.commits = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with the lock held
+        if self._pid != os.getpid():
+            # An inherited connection belongs to the parent; leave it alone rather than closing it
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)")
+            self._conn.commit()
+            self._writes = queue.Queue()
+            self._writer = threading.Thread(target=self._write_behind, args=(self._writes,), name="cache-writer", daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _enqueue(self, write: tuple) -> None:
+        with self._lock:
+            self._connection()
+            self._writes.put(write)
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        with self._lock:
+            row = self._connection().execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0], object_hook=_decode_json), row[1]
+
+    def set(self, key: str, value: Any, stored_at: float) -> None:
+        self._enqueue((key, value, stored_at))
+
+    def delete(self, key: str) -> None:
+        self._enqueue((key, None, None))
+
+    def _write_behind(self, writes: queue.Queue) -> None:
+        while True:
+            batch = [writes.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                # Serialized here rather than by the caller, which is usually on the event loop
+                rows = [(key, json.dumps(value, default=_encode_json), stored_at) for key, value, stored_at in batch if stored_at is not None]
+                deleted = [(key,) for key, _, stored_at in batch if stored_at is None]
+                with self._lock:
+                    conn = self._connection()
+                    conn.executemany("INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)", rows)
+                    conn.executemany("DELETE FROM cache WHERE key = ?", deleted)
+                    conn.commit()
+                    self.commits += 1
+            except Exception:
+                logger.exception("Failed to persist cache entries")
+            finally:
+                for _ in batch:
+                    writes.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued write is committed."""
+        if self._writes is not None and self._pid == os.getpid():
+            self._writes.join()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._pid = None
+
+
+class AnalysisCache:
+    """
+    LRU cache with a TTL and an approximate memory cap, optionally backed by
+    an on-disk store. `get_or_compute` is single-flight: concurrent callers for
+    the same key share one computation. It never touches the store on the
+    event loop: lookups run on an executor and writes are queued.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 86400, store: SQLiteStore | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._entries: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self._bytes = 0
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def _evict(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _get_memory(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at, _ = entry
+            if not self._expired(stored_at):
+                self._entries.move_to_end(key)
+                return value
+            self._evict(key)
+        return None
+
+    def _get_stored(self, key: str) -> tuple[Any, float] | None:
+        stored = self.store.get(key)
+        if stored is None:
+            return None
+        if self._expired(stored[1]):
+            self.store.delete(key)
+            return None
+        return stored
+
+    def get(self, key: str) -> Any | None:
+        """Blocking lookup, memory first; async code should use `get_or_compute`."""
+        value = self._get_memory(key)
+        if value is None and self.store is not None:
+            stored = self._get_stored(key)
+            if stored is not None:
+                value = stored[0]
+                self._put_memory(key, *stored)
+        return value
+
+    def _put_memory(self, key: str, value: Any, stored_at: float) -> None:
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (value, stored_at, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def set(self, key: str, value: Any) -> None:
+        stored_at = time.time()
+        self._put_memory(key, value, stored_at)
+        if self.store is not None:
+            self.store.set(key, value, stored_at)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        # Join an identical request that is already looking up or computing
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.hits += 1
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        # Run as its own task so a disconnecting caller does not cancel it for the others
+        task = asyncio.ensure_future(self._load_or_compute(key, compute))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if self.store is not None:
+            stored = await asyncio.get_running_loop().run_in_executor(None, self._get_stored, key)
+            if stored is not None:
+                self.hits += 1
+                self._put_memory(key, *stored)
+                return stored[0]
+
+        self.misses += 1
+        value = await compute()
+        self.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "miss_rate": self.misses / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
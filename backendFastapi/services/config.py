@@ -0,0 +1,187 @@
+# services/config.py
+import os
+
+# ------------------------ #
+# Batching                 #
+# ------------------------ #
+# Maximum number of texts sent through the models in a single call
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+# How long the first request in a batch may wait for others to join (milliseconds)
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+# ------------------------ #
+# Inference Executors      #
+# ------------------------ #
+# Worker threads for text models (mood, emotion, embedding)
+TEXT_POOL_SIZE = int(os.getenv("TEXT_POOL_SIZE", "2"))
+# Worker threads for Whisper transcription
+AUDIO_POOL_SIZE = int(os.getenv("AUDIO_POOL_SIZE", "1"))
+# Worker threads for song-catalog searches, kept apart so they never queue behind model batches
+SEARCH_POOL_SIZE = int(os.getenv("SEARCH_POOL_SIZE", "2"))
+
+# ------------------------ #
+# Model Loading            #
+# ------------------------ #
+# Comma-separated list of models this deployment serves; leave empty for a GeoIP-only replica
+ENABLED_MODELS = [
+    name.strip()
+    for name in os.getenv("ENABLED_MODELS", "whisper,mood,emotion,intent_context").split(",")
+    if name.strip()
+]
+# Load all enabled models in the background at startup instead of on first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "True") == "True"
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "small")
+
+# ------------------------ #
+# Analysis Cache           #
+# ------------------------ #
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "True") == "True"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Approximate memory cap for cached results (bytes)
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "86400"))
+# Optional SQLite file so cached results survive restarts; empty keeps the cache in memory only
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")
+
+# ------------------------ #
+# Inference Backend        #
+# ------------------------ #
+# "torch" runs the fp32 PyTorch models; "onnx" runs int8-quantized ONNX Runtime exports on CPU
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+# Where exported/quantized ONNX graphs are cached between runs
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".onnx_cache"))
+
+# ------------------------ #
+# Tokenization             #
+# ------------------------ #
+# Tokenize once per tokenizer family and feed token IDs to the models directly
+SHARED_TOKENIZATION = os.getenv("SHARED_TOKENIZATION", "True") == "True"
+# Longest sequence (special tokens included) a model sees; longer inputs are split into windows
+TOKEN_WINDOW_MAX = int(os.getenv("TOKEN_WINDOW_MAX", "512"))
+# Tokens shared by consecutive windows of a long input
+TOKEN_WINDOW_OVERLAP = int(os.getenv("TOKEN_WINDOW_OVERLAP", "64"))
+# Padded tokens per forward pass; windows are grouped by length up to this budget
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", "8192"))
+
+# ------------------------ #
+# Audio Preprocessing      #
+# ------------------------ #
+# Trim leading/trailing silence and shorten long pauses before Whisper
+VAD_ENABLED = os.getenv("VAD_ENABLED", "True") == "True"
+# Frames quieter than this many dB below the clip's loudest frames count as silence
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "35"))
+# Inner pauses longer than this are shortened to VAD_PADDING_MS on each side
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "500"))
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", "150"))
+# ffmpeg is killed after this long, so a malformed upload can't hold an audio worker
+AUDIO_DECODE_TIMEOUT_S = float(os.getenv("AUDIO_DECODE_TIMEOUT_S", "30"))
+
+# ------------------------ #
+# Streaming Transcription  #
+# ------------------------ #
+# Seconds of new audio between partial transcripts
+STREAM_PARTIAL_INTERVAL_S = float(os.getenv("STREAM_PARTIAL_INTERVAL_S", "2"))
+# Rolling window length; once reached, the window's text is committed and a new window starts
+STREAM_WINDOW_S = float(os.getenv("STREAM_WINDOW_S", "15"))
+# Streams longer than this are closed
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "300"))
+
+# ------------------------ #
+# Song Recommendation      #
+# ------------------------ #
+# Directory holding the song catalog (manifest.json, vectors.f32, ids.txt) and its IVF index
+SONG_CATALOG_DIR = os.getenv("SONG_CATALOG_DIR", "")
+# Number of IVF lists scanned per query; higher is more accurate and slower
+RECOMMEND_NPROBE = int(os.getenv("RECOMMEND_NPROBE", "16"))
+RECOMMEND_MAX_K = int(os.getenv("RECOMMEND_MAX_K", "100"))
+
+# ------------------------ #
+# GeoIP                    #
+# ------------------------ #
+# Local IP-range database built with `python -m services.geoip_db`; empty uses ipwho.is only
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH", "")
+# Fall back to ipwho.is when the local database is missing or has no range for an IP
+GEOIP_HTTP_FALLBACK = os.getenv("GEOIP_HTTP_FALLBACK", "True") == "True"
+
+# ------------------------ #
+# Weather Cache            #
+# ------------------------ #
+# Users within the same grid cell (degrees of lat/lon) share one weather lookup
+WEATHER_GRID_DEGREES = float(os.getenv("WEATHER_GRID_DEGREES", "0.25"))
+# Cached weather is fresh within the same time bucket (Open-Meteo updates every 15 minutes)
+WEATHER_BUCKET_SECONDS = int(os.getenv("WEATHER_BUCKET_SECONDS", "900"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "10000"))
+# How long a request waits on a refresh before falling back to the stale value
+WEATHER_STALE_WAIT_SECONDS = float(os.getenv("WEATHER_STALE_WAIT_SECONDS", "0.5"))
+# Stale values older than this are never served
+WEATHER_MAX_STALE_SECONDS = float(os.getenv("WEATHER_MAX_STALE_SECONDS", "10800"))
+
+# ------------------------ #
+# Outbound HTTP            #
+# ------------------------ #
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Concurrent requests allowed to any single upstream host
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "2"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5"))
+# Retries for connection errors, timeouts, 429 and 5xx responses
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.2"))
+# ipwho.is results are cached per IP, so repeat visitors skip the location round trip
+IP_LOCATION_CACHE_TTL_SECONDS = float(os.getenv("IP_LOCATION_CACHE_TTL_SECONDS", "3600"))
+IP_LOCATION_CACHE_MAX_ENTRIES = int(os.getenv("IP_LOCATION_CACHE_MAX_ENTRIES", "50000"))
+
+# ------------------------ #
+# Spotify Ingestion        #
+# ------------------------ #
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+SPOTIFY_CONCURRENCY = int(os.getenv("SPOTIFY_CONCURRENCY", "4"))
+# Token bucket shared by all requests of one ingestion run
+SPOTIFY_RATE_PER_SECOND = float(os.getenv("SPOTIFY_RATE_PER_SECOND", "8"))
+SPOTIFY_BURST = int(os.getenv("SPOTIFY_BURST", "8"))
+SPOTIFY_RETRIES = int(os.getenv("SPOTIFY_RETRIES", "5"))
+
+# ------------------------ #
+# Metrics                  #
+# ------------------------ #
+# Prometheus text format on /metrics, plus per-route request latency
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+# Add a Server-Timing header with per-stage durations to every response
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "False") == "True"
+
+# ------------------------ #
+# Pre-fork Serving         #
+# ------------------------ #
+# Worker processes started by serve.py; models load once in the parent and are shared copy-on-write
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1)))
+# Torch intra-op threads per worker; 0 splits the cores evenly between workers
+SERVE_THREADS_PER_WORKER = int(os.getenv("SERVE_THREADS_PER_WORKER", "0"))
+
+# ------------------------ #
+# Admission Control        #
+# ------------------------ #
+# Requests beyond a lane's running + queued limit get 503 with Retry-After instead of waiting
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True") == "True"
+# analyze_text requests in flight at once; they share micro-batches, so this can be well above the pool size
+TEXT_MAX_CONCURRENT = int(os.getenv("TEXT_MAX_CONCURRENT", str(BATCH_MAX_SIZE * TEXT_POOL_SIZE)))
+TEXT_MAX_QUEUE = int(os.getenv("TEXT_MAX_QUEUE", "256"))
+# analyze_audio requests transcribing at once, and how many more may wait
+AUDIO_MAX_CONCURRENT = int(os.getenv("AUDIO_MAX_CONCURRENT", str(AUDIO_POOL_SIZE)))
+AUDIO_MAX_QUEUE = int(os.getenv("AUDIO_MAX_QUEUE", "8"))
+# Open /stream_audio sockets; each one re-transcribes its window every few seconds, so keep this small
+STREAM_MAX_CONCURRENT = int(os.getenv("STREAM_MAX_CONCURRENT", str(2 * AUDIO_POOL_SIZE)))
+
+# ------------------------ #
+# Whisper Tiers            #
+# ------------------------ #
+# Faster Whisper sizes to choose from per clip, fastest first (e.g. "tiny,base");
+# WHISPER_MODEL_SIZE is always the most accurate tier. Empty serves WHISPER_MODEL_SIZE only.
+WHISPER_TIERS = [size.strip() for size in os.getenv("WHISPER_TIERS", "").split(",") if size.strip()]
+# Latency target for a transcription when the client sends none (?latency_budget_ms=); 0 always uses the top tier
+WHISPER_LATENCY_BUDGET_MS = float(os.getenv("WHISPER_LATENCY_BUDGET_MS", "3000"))
+# Language of the audio (e.g. "en") to skip Whisper's language detection; empty detects per clip
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "")
+# Beam width for the non-fast tiers; 0 keeps Whisper's greedy decoding with temperature fallback
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "0"))
@@ -0,0 +1,107 @@
+# services/encoding.py
+import base64
+import json
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+# ------------------------ #
+# Embedding Encodings      #
+# ------------------------ #
+# "json" is a plain list of floats (the default); the others are base64 strings
+EMBEDDING_ENCODINGS = ("json", "float32", "float16", "int8")
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+# OpenAPI description of what `encoded_response` can return besides the plain JSON model
+ENCODED_RESPONSES = {
+    200: {
+        "description": (
+            "JSON by default. With `embedding_encoding` other than json, `intent_context_embedding` is a base64 "
+            "string described by `embedding_encoding`/`embedding_dim`/`embedding_scale`. "
+            "With `Accept: application/x-msgpack` the same fields are msgpack-encoded with raw embedding bytes."
+        ),
+        "content": {MSGPACK_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}}},
+    },
+}
+
+
+def encode_embedding(embedding: np.ndarray, encoding: str) -> tuple[bytes, float | None]:
+    """
+    Pack an embedding into raw little-endian bytes for `encoding`.
+    int8 is symmetric-quantized and also returns the scale needed to decode it.
+    """
+    embedding = np.asarray(embedding, dtype=np.float32)
+    if encoding == "float32":
+        return embedding.astype("<f4").tobytes(), None
+    if encoding == "float16":
+        return embedding.astype("<f2").tobytes(), None
+    if encoding == "int8":
+        max_abs = float(np.abs(embedding).max()) if embedding.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(embedding / scale), -127, 127).astype(np.int8)
+        return quantized.tobytes(), scale
+    raise ValueError(f"Unsupported embedding encoding '{encoding}'")
+
+
+def decode_embedding(data: bytes | str, encoding: str, scale: float | None = None) -> np.ndarray:
+    """Inverse of `encode_embedding`; accepts raw bytes or a base64 string."""
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    if encoding == "float32":
+        return np.frombuffer(data, dtype="<f4").astype(np.float32)
+    if encoding == "float16":
+        return np.frombuffer(data, dtype="<f2").astype(np.float32)
+    if encoding == "int8":
+        return np.frombuffer(data, dtype=np.int8).astype(np.float32) * (scale if scale is not None else 1.0)
+    raise ValueError(f"Unsupported embedding encoding '{encoding}'")
+
+
+def serialize_result(result: dict, encoding: str = "json", binary: bool = False) -> dict:
+    """
+    Turn an analysis result into a response body. For non-JSON encodings the
+    embedding becomes `embedding_encoding`/`embedding_dim`/`embedding_scale`
+    plus either raw bytes (msgpack) or base64 text (JSON).
+    """
+    embedding = result["intent_context_embedding"]
+    body = {key: value for key, value in result.items() if key != "intent_context_embedding"}
+    if encoding == "json":
+        body["intent_context_embedding"] = np.asarray(embedding, dtype=np.float32).tolist()
+        return body
+
+    data, scale = encode_embedding(embedding, encoding)
+    body["intent_context_embedding"] = data if binary else base64.b64encode(data).decode("ascii")
+    body["embedding_encoding"] = encoding
+    body["embedding_dim"] = len(embedding)
+    if scale is not None:
+        body["embedding_scale"] = scale
+    return body
+
+
+def negotiate_encoding(request: Request) -> tuple[str, bool]:
+    """
+    Pick the embedding encoding from the `embedding_encoding` query parameter
+    (or `X-Embedding-Encoding` header) and whether the client accepts msgpack.
+    """
+    encoding = request.query_params.get("embedding_encoding") or request.headers.get("x-embedding-encoding") or "json"
+    if encoding not in EMBEDDING_ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"embedding_encoding must be one of {list(EMBEDDING_ENCODINGS)}")
+    binary = MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+    if binary and encoding == "json":
+        # msgpack without an explicit encoding gets full-precision raw floats
+        encoding = "float32"
+    return encoding, binary
+
+
+def encoded_response(result: dict, request: Request) -> Response:
+    encoding, binary = negotiate_encoding(request)
+    body = serialize_result(result, encoding, binary)
+    if binary:
+        try:
+            import msgpack
+        except ImportError:
+            raise HTTPException(status_code=406, detail="msgpack responses are not available on this deployment")
+        return Response(content=msgpack.packb(body, use_bin_type=True), media_type=MSGPACK_MEDIA_TYPE)
+    # Bypass response_model validation; the body is already plain JSON types
+    return Response(content=json.dumps(body, separators=(",", ":")), media_type="application/json")
@@ -0,0 +1,49 @@
+# services/executor.py
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from services.config import TEXT_POOL_SIZE, AUDIO_POOL_SIZE, SEARCH_POOL_SIZE
+from services.metrics import QUEUE_DEPTH
+
+# ------------------------ #
+# Bounded Inference Pools  #
+# ------------------------ #
+# PyTorch releases the GIL inside its kernels, so threads are enough to run
+# model calls off the event loop. Text and audio get separate pools so a
+# long Whisper pass never holds up the cheap text models.
+text_executor = ThreadPoolExecutor(max_workers=TEXT_POOL_SIZE, thread_name_prefix="text-inference")
+audio_executor = ThreadPoolExecutor(max_workers=AUDIO_POOL_SIZE, thread_name_prefix="audio-inference")
+# Catalog searches take milliseconds; on the text pool they'd wait out whole model batches
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_POOL_SIZE, thread_name_prefix="vector-search")
+QUEUE_DEPTH.track(("text_executor",), lambda: text_executor._work_queue.qsize())
+QUEUE_DEPTH.track(("audio_executor",), lambda: audio_executor._work_queue.qsize())
+QUEUE_DEPTH.track(("search_executor",), lambda: search_executor._work_queue.qsize())
+
+
+async def run_in_executor(executor: ThreadPoolExecutor, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking `fn` on `executor` without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # Carry the request context over, so stage timings inside `fn` land on the right request
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def run_text_inference(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await run_in_executor(text_executor, fn, *args, **kwargs)
+
+
+async def run_audio_inference(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await run_in_executor(audio_executor, fn, *args, **kwargs)
+
+
+async def run_search(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await run_in_executor(search_executor, fn, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    text_executor.shutdown(wait=False, cancel_futures=True)
+    audio_executor.shutdown(wait=False, cancel_futures=True)
+    search_executor.shutdown(wait=False, cancel_futures=True)
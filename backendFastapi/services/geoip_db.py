@@ -0,0 +1,230 @@
+# services/geoip_db.py
+"""
+Offline IP geolocation database.
+
+A single file holding sorted, non-overlapping IPv4 and IPv6 ranges that are
+memory-mapped and searched with binary search, so a lookup is a few
+microseconds and touches only the pages it needs.
+
+File layout:
+    b"RIFFGEO1" | uint32 header length | JSON header | aligned array sections
+The header maps each section name to its offset, dtype and shape.
+
+Build from a CSV range dump with:
+    python -m services.geoip_db ranges.csv geoip.db
+CSV columns (header row required): ip_start, ip_end, country, region,
+latitude, longitude, timezone. `timezone` is an IANA name (preferred, DST-aware)
+or a fixed UTC offset in seconds.
+"""
+import argparse
+import csv
+import ipaddress
+import json
+import mmap
+import struct
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+MAGIC = b"RIFFGEO1"
+ALIGNMENT = 64
+OFFSET_BUCKET_SECONDS = 900
+
+RECORD_DTYPE = np.dtype([
+    ("country", "<u4"),   # index into the string table
+    ("region", "<u4"),    # index into the string table
+    ("timezone", "<u4"),  # index into the string table
+    ("latitude", "<f4"),
+    ("longitude", "<f4"),
+])
+
+
+# ------------------------ #
+# Build                    #
+# ------------------------ #
+def _split_v6(value: int) -> tuple[int, int]:
+    return value >> 64, value & 0xFFFFFFFFFFFFFFFF
+
+
+def build_database(csv_path: str, output_path: str) -> dict:
+    strings: dict[str, int] = {}
+    records: dict[tuple, int] = {}
+    v4, v6 = [], []
+
+    def intern(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            start = ipaddress.ip_address(row["ip_start"].strip())
+            end = ipaddress.ip_address(row["ip_end"].strip())
+            if start.version != end.version or int(end) < int(start):
+                raise ValueError(f"Invalid range {row['ip_start']} - {row['ip_end']}")
+            record = (
+                intern(row["country"].strip()),
+                intern(row["region"].strip()),
+                intern(row["timezone"].strip()),
+                float(row["latitude"]),
+                float(row["longitude"]),
+            )
+            record_id = records.setdefault(record, len(records))
+            (v4 if start.version == 4 else v6).append((int(start), int(end), record_id))
+
+    v4.sort()
+    v6.sort()
+    for table in (v4, v6):
+        for previous, current in zip(table, table[1:]):
+            if current[0] <= previous[1]:
+                raise ValueError("IP ranges overlap; the input must contain disjoint ranges")
+
+    blob = b"".join(s.encode("utf-8") for s in strings)
+    string_offsets = np.zeros(len(strings) + 1, dtype="<u4")
+    np.cumsum([len(s.encode("utf-8")) for s in strings], out=string_offsets[1:])
+
+    sections = {
+        "v4_start": np.array([r[0] for r in v4], dtype="<u4"),
+        "v4_end": np.array([r[1] for r in v4], dtype="<u4"),
+        "v4_record": np.array([r[2] for r in v4], dtype="<u4"),
+        "v6_start_hi": np.array([_split_v6(r[0])[0] for r in v6], dtype="<u8"),
+        "v6_start_lo": np.array([_split_v6(r[0])[1] for r in v6], dtype="<u8"),
+        "v6_end_hi": np.array([_split_v6(r[1])[0] for r in v6], dtype="<u8"),
+        "v6_end_lo": np.array([_split_v6(r[1])[1] for r in v6], dtype="<u8"),
+        "v6_record": np.array([r[2] for r in v6], dtype="<u4"),
+        "records": np.array(list(records), dtype=RECORD_DTYPE),
+        "string_offsets": string_offsets,
+        "string_blob": np.frombuffer(blob, dtype=np.uint8),
+    }
+    _write_sections(output_path, sections)
+    return {"ipv4_ranges": len(v4), "ipv6_ranges": len(v6), "records": len(records), "strings": len(strings)}
+
+
+def _aligned(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def _write_sections(path: str, sections: dict[str, np.ndarray]) -> None:
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        dtype = array.dtype.descr if array.dtype.names else array.dtype.str
+        layout[name] = {"offset": offset, "dtype": dtype, "shape": list(array.shape)}
+        offset += _aligned(array.nbytes)
+
+    # Offsets are relative until the header size is known; leave room for the longer absolute ones
+    data_start = _aligned(len(MAGIC) + 4 + len(json.dumps({"sections": layout})) + 16 * len(layout))
+    for entry in layout.values():
+        entry["offset"] += data_start
+    header = json.dumps({"sections": layout}).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for name, array in sections.items():
+            f.seek(layout[name]["offset"])
+            f.write(array.tobytes())
+
+
+# ------------------------ #
+# Lookup                   #
+# ------------------------ #
+@lru_cache(maxsize=1024)
+def _zone(name: str) -> ZoneInfo | None:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _offset_at(tz: str, bucket: int) -> int | None:
+    try:
+        return int(tz)
+    except ValueError:
+        pass
+    zone = _zone(tz)
+    if zone is None:
+        return None
+    moment = datetime.fromtimestamp(bucket * OFFSET_BUCKET_SECONDS, timezone.utc)
+    return int(moment.astimezone(zone).utcoffset().total_seconds())
+
+
+def utc_offset_seconds(tz: str) -> int | None:
+    """Current UTC offset for an IANA zone name or a fixed offset in seconds."""
+    # Offsets (and DST transitions) fall on quarter hours, so cache per zone and 15-minute bucket
+    return _offset_at(tz, int(time.time() // OFFSET_BUCKET_SECONDS))
+
+
+class GeoIPDatabase:
+    """Memory-mapped range table; `lookup` returns None for IPs outside every range."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a GeoIP database")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Plain ndarray views over the mapping: no copies, and no np.memmap indexing overhead
+        for name, entry in header["sections"].items():
+            dtype = np.dtype([tuple(field) for field in entry["dtype"]]) if isinstance(entry["dtype"], list) else np.dtype(entry["dtype"])
+            count = int(np.prod(entry["shape"]))
+            setattr(self, name, np.frombuffer(self._mmap, dtype=dtype, count=count, offset=entry["offset"]))
+
+        # The string table is small (countries, regions, zone names), so decode it once
+        blob = self.string_blob.tobytes()
+        offsets = self.string_offsets.tolist()
+        self.strings = [blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+    def _find(self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> int | None:
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if ip.version == 4:
+            # Search with a matching scalar type, or numpy upcasts (copies) the whole column
+            value = np.uint32(int(ip))
+            i = int(np.searchsorted(self.v4_start, value, side="right")) - 1
+            if i >= 0 and value <= self.v4_end[i]:
+                return int(self.v4_record[i])
+            return None
+
+        hi, lo = (np.uint64(part) for part in _split_v6(int(ip)))
+        # Ranges are sorted by (hi, lo): narrow to equal `hi`, then search `lo` within it
+        left = int(np.searchsorted(self.v6_start_hi, hi, side="left"))
+        right = int(np.searchsorted(self.v6_start_hi, hi, side="right"))
+        i = left + int(np.searchsorted(self.v6_start_lo[left:right], lo, side="right")) - 1
+        if i < left:
+            i = left - 1  # Range starting in an earlier `hi` block
+        if i < 0:
+            return None
+        if (hi, lo) <= (self.v6_end_hi[i], self.v6_end_lo[i]):
+            return int(self.v6_record[i])
+        return None
+
+    def lookup(self, ip: str) -> dict | None:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        record_id = self._find(address)
+        if record_id is None:
+            return None
+        country, region, tz, latitude, longitude = self.records[record_id].item()
+        return {
+            "country": self.strings[country],
+            "region": self.strings[region],
+            "latitude": latitude,
+            "longitude": longitude,
+            "timezone_offset": utc_offset_seconds(self.strings[tz]),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline GeoIP database from a CSV range dump")
+    parser.add_argument("csv_path")
+    parser.add_argument("output_path")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = build_database(args.csv_path, args.output_path)
+    print(json.dumps({**stats, "seconds": round(time.perf_counter() - started, 2)}))
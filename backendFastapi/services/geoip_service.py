@@ -1,13 +1,27 @@
 # geoip_service/main.py
 from fastapi import APIRouter, HTTPException, Query
-import requests
+import httpx
 from datetime import datetime, timedelta, timezone
+from services.config import (
+    GEOIP_DB_PATH, GEOIP_HTTP_FALLBACK,
+    WEATHER_GRID_DEGREES, WEATHER_BUCKET_SECONDS, WEATHER_CACHE_MAX_ENTRIES,
+    WEATHER_STALE_WAIT_SECONDS, WEATHER_MAX_STALE_SECONDS,
+    IP_LOCATION_CACHE_TTL_SECONDS, IP_LOCATION_CACHE_MAX_ENTRIES,
+)
+from services.cache import AnalysisCache
+from services.geoip_db import GeoIPDatabase
+from services.http_client import http_client
+from services.metrics import CACHE_HIT_RATIO, CACHE_LOOKUPS, stage
+from services.weather_cache import WeatherCache
 
 geoip_router = APIRouter()
 
 IPWHO_URL = "https://ipwho.is/"
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
 
+# Local memory-mapped range table; ipwho.is stays as the fallback provider
+geoip_db = GeoIPDatabase(GEOIP_DB_PATH) if GEOIP_DB_PATH else None
+
 
 def get_time_of_day(offset_seconds: int) -> int:
     utc_time = datetime.now(timezone.utc)
@@ -23,10 +37,12 @@ def get_time_of_day(offset_seconds: int) -> int:
         return 3  # Evening/Night
 
 
-@geoip_router.get("/")
-def get_geoip_data(ip: str = Query(..., description="User IP address")):
+async def lookup_location_http(ip: str) -> dict:
     # Fetch location & timezone info from ipwho.is
-    ip_response = requests.get(f"{IPWHO_URL}{ip}")
+    try:
+        ip_response = await http_client.get(f"{IPWHO_URL}{ip}")
+    except httpx.TransportError:
+        raise HTTPException(status_code=500, detail="Failed to fetch IP info.")
     if ip_response.status_code != 200:
         raise HTTPException(status_code=500, detail="Failed to fetch IP info.")
 
@@ -34,28 +50,89 @@ def get_geoip_data(ip: str = Query(..., description="User IP address")):
     if not ip_data.get("success"):
         raise HTTPException(status_code=400, detail="Invalid IP address.")
 
-    latitude = ip_data.get("latitude")
-    longitude = ip_data.get("longitude")
-    country = ip_data.get("country")
-    region = ip_data.get("region")
-    timezone_offset = ip_data.get("timezone", {}).get("offset")
-
-    if not all([latitude, longitude, country, region, timezone_offset]):
-        raise HTTPException(status_code=500, detail="Incomplete IP data.")
+    return {
+        "latitude": ip_data.get("latitude"),
+        "longitude": ip_data.get("longitude"),
+        "country": ip_data.get("country"),
+        "region": ip_data.get("region"),
+        "timezone_offset": ip_data.get("timezone", {}).get("offset"),
+    }
 
-    time_of_day = get_time_of_day(timezone_offset)
 
+async def fetch_weather_code(latitude: float, longitude: float) -> int:
     # Fetch weather data from Open-Meteo
-    weather_response = requests.get(
-        OPEN_METEO_URL,
-        params={"latitude": latitude, "longitude": longitude, "current_weather": True}
-    )
+    try:
+        weather_response = await http_client.get(
+            OPEN_METEO_URL,
+            params={"latitude": latitude, "longitude": longitude, "current_weather": True}
+        )
+    except httpx.TransportError:
+        raise HTTPException(status_code=500, detail="Failed to fetch weather data.")
 
     if weather_response.status_code != 200:
         raise HTTPException(status_code=500, detail="Failed to fetch weather data.")
 
     weather_data = weather_response.json()
-    weather_code = weather_data.get("current_weather", {}).get("weathercode", -1)
+    return weather_data.get("current_weather", {}).get("weathercode", -1)
+
+
+# Same LRU/TTL/single-flight cache as text analysis, keyed by IP
+ip_location_cache = AnalysisCache(max_entries=IP_LOCATION_CACHE_MAX_ENTRIES, ttl_seconds=IP_LOCATION_CACHE_TTL_SECONDS)
+
+# Users in the same grid cell and time bucket share one Open-Meteo lookup
+weather_cache = WeatherCache(
+    fetch_weather_code,
+    grid_degrees=WEATHER_GRID_DEGREES,
+    bucket_seconds=WEATHER_BUCKET_SECONDS,
+    max_entries=WEATHER_CACHE_MAX_ENTRIES,
+    stale_wait_seconds=WEATHER_STALE_WAIT_SECONDS,
+    max_stale_seconds=WEATHER_MAX_STALE_SECONDS,
+)
+
+CACHE_HIT_RATIO.track(("ip_location",), lambda: ip_location_cache.stats()["hit_rate"])
+CACHE_HIT_RATIO.track(("weather",), lambda: weather_cache.stats()["hit_rate"])
+CACHE_LOOKUPS.track(("ip_location", "hit"), lambda: ip_location_cache.hits)
+CACHE_LOOKUPS.track(("ip_location", "miss"), lambda: ip_location_cache.misses)
+CACHE_LOOKUPS.track(("weather", "hit"), lambda: weather_cache.hits)
+CACHE_LOOKUPS.track(("weather", "stale"), lambda: weather_cache.stale_served)
+CACHE_LOOKUPS.track(("weather", "miss"), lambda: weather_cache.misses)
+
+
+def lookup_location_local(ip: str) -> dict | None:
+    """Location available without a network call: local table first, then the per-IP cache."""
+    if geoip_db is not None:
+        location = geoip_db.lookup(ip)
+        if location is not None:
+            return location
+    return ip_location_cache.get(ip)
+
+
+async def lookup_location(ip: str) -> dict:
+    location = lookup_location_local(ip)
+    if location is not None:
+        return location
+    if geoip_db is not None and not GEOIP_HTTP_FALLBACK:
+        raise HTTPException(status_code=404, detail="IP address not found in GeoIP database.")
+    return await ip_location_cache.get_or_compute(ip, lambda: lookup_location_http(ip))
+
+
+@geoip_router.get("/")
+async def get_geoip_data(ip: str = Query(..., description="User IP address")):
+    with stage("location"):
+        location = await lookup_location(ip)
+    latitude = location["latitude"]
+    longitude = location["longitude"]
+    country = location["country"]
+    region = location["region"]
+    timezone_offset = location["timezone_offset"]
+
+    # 0 is a valid latitude/longitude/UTC offset, so only missing values count as incomplete
+    if any(value is None or value == "" for value in (latitude, longitude, country, region, timezone_offset)):
+        raise HTTPException(status_code=500, detail="Incomplete IP data.")
+
+    time_of_day = get_time_of_day(timezone_offset)
+    with stage("weather"):
+        weather_code = await weather_cache.get(latitude, longitude)
 
     return {
         "location": {
@@ -65,5 +142,14 @@ def get_geoip_data(ip: str = Query(..., description="User IP address")):
         "time_of_day": time_of_day,  # 0: Early Morning, 1: Morning, 2: Afternoon, 3: Evening/Night, -1: Error
         "weather_code": weather_code  # Open-Meteo weather code
     }
+
+
+@geoip_router.get("/weather_cache_stats")
+async def weather_cache_stats():
+    """
+    Hit/miss counts of the weather cache, for sizing the grid cell and bucket.
+    """
+    return weather_cache.stats()
+
 # Example Usage:
 # GET /geoip/?ip=8.8.8.8 -> Returns location, time_of_day, and weather_code
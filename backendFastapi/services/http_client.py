@@ -0,0 +1,97 @@
+# services/http_client.py
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.config import (
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF_SECONDS,
+)
+from services.metrics import UPSTREAM_SECONDS
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AsyncHTTPClient:
+    """
+    Shared outbound HTTP client: one pooled keep-alive `httpx.AsyncClient`,
+    a concurrency cap per upstream host, connect/read timeouts and retries
+    with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_connections_per_host: int = 20,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 5.0,
+        retries: int = 2,
+        backoff_seconds: float = 0.2,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_connections_per_host = max_connections_per_host
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, transport=self.transport)
+            self._loop = loop
+            self._host_slots = {}
+        return self._client
+
+    def _slots(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_slots[host]
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff_seconds * (2 ** attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        client = self._get_client()
+        slots = self._slots(url)
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            started = time.perf_counter()
+            try:
+                async with slots:
+                    response = await client.get(url, **kwargs)
+            except httpx.TransportError:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, urlsplit(url).hostname, "error")
+                if last_attempt:
+                    raise
+            else:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, urlsplit(url).hostname, str(response.status_code))
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return response
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+http_client = AsyncHTTPClient(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    read_timeout=HTTP_READ_TIMEOUT,
+    retries=HTTP_RETRIES,
+    backoff_seconds=HTTP_BACKOFF_SECONDS,
+)
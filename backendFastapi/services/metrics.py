@@ -0,0 +1,245 @@
+# services/metrics.py
+"""
+In-process metrics with Prometheus text exposition.
+
+Histograms are plain Python with one lock each; recording a
+value is a `bisect` and a few additions, cheap enough to leave on in
+production. Gauges that mirror state owned elsewhere (queue depths, cache
+hit ratios, model load times) are read through callbacks at scrape time.
+
+`stage(name)` times a block into `riff_stage_seconds` and, when the request
+was started under `MetricsMiddleware` with Server-Timing enabled, into that
+request's `Server-Timing` header. Work done once for several requests (a
+micro-batch) runs under `timings_for`, so its stages reach each of them.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Iterable[str], labelvalues: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {values[-1]}")
+        return lines
+
+
+class CallbackGauge:
+    """
+    Values read at scrape time from `track()`ed callbacks; one callback per
+    label set. `kind="counter"` exposes monotonically increasing totals kept elsewhere.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.kind = kind
+        self._callbacks: dict[tuple, Callable[[], float | None]] = {}
+
+    def track(self, labelvalues: tuple, callback: Callable[[], float | None]) -> None:
+        self._callbacks[labelvalues] = callback
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, callback in sorted(self._callbacks.items()):
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ------------------------ #
+# Service Metrics          #
+# ------------------------ #
+REQUEST_SECONDS = registry.register(Histogram(
+    "riff_request_seconds", "End-to-end HTTP request latency.", ("method", "route", "status")))
+STAGE_SECONDS = registry.register(Histogram(
+    "riff_stage_seconds", "Latency of individual processing stages.", ("stage",)))
+BATCH_SIZE = registry.register(Histogram(
+    "riff_batch_size", "Items per micro-batch sent to the models.", ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)))
+UPSTREAM_SECONDS = registry.register(Histogram(
+    "riff_upstream_request_seconds", "Latency of outbound HTTP calls per attempt.", ("host", "status")))
+QUEUE_DEPTH = registry.register(CallbackGauge(
+    "riff_queue_depth", "Work waiting for a batch slot or inference thread.", ("queue",)))
+MODEL_LOAD_SECONDS = registry.register(CallbackGauge(
+    "riff_model_load_seconds", "Time taken to load each model.", ("model",)))
+CACHE_HIT_RATIO = registry.register(CallbackGauge(
+    "riff_cache_hit_ratio", "Share of lookups served from cache since start.", ("cache",)))
+CACHE_LOOKUPS = registry.register(CallbackGauge(
+    "riff_cache_lookups_total", "Cache lookups by result.", ("cache", "result"), kind="counter"))
+ADMISSION_ACTIVE = registry.register(CallbackGauge(
+    "riff_admission_active", "Requests currently holding a slot in each admission lane.", ("lane",)))
+ADMISSION_DECISIONS = registry.register(CallbackGauge(
+    "riff_admission_total", "Admission decisions per lane: admitted, rejected (503) or degraded.", ("lane", "result"), kind="counter"))
+WHISPER_TIER_CHOICES = registry.register(CallbackGauge(
+    "riff_whisper_tier_total", "Transcriptions per Whisper model size.", ("tier",), kind="counter"))
+
+
+# ------------------------ #
+# Server-Timing            #
+# ------------------------ #
+_request_timings: ContextVar[list | None] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage `name`. Works in threads too, given the request context was copied."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def request_timings() -> list | None:
+    """The current request's Server-Timing entries, or None outside a timed request."""
+    return _request_timings.get()
+
+
+@contextmanager
+def timings_for(targets: list[list | None]):
+    """Record the block's `stage()` timings on every request in `targets` (from `request_timings()`)."""
+    if all(target is None for target in targets):
+        yield
+        return
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        yield
+    finally:
+        _request_timings.reset(token)
+        for target in targets:
+            if target is not None:
+                target.extend(timings)
+
+
+def server_timing_header(timings: list, total: float) -> bytes:
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no response buffering): records request latency per
+    route template and, if `server_timing`, adds a Server-Timing header built
+    from the request's `stage()` timings.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = [] if self.server_timing else None
+        token = _request_timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timings is not None:
+                    header = server_timing_header(timings, time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
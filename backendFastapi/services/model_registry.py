@@ -0,0 +1,101 @@
+# services/model_registry.py
+import threading
+import time
+from typing import Any, Callable
+
+# Load states reported by /ready
+DISABLED = "disabled"
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+LOADED = "loaded"
+FAILED = "failed"
+
+
+class ModelDisabledError(RuntimeError):
+    """Raised when a model is requested that this deployment does not serve."""
+
+
+class ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any], version: str, enabled: bool):
+        self.name = name
+        self.loader = loader
+        self.version = version
+        self.enabled = enabled
+        self.model = None
+        self.state = NOT_LOADED if enabled else DISABLED
+        self.load_seconds: float | None = None
+        self.error: str | None = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Holds model loaders and loads each model on first use or on `warmup()`.
+
+    Loading is guarded per model, so concurrent first requests trigger a
+    single load. Disabled models raise `ModelDisabledError` instead of loading.
+    """
+
+    def __init__(self, enabled: list[str] | None = None):
+        self._enabled = set(enabled) if enabled is not None else None
+        self._entries: dict[str, ModelEntry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], version: str = "", enabled: bool | None = None) -> None:
+        """`enabled` overrides the deployment's model list, e.g. for a model that follows another one."""
+        if enabled is None:
+            enabled = self._enabled is None or name in self._enabled
+        self._entries[name] = ModelEntry(name, loader, version, enabled)
+
+    def is_enabled(self, name: str) -> bool:
+        return name in self._entries and self._entries[name].enabled
+
+    def version(self, name: str) -> str:
+        return self._entries[name].version
+
+    def get(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model: {name}")
+        if not entry.enabled:
+            raise ModelDisabledError(f"Model '{name}' is disabled in this deployment")
+        if entry.model is not None:
+            return entry.model
+
+        with entry.lock:
+            if entry.model is None:
+                entry.state = LOADING
+                started = time.perf_counter()
+                try:
+                    entry.model = entry.loader()
+                except Exception as e:
+                    entry.state = FAILED
+                    entry.error = str(e)
+                    raise RuntimeError(f"Error loading model '{name}': {e}") from e
+                entry.load_seconds = time.perf_counter() - started
+                entry.state = LOADED
+                entry.error = None
+        return entry.model
+
+    def warmup(self, names: list[str] | None = None) -> None:
+        """Load the given (or all enabled) models; failures are recorded, not raised."""
+        for name, entry in self._entries.items():
+            if not entry.enabled or (names is not None and name not in names):
+                continue
+            try:
+                self.get(name)
+            except RuntimeError:
+                pass
+
+    def is_ready(self) -> bool:
+        return all(entry.state == LOADED for entry in self._entries.values() if entry.enabled)
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "state": entry.state,
+                "version": entry.version,
+                "load_seconds": entry.load_seconds,
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
@@ -0,0 +1,197 @@
+# services/onnx_backend.py
+"""
+ONNX Runtime backend for the text models.
+
+Each model is exported to ONNX once, quantized with dynamic int8 quantization
+and cached under ONNX_CACHE_DIR; later starts load the cached graph directly.
+
+Accuracy parity against the PyTorch backend can be checked with:
+    python -m services.onnx_backend --parity [texts.txt]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from services.config import ONNX_CACHE_DIR
+
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+SAMPLE_TEXTS = [
+    "feeling sad",
+    "happy vibes",
+    "I can't believe how great today was!",
+    "I'm so tired of everything going wrong",
+    "just chilling at home, nothing special",
+    "that movie was terrifying",
+    "ugh, my flight got cancelled again",
+    "missing my friends back home",
+    "let's get this party started",
+    "I need something calm to focus on work",
+]
+
+
+def _cache_path(model_id: str) -> str:
+    return os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "--") + "-int8")
+
+
+def export_quantized(model_id: str, ort_model_class) -> str:
+    """
+    Export `model_id` to ONNX and apply dynamic int8 quantization, caching the
+    result on disk. Returns the directory holding the quantized graph and tokenizer.
+
+    Everything is written to a scratch directory that is renamed into place
+    once complete, so an interrupted export never looks like a cached one.
+    """
+    target = _cache_path(model_id)
+    if os.path.exists(os.path.join(target, QUANTIZED_FILE_NAME)):
+        return target
+
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=os.path.basename(target) + ".", dir=ONNX_CACHE_DIR)
+    try:
+        export_dir = os.path.join(scratch, "fp32")
+        quantized_dir = os.path.join(scratch, "int8")
+        model = ort_model_class.from_pretrained(model_id, export=True)
+        model.save_pretrained(export_dir)
+
+        # Dynamic quantization: int8 weights, activations quantized at runtime, no calibration data needed
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=quantized_dir, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(quantized_dir)
+
+        if os.path.exists(os.path.join(target, QUANTIZED_FILE_NAME)):
+            return target  # Another worker finished first
+        # Left behind by an export from before this was atomic
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.replace(quantized_dir, target)
+        except OSError:
+            if not os.path.exists(os.path.join(target, QUANTIZED_FILE_NAME)):
+                raise
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return target
+
+
+def load_classification_pipeline(task: str, model_id: str, **pipeline_kwargs):
+    """Quantized ONNX drop-in for `transformers.pipeline(task, model=model_id)`."""
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    path = export_quantized(model_id, ORTModelForSequenceClassification)
+    model = ORTModelForSequenceClassification.from_pretrained(path, file_name=QUANTIZED_FILE_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    return pipeline(task, model=model, tokenizer=tokenizer, **pipeline_kwargs)
+
+
+class OnnxSentenceEncoder:
+    """
+    Quantized ONNX drop-in for the `SentenceTransformer.encode` calls we make:
+    mean pooling over token embeddings followed by L2 normalization, as in
+    all-mpnet-base-v2.
+    """
+
+    def __init__(self, model_id: str, max_length: int = 384):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        path = export_quantized(model_id, ORTModelForFeatureExtraction)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(path, file_name=QUANTIZED_FILE_NAME)
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.max_length = max_length
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+            token_embeddings = self.model(**inputs).last_hidden_state
+            token_embeddings = np.asarray(token_embeddings, dtype=np.float32)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings.append(pooled)
+
+        result = np.concatenate(embeddings, axis=0) if embeddings else np.zeros((0, 768), dtype=np.float32)
+        return result[0] if single else result
+
+
+# ------------------------ #
+# Accuracy Parity Check    #
+# ------------------------ #
+def _top_labels(emotion_results) -> list[str]:
+    return [max(scores, key=lambda x: x["score"])["label"] for scores in emotion_results]
+
+
+def check_parity(texts: list[str]) -> dict:
+    """
+    Run both backends over `texts` and report label agreement for mood/emotion
+    and cosine similarity between embeddings.
+    """
+    from services import userinput_service as svc
+
+    torch_mood = svc.load_mood_pipeline()
+    torch_emotion = svc.load_emotion_pipeline()
+    torch_encoder = svc.load_intent_context_model()
+    onnx_mood = load_classification_pipeline("sentiment-analysis", svc.MOOD_MODEL_ID)
+    onnx_emotion = load_classification_pipeline("text-classification", svc.EMOTION_MODEL_ID, top_k=None)
+    onnx_encoder = OnnxSentenceEncoder(svc.INTENT_CONTEXT_ONNX_MODEL_ID)
+
+    mood_ref = [r["label"] for r in torch_mood(texts)]
+    mood_onnx = [r["label"] for r in onnx_mood(texts)]
+    emotion_ref = _top_labels(torch_emotion(texts))
+    emotion_onnx = _top_labels(onnx_emotion(texts))
+    emb_ref = torch_encoder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    emb_onnx = onnx_encoder.encode(texts)
+    cosine = (emb_ref * emb_onnx).sum(axis=1)
+
+    return {
+        "samples": len(texts),
+        "mood_agreement": float(np.mean([a == b for a, b in zip(mood_ref, mood_onnx)])),
+        "emotion_agreement": float(np.mean([a == b for a, b in zip(emotion_ref, emotion_onnx)])),
+        "embedding_cosine_mean": float(cosine.mean()),
+        "embedding_cosine_min": float(cosine.min()),
+        "mismatches": [
+            {"text": text, "mood": (a, b), "emotion": (c, d)}
+            for text, a, b, c, d in zip(texts, mood_ref, mood_onnx, emotion_ref, emotion_onnx)
+            if a != b or c != d
+        ],
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="ONNX int8 backend tools")
+    parser.add_argument("--parity", nargs="?", const="", metavar="TEXTS_FILE", help="Compare ONNX and PyTorch outputs (one text per line)")
+    parser.add_argument("--export", action="store_true", help="Export and quantize all text models into ONNX_CACHE_DIR")
+    args = parser.parse_args()
+
+    if args.export:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTModelForSequenceClassification
+        from services import userinput_service as svc
+
+        for model_id in (svc.MOOD_MODEL_ID, svc.EMOTION_MODEL_ID):
+            print(export_quantized(model_id, ORTModelForSequenceClassification))
+        print(export_quantized(svc.INTENT_CONTEXT_ONNX_MODEL_ID, ORTModelForFeatureExtraction))
+
+    if args.parity is not None:
+        if args.parity:
+            with open(args.parity, encoding="utf-8") as f:
+                texts = [line.strip() for line in f if line.strip()]
+        else:
+            texts = SAMPLE_TEXTS
+        json.dump(check_parity(texts), sys.stdout, indent=2)
+        print()
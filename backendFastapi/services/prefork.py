@@ -0,0 +1,155 @@
+# services/prefork.py
+"""
+Pre-fork process model for serving with several workers on one node.
+
+The parent loads the model weights, freezes the GC and then forks the
+workers. Weight tensors live in buffers that Python never writes to, so
+every worker maps the same physical pages (copy-on-write) and RAM grows by
+the per-worker heap, not by a full model copy per worker. uvicorn's own
+`--workers` spawns fresh interpreters instead, and each one loads its own
+copy.
+
+Constraints that come with forking:
+    * CPU only: CUDA contexts do not survive fork, so GPU nodes run one worker per device.
+    * The parent must not run inference before forking. A warmed-up OpenMP
+      pool can deadlock in the children. Loading weights doesn't start it.
+    * ONNX Runtime sessions own native thread pools, so with INFERENCE_BACKEND=onnx
+      only Whisper is preloaded; the int8 text models are small and load per worker.
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# A worker dying sooner than this after start counts as a crash loop and is respawned with backoff
+MIN_WORKER_UPTIME_SECONDS = 5.0
+MAX_RESPAWN_BACKOFF_SECONDS = 30.0
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """One listening socket shared by every worker; the kernel spreads connections across them."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_models(registry, names: list[str]) -> list[str]:
+    """
+    Load `names` in the parent and move everything allocated so far into the
+    GC's permanent generation, so collections in the workers don't write to
+    (and thereby copy) the shared pages. Returns the models that loaded.
+    """
+    for name in names:
+        if not registry.is_enabled(name):
+            continue
+        try:
+            registry.get(name)
+        except RuntimeError as e:
+            # Workers retry on first use, like an unpreloaded deployment
+            logger.error(f"Preloading {name} failed: {e}")
+    gc.collect()
+    gc.freeze()
+    status = registry.status()
+    return [name for name in names if status.get(name, {}).get("state") == "loaded"]
+
+
+def threads_per_worker(workers: int, configured: int = 0) -> int:
+    return configured if configured > 0 else max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def limit_worker_threads(threads: int) -> None:
+    """
+    Cap torch and the BLAS/OpenMP pools of this process at `threads`. The
+    OMP/MKL/OPENBLAS_NUM_THREADS variables are only read when numpy loads,
+    which happened in the parent before fork, so the pools are resized here.
+    """
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+
+class PreforkSupervisor:
+    """
+    Forks `workers` children that each run `target()`, replaces children that
+    exit unexpectedly, and on SIGTERM/SIGINT forwards SIGTERM and waits for
+    every child to finish its in-flight requests.
+    """
+
+    def __init__(self, target: Callable[[], None], workers: int):
+        self.target = target
+        self.workers = workers
+        self.children: dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+        self.backoff = 0.0
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # Child: default signal handling, run the server, never return into the parent's code
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                self.target()
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def stop(self, *_) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        previous = {sig: signal.signal(sig, self.stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self._supervise()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def _supervise(self) -> None:
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info(f"Started {self.workers} workers: {sorted(self.children)}")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+
+            uptime = time.monotonic() - started
+            logger.warning(f"Worker {pid} exited with status {status} after {uptime:.1f}s; replacing it")
+            self.backoff = 0.0 if uptime >= MIN_WORKER_UPTIME_SECONDS else min(MAX_RESPAWN_BACKOFF_SECONDS, max(0.5, self.backoff * 2))
+            if self.backoff:
+                time.sleep(self.backoff)
+            if not self.stopping:
+                self.spawn()
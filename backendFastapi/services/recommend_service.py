@@ -0,0 +1,120 @@
+# services/recommend_service.py
+import os
+import threading
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from services.config import SONG_CATALOG_DIR, RECOMMEND_NPROBE, RECOMMEND_MAX_K
+from services.encoding import EMBEDDING_ENCODINGS, decode_embedding
+from services.executor import run_search
+from services.model_registry import DISABLED, FAILED, LOADED, NOT_LOADED
+from services.vector_index import SongIndex
+from services import userinput_service
+
+recommend_router = APIRouter()
+
+_song_index: SongIndex | None = None
+_song_index_error: str | None = None
+_song_index_lock = threading.Lock()
+
+
+def catalog_configured() -> bool:
+    return bool(SONG_CATALOG_DIR) and os.path.exists(os.path.join(SONG_CATALOG_DIR, "manifest.json"))
+
+
+def load_song_index() -> SongIndex | None:
+    """Blocking open of the memory-mapped catalog (reads ids.txt and the IVF lists); None if there is no catalog."""
+    global _song_index, _song_index_error
+    if _song_index is None and catalog_configured():
+        with _song_index_lock:
+            if _song_index is None:
+                try:
+                    _song_index = SongIndex(SONG_CATALOG_DIR, nprobe=RECOMMEND_NPROBE)
+                except Exception as e:
+                    _song_index_error = str(e)
+                    raise
+                _song_index_error = None
+    return _song_index
+
+
+def song_index_status() -> dict:
+    """Load state of the catalog index, in the shape /ready reports models in."""
+    if _song_index is not None:
+        state = LOADED
+    elif not catalog_configured():
+        state = DISABLED
+    else:
+        state = FAILED if _song_index_error is not None else NOT_LOADED
+    return {"state": state, "count": _song_index.count if _song_index is not None else None, "error": _song_index_error}
+
+
+async def get_song_index() -> SongIndex:
+    """The catalog index, opened on the search pool on first use if startup warmup hasn't already."""
+    if _song_index is not None:
+        return _song_index
+    if not catalog_configured():
+        raise HTTPException(status_code=503, detail="No song catalog is configured on this deployment.")
+    return await run_search(load_song_index)
+
+# ------------------------ #
+# Request/Response Schemas #
+# ------------------------ #
+class RecommendRequest(BaseModel):
+    text: str | None = None
+    # Either a float list, or a base64 string with `embedding_encoding` (see /analyze_text)
+    embedding: list[float] | str | None = None
+    embedding_encoding: str = "json"
+    embedding_scale: float | None = None
+    k: int = 10
+    mood: str | None = None
+    emotion: str | None = None
+
+class RecommendedTrack(BaseModel):
+    track_id: str
+    score: float
+
+class RecommendResponse(BaseModel):
+    tracks: list[RecommendedTrack]
+
+# ------------------------ #
+# API Endpoints            #
+# ------------------------ #
+@recommend_router.post("/", response_model=RecommendResponse)
+async def recommend_endpoint(input: RecommendRequest):
+    """
+    Return the top-k catalog tracks closest to an intent-context embedding,
+    or to the embedding of `text`. Optionally restrict to a mood and/or emotion.
+    """
+    if not 1 <= input.k <= RECOMMEND_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {RECOMMEND_MAX_K}.")
+
+    if input.embedding is not None:
+        if isinstance(input.embedding, str):
+            if input.embedding_encoding not in EMBEDDING_ENCODINGS[1:]:
+                raise HTTPException(status_code=400, detail="Base64 embeddings need embedding_encoding float32, float16 or int8.")
+            try:
+                query = decode_embedding(input.embedding, input.embedding_encoding, input.embedding_scale)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid embedding: {str(e)}")
+        else:
+            query = input.embedding
+    elif input.text:
+        query = (await userinput_service.analyze_text(input.text))["intent_context_embedding"]
+    else:
+        raise HTTPException(status_code=400, detail="Provide either `embedding` or `text`.")
+    # The fallback analysis (e.g. whitespace-only text) has an all-zero embedding, which matches nothing
+    if not np.any(np.asarray(query, dtype=np.float32)):
+        source = "`text`" if input.embedding is None else "`embedding`"
+        raise HTTPException(status_code=400, detail=f"{source} gives an all-zero embedding, so there is nothing to match.")
+
+    index = await get_song_index()
+    for name, value, codes in (("mood", input.mood, index.mood), ("emotion", input.emotion, index.emotion)):
+        if value is not None and codes is None:
+            raise HTTPException(status_code=400, detail=f"This song catalog has no {name} labels to filter on.")
+    try:
+        tracks = await run_search(index.search, query, input.k, input.mood, input.emotion)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RecommendResponse(tracks=tracks)
@@ -0,0 +1,273 @@
+# services/song_embeddings.py
+"""
+Offline pipeline that embeds song metadata into the catalog format read by
+services/vector_index.py, using the same sentence encoder as user texts.
+
+Track metadata is streamed from JSONL (e.g. the output of
+services/spotify_catalog.py) or CSV, turned into short text descriptors and
+encoded in large batches by a pool of worker processes. Finished chunks are
+appended in input order to vectors.f32 / ids.txt, and manifest.json records
+how far into the source the catalog has got, so a rerun resumes there.
+Appending rows removes any existing IVF index; pass --build-index (or run
+services/vector_index.py) to rebuild it.
+
+Only vectors and IDs are written: there are no mood.u8/emotion.u8 codes,
+so /recommend rejects mood/emotion filters on catalogs built here.
+
+    python -m services.song_embeddings tracks.jsonl CATALOG_DIR [--workers 4] [--build-index]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from services.prefork import limit_worker_threads
+from services.vector_index import build_index, remove_index
+
+_encoder = None
+
+
+# ------------------------ #
+# Source Reading           #
+# ------------------------ #
+def read_tracks(path: str) -> Iterator[dict]:
+    """Yield one dict per track; CSV by extension, JSONL otherwise ("-" reads stdin)."""
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    with stream:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _names(value) -> list[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(";") if part.strip()]
+    if isinstance(value, dict):
+        value = [value]
+    return [item["name"] if isinstance(item, dict) else str(item) for item in value]
+
+
+def build_descriptor(track: dict) -> str | None:
+    """
+    Short natural-language description of a track, e.g.
+    "Song 2 by Blur. Album: Blur. Genres: britpop, rock."
+    Returns None for records without an ID or a name, which are skipped.
+    """
+    if track.get("missing") or not track.get("id") or not track.get("name"):
+        return None
+    parts = [track["name"]]
+    artists = _names(track.get("artists") or track.get("artist"))
+    if artists:
+        parts[0] += " by " + ", ".join(artists)
+    album = _names(track.get("album"))
+    if album:
+        parts.append("Album: " + album[0])
+    genres = _names(track.get("genres"))
+    if genres:
+        parts.append("Genres: " + ", ".join(genres))
+    if track.get("description"):
+        parts.append(str(track["description"]))
+    return ". ".join(parts) + "."
+
+
+# ------------------------ #
+# Worker Processes         #
+# ------------------------ #
+def default_loader():
+    from services.config import INFERENCE_BACKEND
+    from services.userinput_service import TEXT_MODEL_LOADERS
+    return TEXT_MODEL_LOADERS[INFERENCE_BACKEND][2]()
+
+
+def _init_worker(loader: Callable, threads_per_worker: int) -> None:
+    global _encoder
+    # Keep each process to its share of cores instead of every BLAS pool grabbing all of them
+    limit_worker_threads(threads_per_worker)
+    _encoder = loader()
+
+
+def _encode_chunk(descriptors: list[str], batch_size: int) -> np.ndarray:
+    embeddings = _encoder.encode(descriptors, batch_size=batch_size, convert_to_numpy=True)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+
+# ------------------------ #
+# Catalog Writing          #
+# ------------------------ #
+def _write_manifest(catalog_dir: str, manifest: dict) -> None:
+    path = os.path.join(catalog_dir, "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def _truncate_lines(path: str, lines: int) -> None:
+    offset = 0
+    with open(path, "rb") as f:
+        for _ in range(lines):
+            line = f.readline()
+            if not line:
+                break
+            offset += len(line)
+    with open(path, "r+b") as f:
+        f.truncate(offset)
+
+
+def _open_catalog(catalog_dir: str) -> dict:
+    """Load the manifest and cut vectors/ids back to its count, dropping any half-written chunk."""
+    os.makedirs(catalog_dir, exist_ok=True)
+    manifest_path = os.path.join(catalog_dir, "manifest.json")
+    vectors_path = os.path.join(catalog_dir, "vectors.f32")
+    ids_path = os.path.join(catalog_dir, "ids.txt")
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    else:
+        manifest = {"dim": None, "count": 0, "source_records": 0}
+    manifest.setdefault("source_records", manifest["count"])
+
+    for path in (vectors_path, ids_path):
+        if not os.path.exists(path):
+            open(path, "wb").close()
+    with open(vectors_path, "r+b") as f:
+        f.truncate(manifest["count"] * (manifest["dim"] or 0) * 4)
+    _truncate_lines(ids_path, manifest["count"])
+    return manifest
+
+
+def _chunks(tracks: Iterable[dict], chunk_size: int) -> Iterator[tuple[int, list[str], list[str]]]:
+    """(records consumed, ids, descriptors) per chunk of `chunk_size` source records."""
+    tracks = iter(tracks)
+    while True:
+        records = list(islice(tracks, chunk_size))
+        if not records:
+            return
+        ids, descriptors = [], []
+        for track in records:
+            descriptor = build_descriptor(track)
+            if descriptor is not None:
+                ids.append(str(track["id"]))
+                descriptors.append(descriptor)
+        yield len(records), ids, descriptors
+
+
+def embed_catalog(
+    source: Iterable[dict],
+    catalog_dir: str,
+    loader: Callable | None = None,
+    workers: int = 2,
+    chunk_size: int = 4096,
+    batch_size: int = 128,
+    model_name: str | None = None,
+    progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Embed every track of `source` into `catalog_dir` and return the final manifest.
+
+    At most `2 * workers` chunks are in flight, so memory stays bounded no
+    matter how large the source is. Chunks are committed strictly in input
+    order: vectors and IDs first, then the manifest, which is the commit point.
+    """
+    loader = loader or default_loader
+    manifest = _open_catalog(catalog_dir)
+    tracks = iter(source)
+    # Skip what earlier runs already committed
+    for _ in islice(tracks, manifest["source_records"]):
+        pass
+    if model_name:
+        manifest["model"] = model_name
+
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    started = time.perf_counter()
+    embedded = 0
+    index_removed = False
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(loader, threads_per_worker)) as pool, \
+            open(os.path.join(catalog_dir, "vectors.f32"), "ab") as vectors_file, \
+            open(os.path.join(catalog_dir, "ids.txt"), "a", encoding="utf-8") as ids_file:
+        in_flight = deque()
+        chunks = _chunks(tracks, chunk_size)
+
+        def submit_next() -> bool:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            consumed, ids, descriptors = chunk
+            future = pool.submit(_encode_chunk, descriptors, batch_size) if descriptors else None
+            in_flight.append((consumed, ids, future))
+            return True
+
+        while len(in_flight) < 2 * workers and submit_next():
+            pass
+
+        while in_flight:
+            consumed, ids, future = in_flight.popleft()
+            if future is not None:
+                vectors = future.result()
+                if not index_removed:
+                    # The IVF index no longer covers the catalog once rows are appended
+                    remove_index(catalog_dir)
+                    index_removed = True
+                if manifest["dim"] is None:
+                    manifest["dim"] = int(vectors.shape[1])
+                vectors_file.write(vectors.tobytes())
+                ids_file.write("".join(track_id + "\n" for track_id in ids))
+                vectors_file.flush()
+                ids_file.flush()
+                os.fsync(vectors_file.fileno())
+                os.fsync(ids_file.fileno())
+            manifest["count"] += len(ids)
+            manifest["source_records"] += consumed
+            _write_manifest(catalog_dir, manifest)
+
+            embedded += len(ids)
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                progress({"count": manifest["count"], "embedded": embedded, "tracks_per_second": embedded / max(elapsed, 1e-9)})
+            submit_next()
+
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed song metadata into a memory-mapped catalog")
+    parser.add_argument("source", help="Track metadata as JSONL or CSV, or - for JSONL on stdin")
+    parser.add_argument("catalog_dir")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Tracks per worker task")
+    parser.add_argument("--batch-size", type=int, default=128, help="Texts per encoder forward pass")
+    parser.add_argument("--build-index", action="store_true", help="Rebuild the IVF index afterwards")
+    args = parser.parse_args()
+
+    from services.config import INFERENCE_BACKEND
+
+    def report(stats):
+        print(f"\r{stats['count']} tracks in catalog, {stats['tracks_per_second']:.0f} tracks/s", end="", file=sys.stderr)
+
+    started = time.perf_counter()
+    result = embed_catalog(
+        read_tracks(args.source), args.catalog_dir,
+        workers=args.workers, chunk_size=args.chunk_size, batch_size=args.batch_size,
+        model_name=f"all-mpnet-base-v2 ({INFERENCE_BACKEND})", progress=report,
+    )
+    print(file=sys.stderr)
+    if args.build_index and result["count"]:
+        build_index(args.catalog_dir)
+    print(f"Embedded {result['count']} tracks into {args.catalog_dir} in {time.perf_counter() - started:.1f}s")
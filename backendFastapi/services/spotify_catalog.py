@@ -0,0 +1,342 @@
+# services/spotify_catalog.py
+"""
+Bulk Spotify Web API client for catalog ingestion.
+
+Pulls metadata for large ID sets through the multi-ID endpoints, with a
+bounded number of requests in flight and a shared token bucket that pauses
+every worker when Spotify answers 429 with Retry-After. App tokens from the
+client-credentials flow are renewed before they expire and on 401. Results
+are appended to a JSONL file as batches complete; a checkpoint next to it
+records finished batches and the output offset, so an interrupted run
+resumes where it stopped.
+
+    python -m services.spotify_catalog track_ids.txt tracks.jsonl --endpoint tracks
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+import httpx
+
+from services.config import (
+    SPOTIFY_API_URL, SPOTIFY_TOKEN_URL, SPOTIFY_CONCURRENCY,
+    SPOTIFY_RATE_PER_SECOND, SPOTIFY_BURST, SPOTIFY_RETRIES,
+)
+
+# Endpoint -> (key holding the results, max IDs per call)
+BATCH_ENDPOINTS = {
+    "tracks": ("tracks", 50),
+    "audio-features": ("audio_features", 100),
+    "artists": ("artists", 50),
+    "albums": ("albums", 20),
+}
+
+
+class SpotifyAPIError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"Spotify API returned {status_code}: {detail}")
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """
+    Async token bucket. `pause()` empties it until a deadline, so one 429
+    holds back every worker instead of each one discovering the limit itself.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = max(self.updated, self.paused_until)
+
+
+def retry_after_seconds(response: httpx.Response, default: float = 1.0) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", default)))
+    except ValueError:
+        return default
+
+
+class ClientCredentials:
+    """
+    App-only access token from the client-credentials flow (catalog endpoints
+    need no user scopes). The token is renewed shortly before it expires, and
+    on demand when Spotify rejects it; concurrent renewals share one request.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        token_url: str = SPOTIFY_TOKEN_URL,
+        expiry_margin_seconds: float = 60.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.expiry_margin_seconds = expiry_margin_seconds
+        self.transport = transport
+        self.access_token: str | None = None
+        self.expires_at = 0.0
+        self.refreshes = 0
+        self._lock = asyncio.Lock()
+
+    async def token(self) -> str:
+        if self.access_token is None or time.monotonic() >= self.expires_at:
+            return await self.refresh(self.access_token)
+        return self.access_token
+
+    async def refresh(self, rejected: str | None = None) -> str:
+        """Fetch a new token unless another caller already replaced `rejected`."""
+        async with self._lock:
+            if self.access_token is not None and self.access_token != rejected and time.monotonic() < self.expires_at:
+                return self.access_token
+            async with httpx.AsyncClient(transport=self.transport) as client:
+                response = await client.post(
+                    self.token_url,
+                    data={"grant_type": "client_credentials"},
+                    auth=(self.client_id, self.client_secret),
+                )
+            if response.status_code != 200:
+                raise SpotifyAPIError(response.status_code, response.text)
+            body = response.json()
+            self.access_token = body["access_token"]
+            self.expires_at = time.monotonic() + float(body.get("expires_in", 3600)) - self.expiry_margin_seconds
+            self.refreshes += 1
+            return self.access_token
+
+
+# ------------------------ #
+# Checkpoint
+# ------------------------ #
+
+class Checkpoint:
+    """
+    Append-only log next to the output file. The header pins the run
+    parameters, including a hash of the IDs, so resuming with a different ID
+    list is refused instead of skipping batches it never fetched. Every later
+    line is a finished batch and the output size after it was written. On
+    resume the output is truncated to the last recorded size, dropping any
+    half-written batch.
+    """
+
+    def __init__(self, path: str, header: dict):
+        self.path = path
+        self.header = header
+        self.done: set[int] = set()
+        self.offset = 0
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            with open(self.path, "w") as f:
+                f.write(json.dumps(self.header) + "\n")
+            return
+
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+        if not lines or json.loads(lines[0]) != self.header:
+            raise ValueError(f"{self.path} belongs to a different ingestion run; delete it to start over")
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # Torn final line from an interrupted write
+            self.done.add(entry["batch"])
+            self.offset = max(self.offset, entry["offset"])
+
+    def record(self, batch: int, offset: int) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"batch": batch, "offset": offset}) + "\n")
+        self.done.add(batch)
+        self.offset = offset
+
+
+# ------------------------ #
+# Client
+# ------------------------ #
+
+class SpotifyCatalogClient:
+    """`access_token` is a fixed bearer token, or ClientCredentials to fetch and renew one."""
+
+    def __init__(
+        self,
+        access_token: str | ClientCredentials,
+        base_url: str = SPOTIFY_API_URL,
+        concurrency: int = SPOTIFY_CONCURRENCY,
+        rate_per_second: float = SPOTIFY_RATE_PER_SECOND,
+        burst: int = SPOTIFY_BURST,
+        retries: int = SPOTIFY_RETRIES,
+        backoff_seconds: float = 0.5,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.access_token = access_token
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.transport = transport
+        self.stats = {"requests": 0, "throttled": 0, "retried": 0, "unauthorized": 0}
+
+    async def _token(self) -> str:
+        if isinstance(self.access_token, ClientCredentials):
+            return await self.access_token.token()
+        return self.access_token
+
+    async def fetch_batch(self, client: httpx.AsyncClient, endpoint: str, ids: list[str]) -> list:
+        key, max_ids = BATCH_ENDPOINTS[endpoint]
+        if len(ids) > max_ids:
+            raise ValueError(f"{endpoint} takes at most {max_ids} IDs per call")
+
+        attempt = 0
+        reauthorized = False
+        while True:
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+            token = await self._token()
+            try:
+                response = await client.get(
+                    f"{self.base_url}/{endpoint}",
+                    params={"ids": ",".join(ids)},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code == 200:
+                    return response.json()[key]
+                if response.status_code == 429:
+                    # Rate limits don't count against retries; Spotify tells us exactly how long to wait
+                    self.stats["throttled"] += 1
+                    self.bucket.pause(retry_after_seconds(response))
+                    continue
+                if response.status_code == 401 and isinstance(self.access_token, ClientCredentials) and not reauthorized:
+                    # Expired or revoked early; one renewal per call, so bad credentials still fail fast
+                    reauthorized = True
+                    self.stats["unauthorized"] += 1
+                    await self.access_token.refresh(token)
+                    continue
+                if response.status_code < 500 or attempt >= self.retries:
+                    raise SpotifyAPIError(response.status_code, response.text)
+
+            self.stats["retried"] += 1
+            await asyncio.sleep(random.uniform(0, self.backoff_seconds * (2 ** attempt)))
+            attempt += 1
+
+    async def ingest(self, endpoint: str, ids: list[str], out_path: str, checkpoint_path: str | None = None) -> dict:
+        """
+        Fetch every ID and append one JSON object per line to `out_path`.
+        IDs Spotify doesn't know are written as {"id": ..., "missing": true}.
+        """
+        _, batch_size = BATCH_ENDPOINTS[endpoint]
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+        checkpoint = Checkpoint(
+            checkpoint_path or out_path + ".checkpoint",
+            {
+                "endpoint": endpoint,
+                "batch_size": batch_size,
+                "ids": len(ids),
+                "ids_sha256": hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest(),
+            },
+        )
+        checkpoint.load()
+
+        mode = "r+b" if os.path.exists(out_path) else "wb"
+        with open(out_path, mode) as out:
+            out.truncate(checkpoint.offset)
+            out.seek(checkpoint.offset)
+
+            pending: asyncio.Queue[int] = asyncio.Queue()
+            for index in range(len(batches)):
+                if index not in checkpoint.done:
+                    pending.put_nowait(index)
+            skipped = len(batches) - pending.qsize()
+            write_lock = asyncio.Lock()
+            written = 0
+
+            async def worker(client: httpx.AsyncClient) -> None:
+                nonlocal written
+                while True:
+                    try:
+                        index = pending.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    batch = batches[index]
+                    items = await self.fetch_batch(client, endpoint, batch)
+                    lines = [
+                        json.dumps(item if item is not None else {"id": item_id, "missing": True})
+                        for item_id, item in zip(batch, items)
+                    ]
+                    async with write_lock:
+                        out.write(("\n".join(lines) + "\n").encode("utf-8"))
+                        out.flush()
+                        checkpoint.record(index, out.tell())
+                        written += len(lines)
+
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            async with httpx.AsyncClient(limits=limits, transport=self.transport, timeout=30) as client:
+                workers = [asyncio.create_task(worker(client)) for _ in range(self.concurrency)]
+                try:
+                    await asyncio.gather(*workers)
+                except BaseException:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    raise
+
+        return {"batches": len(batches), "skipped_batches": skipped, "items": written, **self.stats}
+
+
+def read_ids(path: str) -> list[str]:
+    stream = sys.stdin if path == "-" else open(path)
+    with stream:
+        return [line.strip() for line in stream if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-fetch Spotify catalog metadata into JSONL")
+    parser.add_argument("ids", help="File with one Spotify ID per line, or - for stdin")
+    parser.add_argument("out", help="Output JSONL file (appended to and resumed from its checkpoint)")
+    parser.add_argument("--endpoint", choices=sorted(BATCH_ENDPOINTS), default="tracks")
+    parser.add_argument("--concurrency", type=int, default=SPOTIFY_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=SPOTIFY_RATE_PER_SECOND, help="Requests per second")
+    args = parser.parse_args()
+
+    token = os.getenv("SPOTIFY_ACCESS_TOKEN") or ClientCredentials(os.environ["SPOTIFY_CLIENT_ID"], os.environ["SPOTIFY_CLIENT_SECRET"])
+
+    started = time.perf_counter()
+    catalog_client = SpotifyCatalogClient(token, concurrency=args.concurrency, rate_per_second=args.rate)
+    result = asyncio.run(catalog_client.ingest(args.endpoint, read_ids(args.ids), args.out))
+    elapsed = time.perf_counter() - started
+    print(json.dumps({**result, "seconds": round(elapsed, 1), "items_per_second": round(result["items"] / max(elapsed, 1e-9), 1)}))
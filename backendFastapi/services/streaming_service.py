@@ -0,0 +1,165 @@
+# services/streaming_service.py
+import json
+
+import numpy as np
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from services.admission import Overloaded
+from services.audio_preprocessing import SAMPLE_RATE, trim_silence
+from services.config import STREAM_PARTIAL_INTERVAL_S, STREAM_WINDOW_S, STREAM_MAX_SECONDS, VAD_ENABLED
+from services.encoding import serialize_result
+from services.executor import run_audio_inference
+from services import userinput_service
+from services.userinput_service import NO_SPEECH_TEXT, admit, analyze_text, transcribe_samples
+
+stream_router = APIRouter()
+
+# Close codes (RFC 6455 / IANA registry)
+WS_POLICY_VIOLATION = 1008
+WS_MESSAGE_TOO_BIG = 1009
+WS_TRY_AGAIN_LATER = 1013
+
+
+class TranscriptionStream:
+    """
+    Rolling-window transcription of an incoming PCM stream.
+
+    Audio is buffered in the current window and re-transcribed every
+    `partial_interval_s` seconds of new audio. Once the window reaches
+    `window_s` its text is committed and a fresh window starts, so each
+    Whisper pass stays bounded no matter how long the stream runs. Passes
+    are admitted through the audio lane like uploads; one that is shed
+    raises `Overloaded` and leaves the window as it was.
+    """
+
+    def __init__(self, partial_interval_s: float = STREAM_PARTIAL_INTERVAL_S, window_s: float = STREAM_WINDOW_S):
+        self.partial_interval = int(partial_interval_s * SAMPLE_RATE)
+        self.window = int(window_s * SAMPLE_RATE)
+        self.committed: list[str] = []
+        self.chunks: list[np.ndarray] = []
+        self.window_samples = 0
+        self.transcribed_samples = 0
+        self.total_samples = 0
+        self._remainder = b""
+
+    def append_pcm16(self, data: bytes) -> None:
+        data = self._remainder + data
+        # Keep an odd trailing byte for the next frame
+        usable = len(data) - len(data) % 2
+        self._remainder = data[usable:]
+        if not usable:
+            return
+        samples = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+        self.chunks.append(samples)
+        self.window_samples += len(samples)
+        self.total_samples += len(samples)
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.total_samples / SAMPLE_RATE
+
+    def partial_due(self) -> bool:
+        return self.window_samples - self.transcribed_samples >= self.partial_interval
+
+    def _window_audio(self) -> np.ndarray:
+        if not self.chunks:
+            return np.zeros(0, dtype=np.float32)
+        audio = np.concatenate(self.chunks)
+        self.chunks = [audio]
+        return audio
+
+    async def _transcribe_window(self) -> str:
+        audio = self._window_audio()
+        samples = len(audio)
+        if VAD_ENABLED:
+            audio = trim_silence(audio)
+        # Prompt with the tail of the committed text so words stay consistent across windows
+        prompt = " ".join(self.committed)[-200:] or None
+        async with admit(userinput_service.audio_lane):
+            text = await run_audio_inference(transcribe_samples, audio, initial_prompt=prompt)
+        self.transcribed_samples = samples
+        return "" if text == NO_SPEECH_TEXT else text
+
+    def _text(self, window_text: str) -> str:
+        return " ".join(part for part in self.committed + [window_text] if part)
+
+    async def transcribe_partial(self) -> str:
+        window_text = await self._transcribe_window()
+        if self.window_samples >= self.window:
+            if window_text:
+                self.committed.append(window_text)
+            self.chunks = []
+            self.window_samples = 0
+            self.transcribed_samples = 0
+            return self._text("")
+        return self._text(window_text)
+
+    async def finish(self) -> str:
+        window_text = await self._transcribe_window() if self.window_samples else ""
+        return self._text(window_text) or NO_SPEECH_TEXT
+
+
+def _is_end_message(text: str) -> bool:
+    if text.strip().lower() == "end":
+        return True
+    try:
+        return json.loads(text).get("type") == "end"
+    except (ValueError, AttributeError):
+        return False
+
+
+@stream_router.websocket("/stream_audio")
+async def stream_audio_endpoint(websocket: WebSocket):
+    """
+    Stream raw 16 kHz mono PCM16 (little-endian) audio as binary frames.
+    The server replies with `{"type": "partial", "text": ...}` messages while
+    audio arrives. Send `{"type": "end"}` (or "end") when recording stops to
+    receive `{"type": "final", "text", "mood", "emotion", "intent_context_embedding"}`.
+    Sockets beyond the stream cap, and streams whose final pass is shed,
+    are closed with 1013 (try again later); partials are simply skipped
+    while the audio lane is full.
+    """
+    if not all(userinput_service.model_registry.is_enabled(name) for name in ["whisper"] + userinput_service.TEXT_MODELS):
+        await websocket.close(code=WS_TRY_AGAIN_LATER, reason="Streaming models are not served by this deployment")
+        return
+
+    try:
+        async with admit(userinput_service.stream_lane):
+            await _serve_stream(websocket)
+    except Overloaded as e:
+        await websocket.close(code=WS_TRY_AGAIN_LATER, reason=str(e))
+
+
+async def _serve_stream(websocket: WebSocket) -> None:
+    await websocket.accept()
+    stream = TranscriptionStream(STREAM_PARTIAL_INTERVAL_S, STREAM_WINDOW_S)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                stream.append_pcm16(message["bytes"])
+                if stream.duration_seconds > STREAM_MAX_SECONDS:
+                    await websocket.close(code=WS_MESSAGE_TOO_BIG, reason="Stream exceeds maximum duration")
+                    return
+                if stream.partial_due():
+                    try:
+                        partial = await stream.transcribe_partial()
+                    except Overloaded:
+                        # Retried on the next frame, with more audio in the window
+                        continue
+                    await websocket.send_json({"type": "partial", "text": partial})
+            elif message.get("text") is not None:
+                if _is_end_message(message["text"]):
+                    break
+                await websocket.close(code=WS_POLICY_VIOLATION, reason="Unexpected text message")
+                return
+
+        text = await stream.finish()
+        async with admit(userinput_service.text_lane):
+            result = await analyze_text(text)
+        await websocket.send_json({"type": "final", "text": text, **serialize_result(result)})
+        await websocket.close()
+    except WebSocketDisconnect:
+        return
@@ -0,0 +1,248 @@
+# services/tokenization.py
+"""
+Shared, length-bucketed tokenization for the text models.
+
+The mood and emotion models are both RoBERTa-family and share a vocabulary,
+so a batch is tokenized once per tokenizer family and the token IDs are fed
+to each model directly instead of through their pipelines. Inputs are split
+into overlapping windows when longer than the model limit, windows are
+sorted by length and packed into forward passes under a padded-token budget,
+and window outputs are pooled back per input:
+
+    classifiers   token-weighted mean of the window probabilities
+    encoder       mean of token embeddings across all windows, L2-normalized
+"""
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+
+from services.config import TOKEN_WINDOW_MAX, TOKEN_WINDOW_OVERLAP, MAX_BATCH_TOKENS
+
+# Weak keys: an entry goes with its tokenizer, so a recycled id() can't inherit another's family
+_family_keys: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_family_lock = threading.Lock()
+
+
+class TokenizationStats:
+    """Real vs padded tokens sent to the models, i.e. how much compute padding wastes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.tokenize_calls = 0
+        self.forward_passes = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.windowed_inputs = 0
+
+    def record_tokenize(self) -> None:
+        with self._lock:
+            self.tokenize_calls += 1
+
+    def record_windowed(self) -> None:
+        with self._lock:
+            self.windowed_inputs += 1
+
+    def record_forward(self, lengths: list[int]) -> None:
+        with self._lock:
+            self.forward_passes += 1
+            self.real_tokens += sum(lengths)
+            self.padded_tokens += max(lengths) * len(lengths)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "tokenize_calls": self.tokenize_calls,
+                "forward_passes": self.forward_passes,
+                "real_tokens": self.real_tokens,
+                "padded_tokens": self.padded_tokens,
+                "padding_ratio": 1 - self.real_tokens / self.padded_tokens if self.padded_tokens else 0.0,
+                "windowed_inputs": self.windowed_inputs,
+            }
+
+
+tokenization_stats = TokenizationStats()
+
+
+# ------------------------ #
+# Tokenizer Families       #
+# ------------------------ #
+def tokenizer_family(tokenizer) -> str:
+    """
+    Tokenizers with the same class and vocabulary produce identical IDs, so
+    they share one tokenization pass. The fingerprint is computed once per
+    tokenizer object.
+    """
+    family = _family_keys.get(tokenizer)
+    if family is None:
+        with _family_lock:
+            family = _family_keys.get(tokenizer)
+            if family is None:
+                vocab = sorted(tokenizer.get_vocab().items())
+                digest = hashlib.sha1(repr(vocab).encode("utf-8")).hexdigest()
+                family = _family_keys[tokenizer] = f"{type(tokenizer).__name__}:{digest}"
+    return family
+
+
+class SharedTokenization:
+    """Token IDs (no special tokens, no padding) for one batch of texts, per tokenizer family."""
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self._ids: dict[str, list[list[int]]] = {}
+
+    def token_ids(self, tokenizer) -> list[list[int]]:
+        family = tokenizer_family(tokenizer)
+        if family not in self._ids:
+            encoded = tokenizer(self.texts, add_special_tokens=False, truncation=False)
+            self._ids[family] = [list(ids) for ids in encoded["input_ids"]]
+            tokenization_stats.record_tokenize()
+        return self._ids[family]
+
+
+# ------------------------ #
+# Windows and Buckets      #
+# ------------------------ #
+def split_windows(ids: list[int], size: int, overlap: int) -> list[list[int]]:
+    """Overlapping windows of at most `size` tokens covering `ids`."""
+    if len(ids) <= size:
+        return [ids]
+    step = size - min(overlap, size // 2)
+    windows = []
+    for start in range(0, len(ids), step):
+        windows.append(ids[start:start + size])
+        if start + size >= len(ids):
+            break
+    return windows
+
+
+def length_buckets(lengths: list[int], max_batch_tokens: int) -> list[list[int]]:
+    """
+    Group indices so each group, padded to its longest member, stays within
+    `max_batch_tokens`. Sorting first keeps similar lengths together.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    buckets, current = [], []
+    for index in order:
+        # Ascending order: the newest member is the longest in the bucket
+        if current and (len(current) + 1) * lengths[index] > max_batch_tokens:
+            buckets.append(current)
+            current = []
+        current.append(index)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def _forward_windows(forward, tokenizer, token_ids: list[list[int]], max_length: int):
+    """
+    Run `forward(input_ids, attention_mask)` over every window of every input.
+    Yields (input index, window length, output row) in no particular order.
+    """
+    content_length = max_length - tokenizer.num_special_tokens_to_add(pair=False)
+    windows, owners = [], []
+    for index, ids in enumerate(token_ids):
+        pieces = split_windows(ids, content_length, TOKEN_WINDOW_OVERLAP)
+        if len(pieces) > 1:
+            tokenization_stats.record_windowed()
+        for piece in pieces:
+            windows.append(tokenizer.build_inputs_with_special_tokens(piece))
+            owners.append(index)
+
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+    lengths = [len(window) for window in windows]
+    for bucket in length_buckets(lengths, MAX_BATCH_TOKENS):
+        width = max(lengths[i] for i in bucket)
+        input_ids = np.full((len(bucket), width), pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(bucket), width), dtype=np.int64)
+        for row, i in enumerate(bucket):
+            input_ids[row, :lengths[i]] = windows[i]
+            attention_mask[row, :lengths[i]] = 1
+        tokenization_stats.record_forward([lengths[i] for i in bucket])
+
+        outputs = forward(input_ids, attention_mask)
+        for row, i in enumerate(bucket):
+            yield owners[i], lengths[i], outputs[row]
+
+
+def _run_model(model, input_ids: np.ndarray, attention_mask: np.ndarray, output: str) -> np.ndarray:
+    """Call a PyTorch or ONNX Runtime (optimum) model and return `output` as float32 NumPy."""
+    try:
+        import torch
+    except ImportError:
+        torch = None
+
+    if torch is not None and isinstance(model, torch.nn.Module):
+        device = next(model.parameters()).device
+        with torch.inference_mode():
+            result = model(input_ids=torch.from_numpy(input_ids).to(device), attention_mask=torch.from_numpy(attention_mask).to(device))
+        return getattr(result, output).float().cpu().numpy()
+    result = model(input_ids=input_ids, attention_mask=attention_mask)
+    return np.asarray(getattr(result, output), dtype=np.float32)
+
+
+def _max_length(tokenizer, limit: int | None = None) -> int:
+    # Some tokenizers report a huge sentinel model_max_length; never exceed the model limit
+    return min(getattr(tokenizer, "model_max_length", None) or TOKEN_WINDOW_MAX, limit or TOKEN_WINDOW_MAX, TOKEN_WINDOW_MAX)
+
+
+# ------------------------ #
+# Models                   #
+# ------------------------ #
+def _encoder_parts(encoder):
+    """(tokenizer, model, max_length) for the sentence encoders we serve, else None."""
+    if hasattr(encoder, "tokenizer") and hasattr(encoder, "max_length") and hasattr(encoder, "model"):
+        return encoder.tokenizer, encoder.model, encoder.max_length  # OnnxSentenceEncoder
+    if hasattr(encoder, "tokenizer") and hasattr(encoder, "max_seq_length"):
+        return encoder.tokenizer, encoder[0].auto_model, encoder.max_seq_length  # SentenceTransformer
+    return None
+
+
+def supports_shared_tokenization(*models) -> bool:
+    """True when every model exposes its tokenizer and underlying network (not test fakes)."""
+    *classifiers, encoder = models
+    return all(hasattr(p, "tokenizer") and hasattr(p, "model") for p in classifiers) and _encoder_parts(encoder) is not None
+
+
+def classify(pipeline, shared: SharedTokenization) -> list[str]:
+    """Top label per text from a text-classification pipeline's model, pooled over windows."""
+    tokenizer, model = pipeline.tokenizer, pipeline.model
+    token_ids = shared.token_ids(tokenizer)
+    probabilities = np.zeros((len(token_ids), model.config.num_labels), dtype=np.float64)
+
+    def forward(input_ids, attention_mask):
+        logits = _run_model(model, input_ids, attention_mask, "logits")
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    for index, length, probs in _forward_windows(forward, tokenizer, token_ids, _max_length(tokenizer)):
+        # Weighting by window length; the argmax doesn't need the division by total length
+        probabilities[index] += length * probs
+
+    return [model.config.id2label[int(label)] for label in np.argmax(probabilities, axis=1)]
+
+
+def embed(encoder, shared: SharedTokenization) -> np.ndarray:
+    """Mean-pooled, L2-normalized sentence embeddings; long inputs pool over all their windows."""
+    tokenizer, model, max_length = _encoder_parts(encoder)
+    token_ids = shared.token_ids(tokenizer)
+    sums = None
+    counts = np.zeros(len(token_ids), dtype=np.float32)
+
+    def forward(input_ids, attention_mask):
+        hidden = _run_model(model, input_ids, attention_mask, "last_hidden_state")
+        return hidden * attention_mask[..., None]
+
+    for index, length, masked in _forward_windows(forward, tokenizer, token_ids, _max_length(tokenizer, max_length)):
+        if sums is None:
+            sums = np.zeros((len(token_ids), masked.shape[-1]), dtype=np.float32)
+        sums[index] += masked.sum(axis=0)
+        counts[index] += length
+
+    pooled = sums / np.clip(counts, 1, None)[:, None]
+    return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
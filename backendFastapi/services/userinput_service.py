@@ -1,29 +1,109 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+import time
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Query
 from pydantic import BaseModel
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
-import whisper
-import torch
-import tempfile
-import os
+import numpy as np
+from services.batching import MicroBatcher
+from services.config import (
+    BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, TEXT_POOL_SIZE, ENABLED_MODELS, WHISPER_MODEL_SIZE,
+    CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL_SECONDS, CACHE_DB_PATH,
+    INFERENCE_BACKEND, VAD_ENABLED, SHARED_TOKENIZATION, ADMISSION_ENABLED, TEXT_MAX_CONCURRENT, TEXT_MAX_QUEUE,
+    AUDIO_MAX_CONCURRENT, AUDIO_MAX_QUEUE, STREAM_MAX_CONCURRENT, WHISPER_TIERS, WHISPER_LATENCY_BUDGET_MS, WHISPER_LANGUAGE, WHISPER_BEAM_SIZE,
+)
+from services.admission import AdmissionLane
+from services.audio_preprocessing import SAMPLE_RATE, AudioDecodeError, decode_audio, trim_silence
+from services.cache import AnalysisCache, SQLiteStore, make_cache_key
+from services.encoding import ENCODED_RESPONSES, encoded_response
+from services.executor import audio_executor, run_audio_inference, run_text_inference
+from services.metrics import (
+    ADMISSION_ACTIVE, ADMISSION_DECISIONS, CACHE_HIT_RATIO, CACHE_LOOKUPS, MODEL_LOAD_SECONDS, QUEUE_DEPTH,
+    WHISPER_TIER_CHOICES, stage,
+)
+from services.model_registry import ModelRegistry
+from services.whisper_tiers import TierSelector, WhisperTier, build_tiers
+from services.tokenization import SharedTokenization, classify, embed, supports_shared_tokenization, tokenization_stats
 
 input_router = APIRouter()
 
 # ------------------------ #
 # Model Loading Section    #
 # ------------------------ #
-try:
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+# Heavy ML libraries are imported inside the loaders, so a replica that never
+# touches a model (e.g. GeoIP-only) never pays for torch/transformers.
+MOOD_MODEL_ID = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+EMOTION_MODEL_ID = "j-hartmann/emotion-english-distilroberta-base"
+INTENT_CONTEXT_MODEL_ID = "all-mpnet-base-v2"
+INTENT_CONTEXT_ONNX_MODEL_ID = "sentence-transformers/all-mpnet-base-v2"
 
+def get_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def load_whisper_model(size: str = WHISPER_MODEL_SIZE):
+    import whisper
     # Load Whisper model for local speech-to-text
-    whisper_model = whisper.load_model("small").to(device)  # Change to "base" or "medium" for better accuracy
+    return whisper.load_model(size).to(get_device())  # Set WHISPER_MODEL_SIZE to "base" or "medium" for better accuracy
+
+def load_mood_pipeline():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=MOOD_MODEL_ID, device=0 if get_device() == "cuda" else -1)
+
+def load_emotion_pipeline():
+    from transformers import pipeline
+    return pipeline("text-classification", model=EMOTION_MODEL_ID, top_k=None, device=0 if get_device() == "cuda" else -1)
+
+def load_intent_context_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(INTENT_CONTEXT_MODEL_ID)
+
+# Quantized ONNX Runtime variants for CPU-only nodes (INFERENCE_BACKEND=onnx)
+def load_onnx_mood_pipeline():
+    from services.onnx_backend import load_classification_pipeline
+    return load_classification_pipeline("sentiment-analysis", MOOD_MODEL_ID)
+
+def load_onnx_emotion_pipeline():
+    from services.onnx_backend import load_classification_pipeline
+    return load_classification_pipeline("text-classification", EMOTION_MODEL_ID, top_k=None)
+
+def load_onnx_intent_context_model():
+    from services.onnx_backend import OnnxSentenceEncoder
+    return OnnxSentenceEncoder(INTENT_CONTEXT_ONNX_MODEL_ID)
 
-    # Load NLP models (Updated for higher accuracy)
-    mood_pipeline = pipeline("sentiment-analysis", model="cardiffnlp/twitter-roberta-base-sentiment-latest", device=0 if torch.cuda.is_available() else -1)
-    emotion_pipeline = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", top_k=None, device=0 if torch.cuda.is_available() else -1)
-    intent_context_model = SentenceTransformer("all-mpnet-base-v2")
-except Exception as e:
-    raise RuntimeError(f"Error loading models: {e}")
+TEXT_MODEL_LOADERS = {
+    "torch": (load_mood_pipeline, load_emotion_pipeline, load_intent_context_model),
+    "onnx": (load_onnx_mood_pipeline, load_onnx_emotion_pipeline, load_onnx_intent_context_model),
+}
+
+def text_model_loaders(backend: str) -> tuple:
+    """(mood, emotion, intent_context) loaders for an INFERENCE_BACKEND value."""
+    if backend not in TEXT_MODEL_LOADERS:
+        raise RuntimeError(f"Unknown INFERENCE_BACKEND '{backend}', expected one of {list(TEXT_MODEL_LOADERS)}")
+    return TEXT_MODEL_LOADERS[backend]
+
+mood_loader, emotion_loader, intent_context_loader = text_model_loaders(INFERENCE_BACKEND)
+# The backend is part of the version, so cached results never mix torch and int8 outputs
+backend_suffix = "" if INFERENCE_BACKEND == "torch" else f"@{INFERENCE_BACKEND}-int8"
+
+model_registry = ModelRegistry(enabled=ENABLED_MODELS)
+model_registry.register("whisper", load_whisper_model, version=f"whisper-{WHISPER_MODEL_SIZE}")
+# Faster Whisper sizes picked per clip by latency budget and load; served wherever the main Whisper is
+whisper_selector = TierSelector(
+    build_tiers(WHISPER_TIERS, WHISPER_MODEL_SIZE),
+    default_budget_s=WHISPER_LATENCY_BUDGET_MS / 1000 if WHISPER_LATENCY_BUDGET_MS > 0 else None,
+)
+for _tier in whisper_selector.tiers:
+    if _tier.model_name != "whisper":
+        model_registry.register(
+            _tier.model_name, partial(load_whisper_model, _tier.size),
+            version=f"whisper-{_tier.size}", enabled=model_registry.is_enabled("whisper"),
+        )
+WHISPER_MODELS = [tier.model_name for tier in whisper_selector.tiers]
+model_registry.register("mood", mood_loader, version=MOOD_MODEL_ID + backend_suffix)
+model_registry.register("emotion", emotion_loader, version=EMOTION_MODEL_ID + backend_suffix)
+model_registry.register("intent_context", intent_context_loader, version=INTENT_CONTEXT_MODEL_ID + backend_suffix)
+
+TEXT_MODELS = ["mood", "emotion", "intent_context"]
 
 # ------------------------ #
 # Request/Response Schemas #
@@ -36,69 +116,299 @@ class UserInputResponse(BaseModel):
     emotion: str
     intent_context_embedding: list[float]
 
+class EncodedUserInputResponse(BaseModel):
+    """JSON body when `embedding_encoding` is float32, float16 or int8."""
+    mood: str
+    emotion: str
+    intent_context_embedding: str  # base64 of the packed little-endian values
+    embedding_encoding: str
+    embedding_dim: int
+    embedding_scale: float | None = None  # int8 only
+
 # ------------------------ #
 # Helper Functions         #
 # ------------------------ #
-async def extract_text_from_audio(file: UploadFile) -> str:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-        temp_audio.write(await file.read())
-        temp_audio.flush()
-        audio_path = temp_audio.name
+NO_SPEECH_TEXT = "Unable to recognize speech"
 
+def transcribe_samples(samples, model_name: str = "whisper", **options) -> str:
+    """Blocking Whisper pass over 16 kHz float32 samples; run it on the audio pool."""
+    if samples.size == 0:
+        return NO_SPEECH_TEXT
+    if WHISPER_LANGUAGE:
+        # A known language skips Whisper's detection pass over the first 30 seconds
+        options.setdefault("language", WHISPER_LANGUAGE)
+    whisper_model = model_registry.get(model_name)
+    with stage("whisper"):
+        result = whisper_model.transcribe(samples, **options)
+    return result["text"].strip() if result["text"].strip() else NO_SPEECH_TEXT
+
+def decoding_options(tier: WhisperTier, language: str | None = None) -> dict:
+    """Whisper options for `tier`: plain greedy on the fast tier, WHISPER_BEAM_SIZE beams elsewhere."""
+    options = {"language": language} if language else {}
+    if whisper_selector.is_fast_tier(tier):
+        # One greedy pass, no re-decoding at higher temperatures and no conditioning on earlier windows
+        options.update(temperature=0.0, beam_size=None, best_of=None, condition_on_previous_text=False)
+    elif WHISPER_BEAM_SIZE > 0:
+        options.update(beam_size=WHISPER_BEAM_SIZE)
+    return options
+
+def audio_backlog() -> tuple[int, int]:
+    """Audio requests waiting for a slot and how many run at once: from the lane, or the audio pool without admission control."""
+    if ADMISSION_ENABLED:
+        return audio_lane.waiting, audio_lane.max_concurrent
+    return audio_executor._work_queue.qsize(), audio_executor._max_workers
+
+def choose_whisper_tier(duration_s: float, deadline: float | None = None) -> WhisperTier:
+    """
+    The most accurate Whisper expected to finish by `deadline` (time.monotonic()),
+    leaning towards faster tiers while audio requests wait behind this one (see TierSelector).
+    """
+    budget_s = deadline - time.monotonic() if deadline is not None else None
+    tier = whisper_selector.choose(duration_s, budget_s, *audio_backlog())
+    if tier is not whisper_selector.most_accurate:
+        audio_lane.count_degraded()
+    return tier
+
+def transcribe_audio_bytes(audio_bytes: bytes, deadline: float | None = None, language: str | None = None) -> str:
+    """Blocking Whisper transcription of an uploaded clip; run it on the audio pool."""
+    # Decode in memory and cut silence, since Whisper compute scales with clip length
+    with stage("audio_decode"):
+        samples = decode_audio(audio_bytes)
+    if VAD_ENABLED:
+        with stage("vad"):
+            samples = trim_silence(samples)
+    if samples.size == 0:
+        return NO_SPEECH_TEXT
+    duration_s = samples.size / SAMPLE_RATE
+    tier = choose_whisper_tier(duration_s, deadline)
+    # Load before the clock starts, so a cold tier's load time doesn't end up in its compute estimate
+    model_registry.get(tier.model_name)
+    started = time.perf_counter()
+    text = transcribe_samples(samples, tier.model_name, **decoding_options(tier, language))
+    whisper_selector.observe(tier, duration_s, time.perf_counter() - started)
+    return text
+
+async def extract_text_from_audio(file: UploadFile, deadline: float | None = None, language: str | None = None) -> str:
+    require_models(["whisper"])
+    with stage("upload_read"):
+        audio_bytes = await file.read()
     try:
-        result = whisper_model.transcribe(audio_path)
-        os.remove(audio_path)  # Cleanup temp file
-        return result["text"].strip() if result["text"].strip() else "Unable to recognize speech"
+        return await run_audio_inference(transcribe_audio_bytes, audio_bytes, deadline, language)
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid audio file: {str(e)}")
     except Exception as e:
-        os.remove(audio_path)
         raise HTTPException(status_code=500, detail=f"Audio transcription error: {str(e)}")
 
+FALLBACK_RESULT = {
+    "mood": "neutral",
+    "emotion": "neutral",
+    "intent_context_embedding": np.zeros(768, dtype=np.float32)
+}
+
+def analyze_texts_batch(texts: list[str]) -> list[dict]:
+    """
+    Run mood, emotion and intent-context models over a batch of texts in one call each.
+    Results are returned in the same order as `texts`. Embeddings stay float32
+    arrays until the response is serialized.
+    """
+    mood_pipeline = model_registry.get("mood")
+    emotion_pipeline = model_registry.get("emotion")
+    intent_context_model = model_registry.get("intent_context")
+
+    if SHARED_TOKENIZATION and supports_shared_tokenization(mood_pipeline, emotion_pipeline, intent_context_model):
+        # One tokenization per tokenizer family, length-bucketed forward passes, long inputs windowed
+        shared = SharedTokenization(texts)
+        with stage("mood"):
+            moods = classify(mood_pipeline, shared)
+        with stage("emotion"):
+            emotions = classify(emotion_pipeline, shared)
+        with stage("embedding"):
+            embeddings = embed(intent_context_model, shared)
+    else:
+        # Extract mood
+        with stage("mood"):
+            mood_results = mood_pipeline(texts, batch_size=len(texts))
+        # Extract emotion
+        with stage("emotion"):
+            emotion_results = emotion_pipeline(texts, batch_size=len(texts))
+        # Generate intent-context embeddings
+        with stage("embedding"):
+            embeddings = intent_context_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+        moods = [mood_result["label"] if mood_result else "neutral" for mood_result in mood_results]
+        emotions = [
+            max(emotion_scores, key=lambda x: x["score"])["label"] if emotion_scores else "neutral"
+            for emotion_scores in emotion_results
+        ]
+
+    results = []
+    for mood, emotion, embedding in zip(moods, emotions, embeddings):
+        results.append({
+            "mood": mood,
+            "emotion": emotion,
+            "intent_context_embedding": np.asarray(embedding, dtype=np.float32)
+        })
+    return results
+
+# Concurrent analyze_text calls are grouped and sent through the models together
+# and run on the text inference pool, keeping the event loop free
+text_batcher = MicroBatcher(
+    analyze_texts_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    runner=run_text_inference,
+    max_concurrent_batches=TEXT_POOL_SIZE,
+    name="text",
+)
+
+def require_models(names: list[str]) -> None:
+    for name in names:
+        if not model_registry.is_enabled(name):
+            raise HTTPException(status_code=503, detail=f"Model '{name}' is not served by this deployment.")
+
+# ------------------------ #
+# Admission Control        #
+# ------------------------ #
+# Text and audio get separate budgets, so a burst of uploads can't queue ahead of cheap text calls;
+# a full lane answers 503 + Retry-After (see main.py) instead of growing without bound
+text_lane = AdmissionLane("text", TEXT_MAX_CONCURRENT, TEXT_MAX_QUEUE, expected_seconds=0.1)
+audio_lane = AdmissionLane("audio", AUDIO_MAX_CONCURRENT, AUDIO_MAX_QUEUE, expected_seconds=2.0)
+# A stream holds its slot for the whole session; its Whisper passes still go through audio_lane
+stream_lane = AdmissionLane("stream", STREAM_MAX_CONCURRENT, 0, expected_seconds=60.0)
+
+@asynccontextmanager
+async def admit(lane: AdmissionLane):
+    async with (lane.admit() if ADMISSION_ENABLED else nullcontext()):
+        yield
+
+# Results keyed on normalized text + model versions, so a model upgrade invalidates old entries
+analysis_cache = AnalysisCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    store=SQLiteStore(CACHE_DB_PATH) if CACHE_DB_PATH else None,
+)
+
+# Scrape-time gauges; read the module globals so swapped-in registries/caches are picked up
+QUEUE_DEPTH.track(("text_batcher",), lambda: text_batcher.queue_depth)
+for _name in [*WHISPER_MODELS, *TEXT_MODELS]:
+    MODEL_LOAD_SECONDS.track((_name,), lambda name=_name: model_registry.status().get(name, {}).get("load_seconds"))
+def _track_lane(name: str, get_lane) -> None:
+    QUEUE_DEPTH.track((f"{name}_admission",), lambda: get_lane().waiting)
+    ADMISSION_ACTIVE.track((name,), lambda: get_lane().active)
+    for result in ("admitted", "rejected", "degraded"):
+        ADMISSION_DECISIONS.track((name, result), lambda result=result: getattr(get_lane(), result))
+
+_track_lane("text", lambda: text_lane)
+_track_lane("audio", lambda: audio_lane)
+_track_lane("stream", lambda: stream_lane)
+for _tier in whisper_selector.tiers:
+    WHISPER_TIER_CHOICES.track((_tier.size,), lambda size=_tier.size: whisper_selector.chosen[size])
+CACHE_HIT_RATIO.track(("analysis",), lambda: analysis_cache.stats()["hit_rate"])
+CACHE_LOOKUPS.track(("analysis", "hit"), lambda: analysis_cache.hits)
+CACHE_LOOKUPS.track(("analysis", "miss"), lambda: analysis_cache.misses)
+CACHE_LOOKUPS.track(("analysis", "coalesced"), lambda: analysis_cache.coalesced)
+
 async def analyze_text(text: str) -> dict:
+    require_models(TEXT_MODELS)
     text = text.strip()
     
     # Fallback if empty text or unrecognized audio
-    if not text or text == "Unable to recognize speech":
-        return {
-            "mood": "neutral",
-            "emotion": "neutral",
-            "intent_context_embedding": [0.0] * 768
-        }
-
-    # Extract mood
-    mood_result = mood_pipeline(text)
-    mood = mood_result[0]['label'] if mood_result else "neutral"
-
-    # Extract emotion
-    emotion_scores = emotion_pipeline(text)
-    emotion = max(emotion_scores[0], key=lambda x: x['score'])['label'] if emotion_scores else "neutral"
-
-    # Generate intent-context embedding
-    embedding = intent_context_model.encode(text, convert_to_numpy=True).tolist()
-
-    return {
-        "mood": mood,
-        "emotion": emotion,
-        "intent_context_embedding": embedding
-    }
+    if not text or text == NO_SPEECH_TEXT:
+        return dict(FALLBACK_RESULT)
+
+    # Covers the wait for a batch slot plus this request's batch on the text pool
+    with stage("text_analysis"):
+        if not CACHE_ENABLED:
+            return await text_batcher.submit(text)
+
+        key = make_cache_key(text, [model_registry.version(name) for name in TEXT_MODELS])
+        return await analysis_cache.get_or_compute(key, lambda: text_batcher.submit(text))
 
 # ------------------------ #
 # API Endpoints            #
 # ------------------------ #
-@input_router.post("/analyze_text", response_model=UserInputResponse)
-async def analyze_text_endpoint(input: TextInput):
+@input_router.post("/analyze_text", response_model=UserInputResponse | EncodedUserInputResponse, responses=ENCODED_RESPONSES)
+async def analyze_text_endpoint(input: TextInput, request: Request):
     """
     Analyze provided text and extract mood, emotion, and intent-context embedding.
+    Pass `?embedding_encoding=float32|float16|int8` for a base64 embedding, and/or
+    `Accept: application/x-msgpack` for a binary body.
     """
-    result = await analyze_text(input.text)
-    return UserInputResponse(**result)
+    async with admit(text_lane):
+        result = await analyze_text(input.text)
+    return encoded_response(result, request)
+
 
+def whisper_language_code(language: str) -> str | None:
+    """Whisper's code for a language given as a code ("en") or name ("english"), or None if it has none."""
+    from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
 
-@input_router.post("/analyze_audio", response_model=UserInputResponse)
-async def analyze_audio_endpoint(file: UploadFile = File(...)):
+    language = language.strip().lower()
+    return language if language in LANGUAGES else TO_LANGUAGE_CODE.get(language)
+
+@input_router.post("/analyze_audio", response_model=UserInputResponse | EncodedUserInputResponse, responses=ENCODED_RESPONSES)
+async def analyze_audio_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    latency_budget_ms: float | None = Query(None, gt=0),
+    language: str | None = Query(None),
+):
     """
     Extract text from uploaded audio file using Whisper and analyze it.
     Returns fallback response if speech recognition fails.
+    Supports the same embedding encodings as /analyze_text.
+    `?latency_budget_ms=` lets a faster Whisper tier (WHISPER_TIERS) answer when
+    the clip length and queue wouldn't fit the main model in time, and
+    `?language=en` skips language detection. Under load it answers 503 with Retry-After.
+    The budget (or WHISPER_LATENCY_BUDGET_MS) runs from when the handler starts,
+    so the admission wait and decoding count against it.
+    """
+    arrived = time.monotonic()
+    require_models(["whisper"])
+    if language is not None:
+        try:
+            code = whisper_language_code(language)
+        except ImportError:
+            raise HTTPException(status_code=503, detail="Whisper is not installed on this deployment.")
+        if code is None:
+            raise HTTPException(status_code=400, detail=f"Whisper doesn't support the language '{language}'.")
+        language = code
+    budget_s = latency_budget_ms / 1000 if latency_budget_ms is not None else whisper_selector.default_budget_s
+    deadline = arrived + budget_s if budget_s is not None else None
+    async with admit(audio_lane):
+        text = await extract_text_from_audio(file, deadline, language)
+    async with admit(text_lane):
+        result = await analyze_text(text)
+    return encoded_response(result, request)
+
+
+@input_router.get("/cache_stats")
+async def cache_stats_endpoint():
+    """
+    Hit/miss counts and rates of the text analysis cache, for sizing it.
+    """
+    return analysis_cache.stats()
+
+
+@input_router.get("/admission_stats")
+async def admission_stats_endpoint():
+    """
+    Running and queued requests per lane plus admitted/rejected/degraded totals, for autoscaling.
+    """
+    return {"enabled": ADMISSION_ENABLED, "text": text_lane.stats(), "audio": audio_lane.stats(), "stream": stream_lane.stats()}
+
+
+@input_router.get("/whisper_tiers")
+async def whisper_tiers_endpoint():
+    """
+    How often each Whisper tier was picked and its current compute estimate.
+    """
+    return whisper_selector.stats()
+
+
+@input_router.get("/tokenization_stats")
+async def tokenization_stats_endpoint():
+    """
+    Real vs padded tokens sent through the text models, and how many inputs needed windowing.
     """
-    text = await extract_text_from_audio(file)
-    result = await analyze_text(text)
-    return UserInputResponse(**result)
+    return tokenization_stats.snapshot()
@@ -0,0 +1,232 @@
+# services/vector_index.py
+"""
+Song catalog vector store with an IVF (inverted file) index built on NumPy.
+
+Catalog directory layout:
+    manifest.json   {"dim": 768, "count": N, "mood_labels": [...], "emotion_labels": [...]}
+    vectors.f32     N x dim float32, row-major, L2-normalized
+    ids.txt         one track ID per line, row-aligned with vectors.f32
+    mood.u8         optional, N uint8 codes into mood_labels (255 = unknown)
+    emotion.u8      optional, N uint8 codes into emotion_labels (255 = unknown)
+                    (services/song_embeddings.py doesn't write these; filters need them)
+
+`build_index` adds:
+    ivf.npz         centroids, list offsets and the row order of ivf_vectors.f32
+    ivf_vectors.f32 vectors reordered so each inverted list is one contiguous slice
+An index covering fewer rows than the manifest is ignored; rebuild it after appending.
+
+Build with:
+    python -m services.vector_index CATALOG_DIR [--nlist N]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+UNKNOWN_LABEL = 255
+# Below this many vectors a brute-force scan is as fast as the index
+EXACT_SEARCH_THRESHOLD = 20000
+
+
+def read_manifest(catalog_dir: str) -> dict:
+    with open(os.path.join(catalog_dir, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_vectors(path: str, count: int, dim: int) -> np.ndarray:
+    if count == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(count, dim))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+# ------------------------ #
+# Index Build              #
+# ------------------------ #
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 100000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a random sample of the catalog."""
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        # Re-seed empty lists from random sample points
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+def build_index(catalog_dir: str, nlist: int | None = None, chunk_size: int = 65536) -> None:
+    manifest = read_manifest(catalog_dir)
+    count, dim = manifest["count"], manifest["dim"]
+    if count == 0:
+        raise ValueError(f"The catalog in {catalog_dir} is empty; embed some tracks before building an index")
+    vectors = open_vectors(os.path.join(catalog_dir, "vectors.f32"), count, dim)
+    # Each list needs at least one vector to seed its centroid
+    nlist = min(nlist or max(1, int(4 * np.sqrt(count))), count)
+
+    centroids = train_centroids(vectors, nlist)
+    assignments = _assign(vectors, centroids, chunk_size)
+    order = np.argsort(assignments, kind="stable").astype(np.int64)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=nlist)))).astype(np.int64)
+
+    # Write vectors grouped by list so a probe reads one contiguous slice per list
+    reordered = np.memmap(os.path.join(catalog_dir, "ivf_vectors.f32"), dtype=np.float32, mode="w+", shape=(count, dim))
+    for start in range(0, count, chunk_size):
+        reordered[start:start + chunk_size] = vectors[order[start:start + chunk_size]]
+    reordered.flush()
+    del reordered
+
+    np.savez(os.path.join(catalog_dir, "ivf.npz"), centroids=centroids, offsets=offsets, order=order)
+
+
+def remove_index(catalog_dir: str) -> None:
+    """Drop the IVF files, e.g. because rows were appended since they were built."""
+    for name in ("ivf.npz", "ivf_vectors.f32"):
+        path = os.path.join(catalog_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# ------------------------ #
+# Search                   #
+# ------------------------ #
+class SongIndex:
+    """Memory-mapped song vectors searched through the IVF index when present."""
+
+    def __init__(self, catalog_dir: str, nprobe: int = 16):
+        manifest = read_manifest(catalog_dir)
+        self.dim = manifest["dim"]
+        self.count = manifest["count"]
+        self.mood_labels = manifest.get("mood_labels", [])
+        self.emotion_labels = manifest.get("emotion_labels", [])
+        self.nprobe = nprobe
+
+        with open(os.path.join(catalog_dir, "ids.txt"), encoding="utf-8") as f:
+            self.track_ids = np.array([line.rstrip("\n") for line in f], dtype=object)[:self.count]
+
+        self.mood = self._load_codes(catalog_dir, "mood.u8")
+        self.emotion = self._load_codes(catalog_dir, "emotion.u8")
+
+        ivf_path = os.path.join(catalog_dir, "ivf.npz")
+        ivf = np.load(ivf_path) if os.path.exists(ivf_path) and self.count >= EXACT_SEARCH_THRESHOLD else None
+        if ivf is not None and len(ivf["order"]) != self.count:
+            # Built before rows were appended; searching it would miss (or misread) rows, so scan exactly
+            ivf = None
+        if ivf is not None:
+            self.centroids = ivf["centroids"]
+            self.offsets = ivf["offsets"]
+            self.order = ivf["order"]
+            self.vectors = open_vectors(os.path.join(catalog_dir, "ivf_vectors.f32"), self.count, self.dim)
+            # Keep filter codes aligned with the reordered vectors
+            self.mood = self.mood[self.order] if self.mood is not None else None
+            self.emotion = self.emotion[self.order] if self.emotion is not None else None
+        else:
+            self.centroids = None
+            self.order = None
+            self.vectors = open_vectors(os.path.join(catalog_dir, "vectors.f32"), self.count, self.dim)
+
+    def _load_codes(self, catalog_dir: str, name: str) -> np.ndarray | None:
+        path = os.path.join(catalog_dir, name)
+        if not os.path.exists(path):
+            return None
+        return np.fromfile(path, dtype=np.uint8, count=self.count)
+
+    def _filter_mask(self, start: int, stop: int, mood: str | None, emotion: str | None) -> np.ndarray | None:
+        mask = None
+        for value, labels, codes in ((mood, self.mood_labels, self.mood), (emotion, self.emotion_labels, self.emotion)):
+            if value is None:
+                continue
+            if codes is None or value not in labels:
+                return np.zeros(stop - start, dtype=bool)
+            match = codes[start:stop] == labels.index(value)
+            mask = match if mask is None else mask & match
+        return mask
+
+    def _scan(self, query: np.ndarray, start: int, stop: int, mood: str | None, emotion: str | None) -> tuple[np.ndarray, np.ndarray]:
+        scores = self.vectors[start:stop] @ query
+        positions = np.arange(start, stop)
+        mask = self._filter_mask(start, stop, mood, emotion)
+        if mask is not None:
+            scores, positions = scores[mask], positions[mask]
+        return np.asarray(scores), positions
+
+    def search(self, query: np.ndarray, k: int = 10, mood: str | None = None, emotion: str | None = None) -> list[dict]:
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query has dimension {query.shape[0]}, catalog has {self.dim}")
+        if self.count == 0:
+            return []
+
+        if self.centroids is None:
+            scores, positions = self._scan(query, 0, self.count, mood, emotion)
+        else:
+            scores, positions = self._search_ivf(query, k, mood, emotion)
+
+        best = _top_k(scores, k)
+        rows = positions[best] if self.order is None else self.order[positions[best]]
+        return [{"track_id": self.track_ids[row], "score": float(score)} for row, score in zip(rows, scores[best])]
+
+    def _search_ivf(self, query: np.ndarray, k: int, mood: str | None, emotion: str | None) -> tuple[np.ndarray, np.ndarray]:
+        list_order = np.argsort(-(self.centroids @ query))
+        nprobe = min(self.nprobe, len(list_order))
+        probed = 0
+        all_scores, all_positions = [], []
+        found = 0
+        # With filters, keep widening the probe until k matches are found
+        while probed < len(list_order):
+            for list_id in list_order[probed:nprobe]:
+                start, stop = self.offsets[list_id], self.offsets[list_id + 1]
+                if start == stop:
+                    continue
+                scores, positions = self._scan(query, start, stop, mood, emotion)
+                all_scores.append(scores)
+                all_positions.append(positions)
+                found += len(scores)
+            probed = nprobe
+            if found >= k or (mood is None and emotion is None):
+                break
+            nprobe = min(nprobe * 2, len(list_order))
+
+        if not all_scores:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        return np.concatenate(all_scores), np.concatenate(all_positions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the IVF index for a song catalog")
+    parser.add_argument("catalog_dir")
+    parser.add_argument("--nlist", type=int, default=None, help="Number of inverted lists (default: 4 * sqrt(N))")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    build_index(args.catalog_dir, args.nlist)
+    print(f"Built IVF index for {args.catalog_dir} in {time.perf_counter() - started:.1f}s")
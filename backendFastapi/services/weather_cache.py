@@ -0,0 +1,111 @@
+# services/weather_cache.py
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+class WeatherCache:
+    """
+    Weather lookups cached per lat/lon grid cell and time bucket.
+
+    - Requests in the same cell share one entry, fetched for the cell center.
+    - An entry is fresh while it is in the current time bucket.
+    - Concurrent misses for a cell are coalesced into one upstream call.
+    - A stale entry triggers a refresh; if the refresh takes longer than
+      `stale_wait_seconds`, the stale value is served and the refresh
+      finishes in the background.
+    - Memory is bounded by LRU eviction at `max_entries` cells.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[float, float], Awaitable[Any]],
+        grid_degrees: float = 0.25,
+        bucket_seconds: int = 900,
+        max_entries: int = 10000,
+        stale_wait_seconds: float = 0.5,
+        max_stale_seconds: float = 10800,
+    ):
+        self.fetch = fetch
+        self.grid_degrees = grid_degrees
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self.stale_wait_seconds = stale_wait_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._entries: OrderedDict[tuple[int, int], tuple[Any, float]] = OrderedDict()
+        self._refreshing: dict[tuple[int, int], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.upstream_calls = 0
+
+    def cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / self.grid_degrees), math.floor(longitude / self.grid_degrees)
+
+    def cell_center(self, cell: tuple[int, int]) -> tuple[float, float]:
+        return (cell[0] + 0.5) * self.grid_degrees, (cell[1] + 0.5) * self.grid_degrees
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def _refresh(self, cell: tuple[int, int]) -> asyncio.Task:
+        task = self._refreshing.get(cell)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(cell))
+            self._refreshing[cell] = task
+            task.add_done_callback(lambda done: self._refresh_done(cell, done))
+        return task
+
+    def _refresh_done(self, cell: tuple[int, int], task: asyncio.Task) -> None:
+        self._refreshing.pop(cell, None)
+        # Retrieve the exception so background refresh failures are not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_and_store(self, cell: tuple[int, int]) -> Any:
+        self.upstream_calls += 1
+        value = await self.fetch(*self.cell_center(cell))
+        self._entries[cell] = (value, time.time())
+        self._entries.move_to_end(cell)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    async def get(self, latitude: float, longitude: float) -> Any:
+        cell = self.cell(latitude, longitude)
+        now = time.time()
+        entry = self._entries.get(cell)
+
+        if entry is not None:
+            value, fetched_at = entry
+            self._entries.move_to_end(cell)
+            if self._bucket(fetched_at) == self._bucket(now):
+                self.hits += 1
+                return value
+            if now - fetched_at <= self.max_stale_seconds:
+                # Stale: give the refresh a short head start, otherwise serve the old value
+                task = self._refresh(cell)
+                try:
+                    value = await asyncio.wait_for(asyncio.shield(task), self.stale_wait_seconds)
+                    self.hits += 1
+                    return value
+                except Exception:
+                    # Refresh is slow (timeout) or failing: the stale value is better than nothing
+                    self.stale_served += 1
+                    return value
+
+        self.misses += 1
+        return await asyncio.shield(self._refresh(cell))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.stale_served
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "upstream_calls": self.upstream_calls,
+            "hit_rate": (self.hits + self.stale_served) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
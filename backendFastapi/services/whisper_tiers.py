@@ -0,0 +1,115 @@
+# services/whisper_tiers.py
+import math
+import threading
+
+# Rough CPU cost per Whisper size: (fixed seconds per call, seconds per second of audio), greedy decoding.
+# Only the starting point; every transcription refines the per-second figure of its tier.
+DEFAULT_COSTS = {
+    "tiny": (0.1, 0.03),
+    "base": (0.2, 0.06),
+    "small": (0.6, 0.15),
+    "medium": (1.5, 0.4),
+    "large": (3.0, 0.9),
+}
+UNKNOWN_COST = (1.0, 0.3)
+
+
+def default_cost(size: str) -> tuple[float, float]:
+    # "tiny.en" costs what "tiny" does, "large-v3" what "large" does
+    return DEFAULT_COSTS.get(size.split(".")[0].split("-")[0], UNKNOWN_COST)
+
+
+class WhisperTier:
+    def __init__(self, size: str, model_name: str, fixed_seconds: float, seconds_per_audio_second: float):
+        self.size = size
+        self.model_name = model_name
+        self.fixed_seconds = fixed_seconds
+        self.seconds_per_audio_second = seconds_per_audio_second
+
+    def estimate(self, duration_s: float) -> float:
+        return self.fixed_seconds + self.seconds_per_audio_second * duration_s
+
+
+class TierSelector:
+    """
+    Picks a Whisper size per clip from `tiers` (fastest first).
+
+    `budget_s` is what is left of the request's budget by the time its clip
+    is transcribed, so time spent queueing and decoding is already taken off.
+    Queue pressure deliberately trades accuracy for throughput: the clip's
+    compute time is multiplied by one more round for every `concurrency`
+    clips waiting behind it, so a backlog pushes requests to faster tiers
+    and drains sooner. The most accurate tier that fits wins; with no tier
+    fitting, the fastest one does. Compute estimates follow observed
+    transcriptions.
+    """
+
+    def __init__(self, tiers: list[WhisperTier], default_budget_s: float | None = None, smoothing: float = 0.2):
+        if not tiers:
+            raise ValueError("At least one Whisper tier is required")
+        self.tiers = tiers
+        self.default_budget_s = default_budget_s
+        self.smoothing = smoothing
+        self.chosen = {tier.size: 0 for tier in tiers}
+        self._lock = threading.Lock()
+
+    @property
+    def fastest(self) -> WhisperTier:
+        return self.tiers[0]
+
+    @property
+    def most_accurate(self) -> WhisperTier:
+        return self.tiers[-1]
+
+    def is_fast_tier(self, tier: WhisperTier) -> bool:
+        return len(self.tiers) > 1 and tier is self.fastest
+
+    def estimate(self, tier: WhisperTier, duration_s: float, queue_depth: int = 0, concurrency: int = 1) -> float:
+        """This clip's compute time, weighted by the rounds of clips waiting behind it (`queue_depth`)."""
+        rounds_waiting = math.ceil(queue_depth / max(1, concurrency))
+        return (rounds_waiting + 1) * tier.estimate(duration_s)
+
+    def choose(self, duration_s: float, budget_s: float | None = None, queue_depth: int = 0, concurrency: int = 1) -> WhisperTier:
+        budget_s = budget_s if budget_s is not None else self.default_budget_s
+        choice = self.fastest
+        if budget_s is None:
+            choice = self.most_accurate
+        else:
+            for tier in reversed(self.tiers):
+                if self.estimate(tier, duration_s, queue_depth, concurrency) <= budget_s:
+                    choice = tier
+                    break
+        with self._lock:
+            self.chosen[choice.size] += 1
+        return choice
+
+    def observe(self, tier: WhisperTier, duration_s: float, seconds: float) -> None:
+        if duration_s <= 0:
+            return
+        per_second = max(0.0, seconds - tier.fixed_seconds) / duration_s
+        with self._lock:
+            tier.seconds_per_audio_second += self.smoothing * (per_second - tier.seconds_per_audio_second)
+
+    def stats(self) -> dict:
+        return {
+            tier.size: {
+                "model": tier.model_name,
+                "chosen": self.chosen[tier.size],
+                "fixed_seconds": tier.fixed_seconds,
+                "seconds_per_audio_second": round(tier.seconds_per_audio_second, 4),
+            }
+            for tier in self.tiers
+        }
+
+
+def build_tiers(sizes: list[str], main_size: str) -> list[WhisperTier]:
+    """
+    Tiers for `sizes` (fastest first) with `main_size` as the most accurate
+    one. The main size keeps the registry name "whisper", the others are
+    registered as "whisper_<size>".
+    """
+    ordered = [size for size in sizes if size != main_size] + [main_size]
+    return [
+        WhisperTier(size, "whisper" if size == main_size else f"whisper_{size}", *default_cost(size))
+        for size in ordered
+    ]
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Service modules import each other as `services.*`, relative to backendFastapi/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def fake_mood_pipeline(texts, **kwargs):
+    return [{"label": "positive", "score": 0.9} for _ in texts]
+
+
+def fake_emotion_pipeline(texts, **kwargs):
+    return [[{"label": "joy", "score": 0.8}, {"label": "sadness", "score": 0.2}] for _ in texts]
+
+
+class FakeEncoder:
+    def encode(self, texts, **kwargs):
+        return np.zeros((len(texts), 768), dtype=np.float32)
+
+
+class FakeWhisper:
+    def __init__(self, text: str = "hello there", seconds: float = 0.0):
+        self.text = text
+        self.seconds = seconds
+
+    def transcribe(self, audio, **kwargs):
+        time.sleep(self.seconds)
+        return {"text": self.text}
+
+
+@pytest.fixture
+def install_models(monkeypatch):
+    """
+    Returns a function that serves fake models from a fresh registry, with the
+    result cache off. Loaders passed by model name replace or add to the fake
+    text models; `enabled` is handed to the registry.
+    """
+    from services import userinput_service
+    from services.model_registry import ModelRegistry
+
+    def install(enabled=None, **loaders) -> ModelRegistry:
+        registry = ModelRegistry(enabled=enabled)
+        defaults = {"mood": lambda: fake_mood_pipeline, "emotion": lambda: fake_emotion_pipeline, "intent_context": FakeEncoder}
+        for name, loader in {**defaults, **loaders}.items():
+            registry.register(name, loader)
+        monkeypatch.setattr(userinput_service, "model_registry", registry)
+        monkeypatch.setattr("main.model_registry", registry)
+        monkeypatch.setattr(userinput_service, "CACHE_ENABLED", False)
+        return registry
+
+    return install
+
+
+@pytest.fixture
+def fake_models(install_models):
+    return install_models(whisper=FakeWhisper)
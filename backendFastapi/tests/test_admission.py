@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from main import app
+from services import userinput_service
+from services.admission import AdmissionLane, Overloaded
+from tests.audio_fixtures import tone, wav_bytes
+from tests.conftest import FakeWhisper
+
+
+@pytest.fixture
+def fake_models(install_models):
+    return install_models(whisper=lambda: FakeWhisper("said by whisper", 0.5))
+
+
+@pytest.mark.anyio
+async def test_lane_rejects_beyond_running_plus_queued():
+    lane = AdmissionLane("audio", max_concurrent=1, max_queue=1, expected_seconds=2.0)
+    release = asyncio.Event()
+    order = []
+
+    async def hold(tag):
+        async with lane.admit():
+            order.append(tag)
+            await release.wait()
+
+    first = asyncio.create_task(hold("first"))
+    second = asyncio.create_task(hold("second"))
+    await asyncio.sleep(0.01)
+    assert (lane.active, lane.waiting) == (1, 1)
+
+    with pytest.raises(Overloaded) as excinfo:
+        async with lane.admit():
+            pass
+    assert excinfo.value.retry_after == 4  # Two requests ahead at ~2s each
+
+    release.set()
+    await asyncio.gather(first, second)
+    assert order == ["first", "second"]
+    assert lane.stats()["admitted"] == 2 and lane.stats()["rejected"] == 1
+    assert (lane.active, lane.waiting) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_full_audio_lane_sheds_load_without_blocking_text(fake_models, monkeypatch):
+    monkeypatch.setattr(userinput_service, "audio_lane", AdmissionLane("audio", 1, 0, expected_seconds=3.0))
+    transport = httpx.ASGITransport(app=app)
+    clip = wav_bytes(tone(1.0))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def post_audio(delay):
+            await asyncio.sleep(delay)
+            return await client.post("/user_input/analyze_audio", files={"file": ("clip.wav", clip, "audio/wav")})
+
+        async def post_text():
+            await asyncio.sleep(0.2)
+            return await client.post("/user_input/analyze_text", json={"text": "feeling great"})
+
+        running, rejected, text = await asyncio.gather(post_audio(0), post_audio(0.2), post_text())
+        stats = (await client.get("/user_input/admission_stats")).json()
+        metrics = (await client.get("/metrics")).text
+
+    assert running.status_code == 200
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "3"
+    assert text.status_code == 200
+    assert stats["audio"]["rejected"] == 1
+    assert 'riff_admission_total{lane="audio",result="rejected"} 1' in metrics
+
+
+
+@pytest.mark.anyio
+async def test_full_lane_is_shed_before_the_upload_is_read(monkeypatch):
+    lane = AdmissionLane("audio", 1, 0, expected_seconds=3.0)
+    lane.active = 1
+    monkeypatch.setattr(userinput_service, "audio_lane", lane)
+    received = []
+
+    async def receive():
+        received.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/user_input/analyze_audio", "headers": [], "query_string": b""}
+    await app(scope, receive, send)
+
+    assert messages[0]["status"] == 503
+    assert (b"retry-after", b"3") in messages[0]["headers"]
+    assert received == []
+    assert lane.rejected == 1
+
+
+def test_degraded_count_is_exact_across_threads():
+    lane = AdmissionLane("audio", 1, 0)
+
+    def degrade():
+        for _ in range(10000):
+            lane.count_degraded()
+
+    threads = [threading.Thread(target=degrade) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert lane.stats()["degraded"] == 80000
@@ -0,0 +1,62 @@
+import subprocess
+
+import numpy as np
+import pytest
+
+from services import audio_preprocessing
+from services.audio_preprocessing import AudioDecodeError, decode_audio, trim_silence
+from tests.audio_fixtures import SAMPLE_RATE, silence, tone, wav_bytes
+
+
+def test_decodes_pcm_wav_from_memory():
+    samples = decode_audio(wav_bytes(tone(0.5)))
+
+    assert samples.dtype == np.float32
+    assert len(samples) == SAMPLE_RATE // 2
+    assert np.abs(samples).max() == pytest.approx(0.5, abs=0.01)
+
+
+def test_empty_upload_is_rejected():
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b"")
+
+
+def test_trims_leading_trailing_and_long_inner_silence():
+    clip = np.concatenate([silence(2.0), tone(1.0), silence(3.0), tone(1.0), silence(2.0)])
+
+    trimmed = trim_silence(clip, min_silence_ms=500, padding_ms=150)
+
+    # Two seconds of speech plus at most 150 ms of padding around each run
+    assert 2.0 * SAMPLE_RATE <= len(trimmed) <= 2.7 * SAMPLE_RATE
+
+
+def test_keeps_short_pauses_between_words():
+    clip = np.concatenate([tone(0.5), silence(0.2), tone(0.5)])
+
+    trimmed = trim_silence(clip, min_silence_ms=500, padding_ms=150)
+
+    assert len(trimmed) >= 1.15 * SAMPLE_RATE
+
+
+def test_all_silence_yields_empty_clip():
+    assert trim_silence(silence(2.0)).size == 0
+
+
+def test_overlapping_padding_does_not_repeat_audio():
+    # Padding (300 ms each side) is wider than half the minimum pause, so the padded runs overlap
+    clip = np.concatenate([silence(1.0), tone(0.5), silence(0.21), tone(0.5, freq=880.0), silence(1.0)])
+
+    trimmed = trim_silence(clip, min_silence_ms=150, padding_ms=300)
+
+    # Both tones plus the pause and outer padding once (~1.8 s); repeating the overlap would give ~2.2 s
+    assert 1.7 * SAMPLE_RATE <= len(trimmed) <= 1.9 * SAMPLE_RATE
+
+
+def test_stuck_ffmpeg_is_a_decode_error(monkeypatch):
+    def hang(cmd, timeout=None, **kwargs):
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    monkeypatch.setattr(audio_preprocessing.subprocess, "run", hang)
+
+    with pytest.raises(AudioDecodeError, match="longer than"):
+        decode_audio(b"ID3 not a wav")
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from services.batching import MicroBatcher
+
+
+@pytest.mark.anyio
+async def test_concurrent_items_coalesce_up_to_max_batch_size():
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+    results = await asyncio.gather(*[batcher.submit(i) for i in range(10)])
+
+    assert results == [i * 2 for i in range(10)]
+    assert batches == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+@pytest.mark.anyio
+async def test_partial_batch_flushes_after_max_wait():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(items) or items, max_batch_size=32, max_wait_ms=50)
+
+    started = time.monotonic()
+    first = asyncio.ensure_future(batcher.submit("a"))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(batcher.submit("b"))
+    assert await asyncio.gather(first, second) == ["a", "b"]
+    elapsed = time.monotonic() - started
+
+    # Both joined the batch opened by the first item, which waited out max_wait_ms rather than max_batch_size
+    assert batches == [["a", "b"]]
+    assert 0.04 <= elapsed < 0.5
+
+    # A later item starts a new batch
+    assert await batcher.submit("c") == "c"
+    assert batches[-1] == ["c"]
+
+
+@pytest.mark.anyio
+async def test_failing_batch_rejects_every_caller_in_it():
+    def explode(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher(explode, max_batch_size=3, max_wait_ms=50)
+    results = await asyncio.gather(*[batcher.submit(i) for i in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) and str(result) == "model crashed" for result in results)
+
+
+@pytest.mark.anyio
+async def test_wrong_result_count_raises():
+    # Drops the last result whenever it gets more than one item
+    batcher = MicroBatcher(lambda items: items[:-1] if len(items) > 1 else items, max_batch_size=2, max_wait_ms=50)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) and "1 results for 2 inputs" in str(result) for result in results)
+    # The worker keeps serving after a bad batch
+    assert await batcher.submit(3) == 3
+
+
+@pytest.mark.anyio
+async def test_runner_executes_batches_off_the_loop():
+    calls = []
+
+    async def runner(fn, items):
+        calls.append(items)
+        return await asyncio.to_thread(fn, items)
+
+    batcher = MicroBatcher(lambda items: [item + 1 for item in items], max_batch_size=2, runner=runner)
+    assert await asyncio.gather(batcher.submit(1), batcher.submit(2)) == [2, 3]
+    assert calls == [[1, 2]]
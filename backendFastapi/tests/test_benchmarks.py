@@ -0,0 +1,40 @@
+import httpx
+import pytest
+
+from benchmarks.load import fastapi_scenarios, run_load
+from benchmarks.stats import compare, summarize
+from benchmarks.stubs import StubUpstreams
+from main import app
+from services import geoip_service
+from services.cache import AnalysisCache
+from services.http_client import AsyncHTTPClient
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    base = {"meta": {}, "load": {"geoip": summarize([0.010] * 100, elapsed=1.0)}}
+    slower = {"meta": {}, "load": {"geoip": summarize([0.013] * 100, elapsed=1.3)}}
+
+    report = compare(base, slower, threshold=0.10)
+
+    flagged = {row["metric"] for row in report["regressions"]}
+    assert {"p50_ms", "p99_ms", "throughput_rps"} <= flagged
+    assert compare(base, base)["regressions"] == []
+
+
+@pytest.mark.anyio
+async def test_geoip_load_runs_against_stub_upstreams(monkeypatch):
+    upstreams = StubUpstreams(latency=0.001).start()
+    try:
+        monkeypatch.setattr(geoip_service, "IPWHO_URL", f"{upstreams.url}/ipwho/")
+        monkeypatch.setattr(geoip_service, "OPEN_METEO_URL", f"{upstreams.url}/open-meteo/v1/forecast")
+        monkeypatch.setattr(geoip_service, "http_client", AsyncHTTPClient())
+        monkeypatch.setattr(geoip_service, "ip_location_cache", AnalysisCache())
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            result = await run_load(fastapi_scenarios(client)["geoip"], concurrency=4, requests=20)
+    finally:
+        upstreams.stop()
+
+    assert result["count"] == 20 and result["errors"] == 0
+    assert result["p50_ms"] <= result["p99_ms"]
+    assert upstreams.requests >= 1
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from services.bulk_analysis import length_bucketed_batches, read_records, run_bulk_analysis
+
+
+def fake_analyze(texts):
+    return [
+        {"mood": "positive" if "happy" in text else "neutral", "emotion": "joy",
+         "intent_context_embedding": np.full(8, len(text), dtype=np.float32)}
+        for text in texts
+    ]
+
+
+def test_batches_group_similar_lengths():
+    records = [(str(i), "x" * length) for i, length in enumerate([1, 50, 2, 49, 3, 48])]
+
+    batches = list(length_bucketed_batches(records, batch_size=3, window=6))
+
+    assert [[len(text) for _, text in batch] for batch in batches] == [[1, 2, 3], [48, 49, 50]]
+
+
+def test_npy_and_jsonl_rows_line_up(tmp_path):
+    source = tmp_path / "utterances.jsonl"
+    texts = [f"{'happy ' if i % 3 == 0 else ''}utterance {'z' * (i % 17)}" for i in range(500)]
+    source.write_text("".join(json.dumps({"id": f"u{i}", "text": text}) + "\n" for i, text in enumerate(texts)))
+
+    stats = run_bulk_analysis(
+        read_records(str(source)), str(tmp_path / "out"),
+        analyze=fake_analyze, workers=2, batch_size=32, bucket_window=200,
+    )
+
+    assert stats["rows"] == 500
+    embeddings = np.load(tmp_path / "out.npy", mmap_mode="r")
+    rows = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert embeddings.shape == (500, 8)
+    assert sorted(row["id"] for row in rows) == sorted(f"u{i}" for i in range(500))
+    for row in rows:
+        text = texts[int(row["id"][1:])]
+        assert embeddings[row["row"], 0] == len(text)
+        assert row["mood"] == ("positive" if "happy" in text else "neutral")
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from services import cache as cache_module
+from services.cache import AnalysisCache, SQLiteStore, make_cache_key
+
+
+def test_key_normalizes_whitespace_and_includes_model_versions():
+    assert make_cache_key("  feeling   sad ", ["m1"]) == make_cache_key("feeling sad", ["m1"])
+    assert make_cache_key("feeling sad", ["m1"]) != make_cache_key("feeling sad", ["m2"])
+
+
+def test_lru_eviction_by_entry_count():
+    cache = AnalysisCache(max_entries=2)
+    cache.set("a", {"mood": "positive"})
+    cache.set("b", {"mood": "negative"})
+    cache.get("a")
+    cache.set("c", {"mood": "neutral"})
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = AnalysisCache(ttl_seconds=60)
+    cache.set("a", {"mood": "positive"})
+
+    now[0] += 61
+    assert cache.get("a") is None
+
+
+def test_persisted_entries_survive_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = AnalysisCache(store=SQLiteStore(path))
+    cache.set("a", {"mood": "positive", "intent_context_embedding": [0.5, 0.25]})
+    cache.store.flush()
+
+    restarted = AnalysisCache(store=SQLiteStore(path))
+    assert restarted.get("a") == {"mood": "positive", "intent_context_embedding": [0.5, 0.25]}
+
+
+@pytest.mark.anyio
+async def test_identical_in_flight_requests_compute_once():
+    cache = AnalysisCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"mood": "positive"}
+
+    results = await asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(5)])
+
+    assert len(calls) == 1
+    assert all(result == {"mood": "positive"} for result in results)
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 4
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_store_reopens_its_connection_after_fork(tmp_path):
+    store = SQLiteStore(str(tmp_path / "cache.sqlite3"))
+    assert store._conn is None  # Nothing to inherit until the store is used
+    store.set("parent", {"mood": "positive"}, time.time())
+    inherited = store._conn
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            store.set("child", {"mood": "negative"}, time.time())
+            store.flush()
+            os._exit(0 if store._conn is not inherited else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert store._conn is inherited
+    assert store.get("child")[0] == {"mood": "negative"}
+
+
+def test_store_writes_are_batched_behind_the_caller(tmp_path):
+    store = SQLiteStore(str(tmp_path / "cache.sqlite3"))
+    store.get("warm-up")  # Starts the writer
+
+    for i in range(500):
+        store.set(f"k{i}", {"n": i}, time.time())
+    store.delete("k0")
+    store.flush()
+
+    assert store.get("k0") is None and store.get("k499")[0] == {"n": 499}
+    assert store.commits < 500
+
+
+@pytest.mark.anyio
+async def test_store_lookups_do_not_block_the_event_loop(tmp_path):
+    class SlowStore(SQLiteStore):
+        def get(self, key):
+            time.sleep(0.2)
+            return super().get(key)
+
+    store = SlowStore(str(tmp_path / "cache.sqlite3"))
+    store.set("k", {"mood": "positive"}, time.time())
+    store.flush()
+    cache = AnalysisCache(store=store)
+    ticks = []
+
+    async def tick():
+        for _ in range(10):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def compute():
+        raise AssertionError("should come from the store")
+
+    value, _ = await asyncio.gather(cache.get_or_compute("k", compute), tick())
+
+    assert value == {"mood": "positive"}
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,41 @@
+import base64
+
+import numpy as np
+import pytest
+
+from services.encoding import decode_embedding, encode_embedding, serialize_result
+
+
+@pytest.fixture
+def embedding():
+    rng = np.random.default_rng(0)
+    vector = rng.standard_normal(768).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.mark.parametrize("encoding, expected_bytes, tolerance", [
+    ("float32", 768 * 4, 0.0),
+    ("float16", 768 * 2, 1e-3),
+    ("int8", 768, 5e-3),
+])
+def test_round_trip(embedding, encoding, expected_bytes, tolerance):
+    data, scale = encode_embedding(embedding, encoding)
+
+    assert len(data) == expected_bytes
+    np.testing.assert_allclose(decode_embedding(data, encoding, scale), embedding, atol=tolerance)
+
+
+def test_json_default_keeps_float_list(embedding):
+    body = serialize_result({"mood": "positive", "emotion": "joy", "intent_context_embedding": embedding})
+
+    assert isinstance(body["intent_context_embedding"], list)
+    assert "embedding_encoding" not in body
+
+
+def test_base64_body_carries_decode_metadata(embedding):
+    body = serialize_result({"mood": "positive", "emotion": "joy", "intent_context_embedding": embedding}, "int8")
+
+    assert body["embedding_encoding"] == "int8"
+    assert body["embedding_dim"] == 768
+    decoded = decode_embedding(base64.b64decode(body["intent_context_embedding"]), "int8", body["embedding_scale"])
+    assert np.dot(decoded, embedding) > 0.999
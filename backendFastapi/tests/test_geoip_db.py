@@ -0,0 +1,54 @@
+import pytest
+
+from services.geoip_db import GeoIPDatabase, build_database
+
+CSV = """ip_start,ip_end,country,region,latitude,longitude,timezone
+1.0.0.0,1.0.0.255,Australia,Queensland,-27.47,153.02,Australia/Brisbane
+8.8.8.0,8.8.8.255,United States,California,37.39,-122.08,America/Los_Angeles
+81.2.69.0,81.2.69.255,United Kingdom,England,51.5,-0.12,0
+2001:4860::,2001:4860:ffff:ffff:ffff:ffff:ffff:ffff,United States,California,37.39,-122.08,-28800
+2a00:1450::,2a00:1450:4000::ffff,Ireland,Leinster,53.33,-6.25,Europe/Dublin
+"""
+
+
+@pytest.fixture
+def database(tmp_path):
+    csv_path = tmp_path / "ranges.csv"
+    csv_path.write_text(CSV)
+    db_path = tmp_path / "geoip.db"
+    stats = build_database(str(csv_path), str(db_path))
+    assert stats["ipv4_ranges"] == 3
+    assert stats["ipv6_ranges"] == 2
+    return GeoIPDatabase(str(db_path))
+
+
+def test_ipv4_lookup(database):
+    location = database.lookup("8.8.8.8")
+
+    assert location["country"] == "United States"
+    assert location["region"] == "California"
+    assert location["latitude"] == pytest.approx(37.39, abs=1e-4)
+    assert location["timezone_offset"] in (-8 * 3600, -7 * 3600)
+
+
+def test_range_boundaries(database):
+    assert database.lookup("1.0.0.0")["country"] == "Australia"
+    assert database.lookup("1.0.0.255")["country"] == "Australia"
+    assert database.lookup("1.0.1.0") is None
+    assert database.lookup("0.255.255.255") is None
+
+
+def test_fixed_zero_offset_is_kept(database):
+    assert database.lookup("81.2.69.160")["timezone_offset"] == 0
+
+
+def test_ipv6_lookup(database):
+    assert database.lookup("2001:4860:4860::8888")["timezone_offset"] == -28800
+    assert database.lookup("2a00:1450:4000::1")["country"] == "Ireland"
+    assert database.lookup("2a00:1450:4001::1") is None
+    assert database.lookup("::1") is None
+
+
+def test_ipv4_mapped_ipv6_and_invalid_input(database):
+    assert database.lookup("::ffff:8.8.8.8")["country"] == "United States"
+    assert database.lookup("not-an-ip") is None
@@ -0,0 +1,72 @@
+import httpx
+import pytest
+
+from main import app
+from services import geoip_service
+from services.cache import AnalysisCache
+from services.http_client import AsyncHTTPClient
+from services.weather_cache import WeatherCache
+
+
+class Upstreams:
+    """Stand-in for ipwho.is and Open-Meteo."""
+
+    def __init__(self):
+        self.calls = []
+        self.failures_left = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request.url.host)
+        if self.failures_left:
+            self.failures_left -= 1
+            return httpx.Response(503)
+        if request.url.host == "ipwho.is":
+            return httpx.Response(200, json={
+                "success": True, "latitude": 51.5, "longitude": 0.0,
+                "country": "United Kingdom", "region": "England", "timezone": {"offset": 0},
+            })
+        return httpx.Response(200, json={"current_weather": {"weathercode": 61}})
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    upstreams = Upstreams()
+    client = AsyncHTTPClient(transport=httpx.MockTransport(upstreams), backoff_seconds=0.001)
+    monkeypatch.setattr(geoip_service, "http_client", client)
+    monkeypatch.setattr(geoip_service, "geoip_db", None)
+    monkeypatch.setattr(geoip_service, "ip_location_cache", AnalysisCache())
+    monkeypatch.setattr(geoip_service, "weather_cache", WeatherCache(geoip_service.fetch_weather_code))
+    return upstreams
+
+
+async def get_geoip(ip):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/geoip/", params={"ip": ip})
+
+
+@pytest.mark.anyio
+async def test_geoip_with_zero_utc_offset_and_longitude(upstreams):
+    response = await get_geoip("81.2.69.160")
+
+    assert response.status_code == 200
+    assert response.json()["location"] == {"country": "United Kingdom", "region": "England"}
+    assert response.json()["weather_code"] == 61
+
+
+@pytest.mark.anyio
+async def test_repeat_ip_skips_location_and_weather_round_trips(upstreams):
+    await get_geoip("81.2.69.160")
+    await get_geoip("81.2.69.160")
+
+    assert upstreams.calls == ["ipwho.is", "api.open-meteo.com"]
+
+
+@pytest.mark.anyio
+async def test_transient_upstream_errors_are_retried(upstreams):
+    upstreams.failures_left = 2
+
+    response = await get_geoip("81.2.69.160")
+
+    assert response.status_code == 200
+    assert upstreams.calls[:3] == ["ipwho.is"] * 3
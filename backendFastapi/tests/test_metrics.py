@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from main import app
+from services.batching import MicroBatcher
+from services.executor import run_text_inference
+from services.metrics import Histogram, MetricsMiddleware, stage
+
+
+def test_histogram_exposition_is_cumulative():
+    histogram = Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "decode")
+
+    lines = histogram.collect()
+
+    assert 'test_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="decode",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="decode"} 3' in lines
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_reports_stages_batches_and_models(fake_models):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/user_input/analyze_text", json={"text": "feeling great"})
+        response = await client.get("/metrics")
+
+    body = response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    for stage_name in ("mood", "emotion", "embedding", "text_analysis"):
+        assert f'riff_stage_seconds_count{{stage="{stage_name}"}}' in body
+    assert 'riff_batch_size_count{batcher="text"}' in body
+    assert 'riff_request_seconds_count{method="POST",route="/user_input/analyze_text",status="200"}' in body
+    assert 'riff_model_load_seconds{model="mood"}' in body
+    assert 'riff_queue_depth{queue="text_batcher"} 0' in body
+
+
+@pytest.mark.anyio
+async def test_server_timing_includes_stages_run_on_inference_threads():
+    timed_app = FastAPI()
+
+    def blocking_work():
+        with stage("inner"):
+            return 42
+
+    @timed_app.get("/work")
+    async def work():
+        with stage("outer"):
+            return {"value": await run_text_inference(blocking_work)}
+
+    transport = httpx.ASGITransport(app=MetricsMiddleware(timed_app, server_timing=True))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/work")
+
+    names = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+    assert names == ["inner", "outer", "total"]
+
+
+@pytest.mark.anyio
+async def test_server_timing_of_each_request_includes_its_batch_stages():
+    def model(items):
+        with stage("model"):
+            return [item * 2 for item in items]
+
+    batcher = MicroBatcher(model, max_batch_size=2, max_wait_ms=200, runner=run_text_inference)
+    timed_app = FastAPI()
+
+    @timed_app.get("/double/{value}")
+    async def double(value: int):
+        return {"value": await batcher.submit(value)}
+
+    transport = httpx.ASGITransport(app=MetricsMiddleware(timed_app, server_timing=True))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(client.get("/double/1"), client.get("/double/2"))
+
+    for response in responses:
+        names = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+        assert names == ["model", "total"]
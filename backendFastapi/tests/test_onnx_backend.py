@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from services import onnx_backend, userinput_service
+from services.onnx_backend import OnnxSentenceEncoder
+
+
+class FakeTokenizer:
+    """Pads each batch to its longest text, one token per word."""
+
+    def __call__(self, texts, padding=True, truncation=True, max_length=None, return_tensors="np"):
+        lengths = [len(text.split()) for text in texts]
+        width = max(lengths)
+        mask = np.array([[1] * n + [0] * (width - n) for n in lengths], dtype=np.int64)
+        return {"input_ids": np.arange(mask.size).reshape(mask.shape), "attention_mask": mask}
+
+
+class FakeSession:
+    """Token i of every text embeds as (i + 1) * [1, 2]; padding embeds as a large constant."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.batches.append(len(input_ids))
+        positions = np.arange(input_ids.shape[1], dtype=np.float32)[None, :, None] + 1
+        hidden = positions * np.array([1.0, 2.0], dtype=np.float32)
+        hidden = np.where(attention_mask[..., None] == 1, hidden, 100.0)
+        return SimpleNamespace(last_hidden_state=hidden)
+
+
+def make_encoder() -> OnnxSentenceEncoder:
+    encoder = OnnxSentenceEncoder.__new__(OnnxSentenceEncoder)
+    encoder.model = FakeSession()
+    encoder.tokenizer = FakeTokenizer()
+    encoder.max_length = 384
+    return encoder
+
+
+def test_encoder_mean_pools_real_tokens_and_normalizes():
+    encoder = make_encoder()
+
+    embeddings = encoder.encode(["one", "one two three", "a b"], batch_size=2)
+
+    assert encoder.model.batches == [2, 1]
+    assert embeddings.shape == (3, 2) and embeddings.dtype == np.float32
+    # Padding is ignored, so each row is the direction of [1, 2] regardless of length
+    np.testing.assert_allclose(embeddings, np.tile([1, 2] / np.sqrt(5), (3, 1)), rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-6)
+
+
+def test_encoder_accepts_single_sentence():
+    embedding = make_encoder().encode("just one")
+    assert embedding.shape == (2,)
+
+
+def test_loader_selection_follows_inference_backend(monkeypatch):
+    assert userinput_service.text_model_loaders("torch") == (
+        userinput_service.load_mood_pipeline,
+        userinput_service.load_emotion_pipeline,
+        userinput_service.load_intent_context_model,
+    )
+    mood, emotion, intent_context = userinput_service.text_model_loaders("onnx")
+    assert mood is userinput_service.load_onnx_mood_pipeline
+    assert emotion is userinput_service.load_onnx_emotion_pipeline
+
+    built = []
+    monkeypatch.setattr(onnx_backend, "OnnxSentenceEncoder", lambda model_id: built.append(model_id) or "encoder")
+    assert intent_context() == "encoder"
+    assert built == [userinput_service.INTENT_CONTEXT_ONNX_MODEL_ID]
+
+    with pytest.raises(RuntimeError, match="tensorrt"):
+        userinput_service.text_model_loaders("tensorrt")
+
+
+def test_cached_export_is_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "ONNX_CACHE_DIR", str(tmp_path))
+    target = tmp_path / "org--model-int8"
+    target.mkdir()
+    (target / onnx_backend.QUANTIZED_FILE_NAME).write_bytes(b"graph")
+
+    assert onnx_backend.export_quantized("org/model", ort_model_class=None) == str(target)
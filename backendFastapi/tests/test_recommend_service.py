@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+import main
+from main import app
+from services import executor, recommend_service
+from services.executor import run_text_inference
+
+DIM = 768
+COUNT = 200
+
+
+@pytest.fixture
+def vectors():
+    vectors = np.random.default_rng(0).standard_normal((COUNT, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch, vectors):
+    vectors.tofile(tmp_path / "vectors.f32")
+    (tmp_path / "ids.txt").write_text("".join(f"track{i}\n" for i in range(COUNT)))
+    (np.arange(COUNT) % 2).astype(np.uint8).tofile(tmp_path / "mood.u8")
+    manifest = {"dim": DIM, "count": COUNT, "mood_labels": ["negative", "positive"], "emotion_labels": []}
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+    monkeypatch.setattr(recommend_service, "SONG_CATALOG_DIR", str(tmp_path))
+    monkeypatch.setattr(recommend_service, "_song_index", None)
+    monkeypatch.setattr(recommend_service, "_song_index_error", None)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_models(install_models, vectors):
+    class RowEncoder:
+        # Every text embeds as catalog row 42
+        def encode(self, texts, **kwargs):
+            return np.repeat(vectors[42][None, :], len(texts), axis=0)
+
+    return install_models(intent_context=RowEncoder)
+
+
+async def recommend(body: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/recommend/", json=body)
+
+
+@pytest.mark.anyio
+async def test_recommends_nearest_tracks_to_an_embedding(catalog, vectors):
+    response = await recommend({"embedding": vectors[7].tolist(), "k": 3})
+
+    assert response.status_code == 200
+    tracks = response.json()["tracks"]
+    assert len(tracks) == 3
+    assert tracks[0]["track_id"] == "track7" and tracks[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.mark.anyio
+async def test_recommends_from_text(catalog, fake_models):
+    response = await recommend({"text": "something upbeat", "k": 1})
+
+    assert response.status_code == 200
+    assert response.json()["tracks"][0]["track_id"] == "track42"
+
+
+@pytest.mark.anyio
+async def test_text_without_an_embedding_is_rejected(catalog, fake_models):
+    response = await recommend({"text": "   "})
+
+    assert response.status_code == 400
+    assert "all-zero" in response.json()["detail"]
+
+
+@pytest.mark.anyio
+async def test_mood_filter_and_unlabelled_emotion_filter(catalog, vectors):
+    # Row 7 is "positive" (odd rows), so a "negative" filter must skip it
+    filtered = await recommend({"embedding": vectors[7].tolist(), "k": 5, "mood": "negative"})
+    unlabelled = await recommend({"embedding": vectors[7].tolist(), "emotion": "joy"})
+
+    assert filtered.status_code == 200
+    ids = [track["track_id"] for track in filtered.json()["tracks"]]
+    assert len(ids) == 5 and all(int(track_id[len("track"):]) % 2 == 0 for track_id in ids)
+    assert unlabelled.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_missing_catalog_is_unavailable(tmp_path, monkeypatch, vectors):
+    monkeypatch.setattr(recommend_service, "SONG_CATALOG_DIR", str(tmp_path))
+    monkeypatch.setattr(recommend_service, "_song_index", None)
+
+    response = await recommend({"embedding": vectors[0].tolist()})
+
+    assert response.status_code == 503
+
+
+@pytest.mark.anyio
+async def test_search_does_not_queue_behind_model_batches(catalog, vectors):
+    # Keep every text-inference thread busy with a slow "model batch"
+    busy = [asyncio.ensure_future(run_text_inference(time.sleep, 0.5)) for _ in range(executor.TEXT_POOL_SIZE * 2)]
+    await asyncio.sleep(0.01)
+
+    started = time.monotonic()
+    response = await recommend({"embedding": vectors[3].tolist(), "k": 1})
+    elapsed = time.monotonic() - started
+    await asyncio.gather(*busy)
+
+    assert response.status_code == 200
+    assert elapsed < 0.3
+
+
+@pytest.mark.anyio
+async def test_failed_startup_load_is_logged_and_reported(catalog, fake_models, caplog):
+    (catalog / "vectors.f32").unlink()
+
+    with caplog.at_level(logging.ERROR, logger="main"):
+        loads = main.start_warmup()
+        await asyncio.gather(*loads.values(), return_exceptions=True)
+        await asyncio.sleep(0)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        body = (await client.get("/ready")).json()
+
+    assert "Startup warmup of song_index failed" in caplog.text
+    assert body["ready"] is True
+    assert body["song_index"]["state"] == "failed" and body["song_index"]["error"]
@@ -0,0 +1,113 @@
+import gc
+import os
+import socket
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import prefork
+from services.model_registry import ModelRegistry
+from services.prefork import PreforkSupervisor, bind_socket, limit_worker_threads, preload_models, threads_per_worker
+
+
+@pytest.fixture(autouse=True)
+def unfreeze_gc():
+    yield
+    gc.unfreeze()
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _lines(path) -> list[str]:
+    return path.read_text().split() if path.exists() else []
+
+
+def test_preload_loads_enabled_models_and_freezes_gc():
+    loads = []
+    registry = ModelRegistry(enabled=["whisper", "mood"])
+    registry.register("whisper", lambda: loads.append("whisper") or "w")
+    registry.register("mood", lambda: loads.append("mood") or "m")
+    registry.register("emotion", lambda: loads.append("emotion") or "e")
+
+    loaded = preload_models(registry, ["whisper", "mood", "emotion"])
+
+    assert loaded == ["whisper", "mood"]
+    assert loads == ["whisper", "mood"]
+    assert gc.get_freeze_count() > 0
+
+
+def test_preload_skips_failed_models():
+    def broken():
+        raise OSError("weights not found")
+
+    registry = ModelRegistry()
+    registry.register("whisper", broken)
+    registry.register("mood", lambda: "m")
+
+    assert preload_models(registry, ["whisper", "mood"]) == ["mood"]
+    assert registry.status()["whisper"]["state"] == "failed"
+
+
+def test_threads_per_worker_splits_cores(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    assert threads_per_worker(4) == 2
+    assert threads_per_worker(16) == 1
+    assert threads_per_worker(4, configured=3) == 3
+
+
+def test_worker_thread_limit_resizes_already_loaded_blas_pools(monkeypatch):
+    # numpy is imported long before any worker starts, so *_NUM_THREADS would come too late
+    limits = []
+    monkeypatch.setitem(sys.modules, "threadpoolctl", SimpleNamespace(threadpool_limits=limits.append))
+
+    limit_worker_threads(3)
+
+    assert limits == [3]
+
+
+def test_workers_share_one_listening_socket():
+    sock = bind_socket("127.0.0.1", 0)
+    try:
+        assert sock.get_inheritable()
+        client = socket.create_connection(sock.getsockname(), timeout=2)
+        client.close()
+    finally:
+        sock.close()
+
+
+def test_supervisor_replaces_crashed_workers_and_stops_them(tmp_path, monkeypatch):
+    monkeypatch.setattr(prefork, "MIN_WORKER_UPTIME_SECONDS", 0.0)
+    starts = tmp_path / "starts"
+
+    def target():
+        with open(starts, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        if len(_lines(starts)) < 3:
+            raise RuntimeError("worker crashed")
+        time.sleep(30)
+
+    supervisor = PreforkSupervisor(target, workers=1)
+
+    def stop_when_settled():
+        _wait_for(lambda: len(_lines(starts)) >= 3)
+        supervisor.stop()
+
+    stopper = threading.Thread(target=stop_when_settled)
+    stopper.start()
+    started = time.monotonic()
+    supervisor.run()
+    stopper.join()
+
+    assert len(set(_lines(starts))) == 3
+    assert supervisor.children == {}
+    assert time.monotonic() - started < 10
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from services.song_embeddings import build_descriptor, embed_catalog, read_tracks
+from services.vector_index import SongIndex, build_index
+
+DIM = 16
+
+
+class FakeEncoder:
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        # Deterministic per text, so reruns and resumes must produce identical rows
+        return np.stack([np.random.default_rng(sum(map(ord, text))).standard_normal(DIM) for text in texts])
+
+
+def fake_loader():
+    return FakeEncoder()
+
+
+def tracks(n):
+    return [{"id": f"track{i}", "name": f"Song {i}", "artists": [{"name": "Band"}], "genres": ["rock"]} for i in range(n)]
+
+
+def test_descriptor_from_spotify_and_csv_records(tmp_path):
+    assert build_descriptor({"id": "1", "name": "Song 2", "artists": [{"name": "Blur"}], "album": {"name": "Blur"}}) == \
+        "Song 2 by Blur. Album: Blur."
+    assert build_descriptor({"id": "1", "missing": True}) is None
+
+    path = tmp_path / "tracks.csv"
+    path.write_text("id,name,artists,genres\n1,Song 2,Blur,britpop;rock\n")
+    assert build_descriptor(next(read_tracks(str(path)))) == "Song 2 by Blur. Genres: britpop, rock."
+
+
+def test_embeds_catalog_readable_by_song_index(tmp_path):
+    source = tracks(250) + [{"id": "gone", "missing": True}]
+
+    manifest = embed_catalog(source, str(tmp_path), loader=fake_loader, workers=2, chunk_size=40)
+
+    assert manifest["count"] == 250 and manifest["dim"] == DIM
+    index = SongIndex(str(tmp_path))
+    query = FakeEncoder().encode([build_descriptor(source[7])])[0]
+    assert index.search(query, k=1)[0]["track_id"] == "track7"
+
+
+def test_resumes_after_interruption(tmp_path):
+    source = tracks(300)
+
+    def interrupt(stats):
+        if stats["count"] >= 100:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        embed_catalog(source, str(tmp_path), loader=fake_loader, workers=2, chunk_size=50, progress=interrupt)
+    # A chunk that was being written when the run died
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 100)
+    with open(tmp_path / "ids.txt", "a") as f:
+        f.write("partial\n")
+
+    manifest = embed_catalog(source, str(tmp_path), loader=fake_loader, workers=2, chunk_size=50)
+
+    assert manifest["count"] == 300
+    assert (tmp_path / "ids.txt").read_text().split() == [t["id"] for t in source]
+    vectors = np.fromfile(tmp_path / "vectors.f32", dtype=np.float32).reshape(-1, DIM)
+    expected = FakeEncoder().encode([build_descriptor(t) for t in source])
+    np.testing.assert_allclose(vectors, expected / np.linalg.norm(expected, axis=1, keepdims=True), rtol=1e-5)
+    assert json.loads((tmp_path / "manifest.json").read_text())["source_records"] == 300
+
+
+def test_appending_drops_stale_ivf_index(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.vector_index.EXACT_SEARCH_THRESHOLD", 0)
+    source = tracks(200)
+    embed_catalog(source[:100], str(tmp_path), loader=fake_loader, workers=1, chunk_size=50)
+    build_index(str(tmp_path), nlist=4)
+
+    embed_catalog(source, str(tmp_path), loader=fake_loader, workers=1, chunk_size=50)
+
+    assert not (tmp_path / "ivf.npz").exists() and not (tmp_path / "ivf_vectors.f32").exists()
+    index = SongIndex(str(tmp_path))
+    assert index.count == 200 and index.centroids is None
+    query = FakeEncoder().encode([build_descriptor(source[199])])[0]
+    assert index.search(query, k=1)[0]["track_id"] == "track199"
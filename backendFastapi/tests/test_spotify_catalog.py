@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from services.spotify_catalog import ClientCredentials, SpotifyAPIError, SpotifyCatalogClient
+
+
+class StubSpotify(ThreadingHTTPServer):
+    """Local stand-in for the Web API's /tracks batch endpoint and the accounts token endpoint."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests = []
+        self.throttle_next = 0
+        self.broken_ids = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        # None accepts any bearer token; otherwise only this one
+        self.valid_token = None
+        self.issued_tokens = 0
+        self.expires_in = 3600
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    @property
+    def token_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/token"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.issued_tokens += 1
+            server.valid_token = f"app-token-{server.issued_tokens}"
+        self.respond(200, {"access_token": server.valid_token, "token_type": "Bearer", "expires_in": server.expires_in})
+
+    def do_GET(self):
+        server = self.server
+        ids = parse_qs(urlsplit(self.path).query)["ids"][0].split(",")
+        if server.valid_token is not None and self.headers["Authorization"] != f"Bearer {server.valid_token}":
+            self.respond(401, {"error": {"status": 401, "message": "The access token expired"}})
+            return
+        with server.lock:
+            server.requests.append((time.monotonic(), ids))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            throttle = server.throttle_next > 0
+            server.throttle_next -= throttle
+        try:
+            time.sleep(0.01)
+            if throttle:
+                self.respond(429, {"error": {"status": 429}}, {"Retry-After": "1"})
+            elif server.broken_ids & set(ids):
+                self.respond(400, {"error": {"status": 400, "message": "invalid id"}})
+            else:
+                tracks = [None if i.startswith("gone") else {"id": i, "name": f"Song {i}"} for i in ids]
+                self.respond(200, {"tracks": tracks})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def respond(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def stub():
+    server = StubSpotify()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def make_client(stub, token="token", **kwargs):
+    return SpotifyCatalogClient(token, base_url=stub.url, rate_per_second=1000, burst=50, backoff_seconds=0.01, **kwargs)
+
+
+@pytest.mark.anyio
+async def test_ingest_batches_ids_with_bounded_concurrency(stub, tmp_path):
+    ids = [f"t{i}" for i in range(480)] + ["gone1"]
+    out = tmp_path / "tracks.jsonl"
+
+    result = await make_client(stub, concurrency=3).ingest("tracks", ids, str(out))
+
+    assert len(stub.requests) == 10  # 50 IDs per call
+    assert all(len(batch) <= 50 for _, batch in stub.requests)
+    assert stub.max_in_flight <= 3
+    rows = read_jsonl(out)
+    assert sorted(row["id"] for row in rows) == sorted(ids)
+    assert {"id": "gone1", "missing": True} in rows
+    assert result["items"] == len(ids)
+
+
+@pytest.mark.anyio
+async def test_429_pauses_all_requests_for_retry_after(stub, tmp_path):
+    stub.throttle_next = 1
+    out = tmp_path / "tracks.jsonl"
+
+    result = await make_client(stub, concurrency=2).ingest("tracks", [f"t{i}" for i in range(150)], str(out))
+
+    assert result["throttled"] == 1
+    throttled_at = stub.requests[0][0]
+    later = [t for t, _ in stub.requests[1:] if t > throttled_at + 0.05]
+    # Everything sent after the 429 waited out Retry-After
+    assert later and min(later) - throttled_at >= 0.9
+    assert len(read_jsonl(out)) == 150
+
+
+@pytest.mark.anyio
+async def test_resumes_from_checkpoint_without_refetching(stub, tmp_path):
+    ids = [f"t{i}" for i in range(200)]
+    out = tmp_path / "tracks.jsonl"
+    stub.broken_ids = {"t120"}
+
+    with pytest.raises(SpotifyAPIError):
+        await make_client(stub, concurrency=1).ingest("tracks", ids, str(out))
+    fetched_before = len(stub.requests)
+
+    stub.broken_ids = set()
+    result = await make_client(stub, concurrency=1).ingest("tracks", ids, str(out))
+
+    assert result["skipped_batches"] == 2
+    assert len(stub.requests) - fetched_before == 2
+    assert [row["id"] for row in read_jsonl(out)] == ids
+
+
+@pytest.mark.anyio
+async def test_rejected_app_token_is_renewed_once(stub, tmp_path):
+    credentials = ClientCredentials("id", "secret", token_url=stub.token_url)
+    client = make_client(stub, credentials, concurrency=2)
+    ids = [f"t{i}" for i in range(200)]
+
+    first = await client.ingest("tracks", ids[:100], str(tmp_path / "first.jsonl"))
+    # Spotify revokes the token before it is due to expire
+    stub.valid_token = "rotated-elsewhere"
+    second = await client.ingest("tracks", ids[100:], str(tmp_path / "second.jsonl"))
+
+    assert first["items"] == 100 and second["items"] == 100
+    assert second["unauthorized"] >= 1
+    # Concurrent 401s for the same token share one renewal
+    assert credentials.refreshes == 2
+
+
+@pytest.mark.anyio
+async def test_app_token_is_renewed_before_it_expires(stub, tmp_path):
+    stub.expires_in = 30  # Inside the 60 s margin, so every use counts as expired
+    credentials = ClientCredentials("id", "secret", token_url=stub.token_url)
+    client = make_client(stub, credentials, concurrency=1)
+
+    result = await client.ingest("tracks", [f"t{i}" for i in range(150)], str(tmp_path / "tracks.jsonl"))
+
+    assert result["unauthorized"] == 0
+    assert credentials.refreshes == 3
+
+
+@pytest.mark.anyio
+async def test_resume_with_different_ids_is_refused(stub, tmp_path):
+    out = tmp_path / "tracks.jsonl"
+    await make_client(stub).ingest("tracks", [f"t{i}" for i in range(100)], str(out))
+
+    with pytest.raises(ValueError, match="different ingestion run"):
+        await make_client(stub).ingest("tracks", [f"other{i}" for i in range(100)], str(out))
@@ -0,0 +1,113 @@
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from main import app
+from services import userinput_service
+from services.admission import AdmissionLane, Overloaded
+from tests.audio_fixtures import SAMPLE_RATE, tone
+
+
+class CountingWhisper:
+    """Transcribes each clip as one word per second of audio."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(len(audio))
+        return {"text": " ".join(["la"] * round(len(audio) / SAMPLE_RATE))}
+
+
+@pytest.fixture
+def whisper(install_models, monkeypatch):
+    model = CountingWhisper()
+    install_models(whisper=lambda: model)
+    monkeypatch.setattr("services.streaming_service.VAD_ENABLED", False)
+    return model
+
+
+def pcm16(samples: np.ndarray) -> bytes:
+    return (samples * 32767).astype(np.int16).tobytes()
+
+
+def test_streams_partials_then_final_analysis(whisper):
+    client = TestClient(app)
+    with client.websocket_connect("/user_input/stream_audio") as websocket:
+        # 4 seconds in half-second frames; partials every 2 seconds of new audio
+        audio = tone(4.0)
+        frame = SAMPLE_RATE // 2
+        partials = []
+        for start in range(0, len(audio), frame):
+            websocket.send_bytes(pcm16(audio[start:start + frame]))
+            if (start + frame) % (2 * SAMPLE_RATE) == 0:
+                partials.append(websocket.receive_json())
+        websocket.send_json({"type": "end"})
+        final = websocket.receive_json()
+
+    assert [p["type"] for p in partials] == ["partial", "partial"]
+    assert partials[0]["text"] == "la la"
+    assert final["type"] == "final"
+    assert final["text"] == "la la la la"
+    assert final["mood"] == "positive"
+    assert len(final["intent_context_embedding"]) == 768
+
+
+def test_window_text_is_committed_so_passes_stay_bounded(whisper, monkeypatch):
+    monkeypatch.setattr("services.streaming_service.STREAM_WINDOW_S", 2.0)
+    client = TestClient(app)
+    with client.websocket_connect("/user_input/stream_audio") as websocket:
+        for _ in range(3):
+            websocket.send_bytes(pcm16(tone(2.0)))
+            websocket.receive_json()
+        websocket.send_json({"type": "end"})
+        final = websocket.receive_json()
+
+    assert final["text"] == "la la la la la la"
+    assert max(whisper.calls) <= 2 * SAMPLE_RATE
+
+
+class ShedFirstLane(AdmissionLane):
+    """Rejects its first admission, then admits as usual."""
+
+    shed = 1
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.shed:
+            self.shed -= 1
+            raise Overloaded(self.name, 1)
+        async with super().admit():
+            yield
+
+
+def test_shed_partial_is_retried_with_the_next_frame(whisper, monkeypatch):
+    monkeypatch.setattr(userinput_service, "audio_lane", ShedFirstLane("audio", 1, 0))
+    client = TestClient(app)
+    with client.websocket_connect("/user_input/stream_audio") as websocket:
+        websocket.send_bytes(pcm16(tone(2.0)))
+        websocket.send_bytes(pcm16(tone(2.0)))
+        partial = websocket.receive_json()
+        websocket.send_json({"type": "end"})
+        final = websocket.receive_json()
+
+    assert partial["text"] == "la la la la"
+    assert whisper.calls[0] == 4 * SAMPLE_RATE
+    assert final["text"] == "la la la la"
+
+
+def test_streams_beyond_the_cap_are_turned_away(whisper, monkeypatch):
+    monkeypatch.setattr(userinput_service, "stream_lane", ShedFirstLane("stream", 1, 0))
+    client = TestClient(app)
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/user_input/stream_audio") as websocket:
+            websocket.receive_json()
+    with client.websocket_connect("/user_input/stream_audio") as websocket:
+        websocket.send_json({"type": "end"})
+        final = websocket.receive_json()
+
+    assert refused.value.code == 1013
+    assert final["type"] == "final"
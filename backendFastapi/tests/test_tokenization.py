@@ -0,0 +1,122 @@
+import gc
+from types import SimpleNamespace
+
+import numpy as np
+
+from services import tokenization
+from services.tokenization import SharedTokenization, classify, embed, length_buckets, split_windows, tokenizer_family
+
+
+class WordTokenizer:
+    """Whitespace tokenizer with the slice of the Hugging Face API the module uses."""
+
+    model_max_length = 16
+    pad_token_id = 1
+
+    def __init__(self, vocab=("<s>", "<pad>", "</s>", "happy", "sad", "song")):
+        self.vocab = {word: i for i, word in enumerate(vocab)}
+        self.calls = 0
+
+    def get_vocab(self):
+        return dict(self.vocab)
+
+    def __call__(self, texts, add_special_tokens=False, truncation=False):
+        self.calls += 1
+        return {"input_ids": [[self.vocab.get(word, 5) for word in text.split()] for text in texts]}
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [0] + list(ids) + [2]
+
+
+class CountingClassifier:
+    """Label 1 ("happy") wins when a window holds more happy than sad tokens."""
+
+    config = SimpleNamespace(num_labels=2, id2label={0: "sad", 1: "happy"})
+
+    def __init__(self):
+        self.widths = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.widths.append(input_ids.shape)
+        happy = (input_ids == 3).sum(axis=1)
+        sad = (input_ids == 4).sum(axis=1)
+        return SimpleNamespace(logits=np.stack([sad, happy], axis=1).astype(np.float32))
+
+
+class OneHotEncoder:
+    def __call__(self, input_ids, attention_mask):
+        return SimpleNamespace(last_hidden_state=np.eye(8, dtype=np.float32)[input_ids])
+
+
+def test_split_windows_overlap_and_cover_everything():
+    windows = split_windows(list(range(30)), size=14, overlap=4)
+
+    assert all(len(w) <= 14 for w in windows)
+    assert windows[0][-4:] == windows[1][:4]
+    assert sorted(set(i for w in windows for i in w)) == list(range(30))
+
+
+def test_length_buckets_respect_token_budget():
+    lengths = [3, 40, 4, 38, 5, 39]
+
+    buckets = length_buckets(lengths, max_batch_tokens=80)
+
+    assert buckets == [[0, 2, 4], [3, 5], [1]]
+    assert all(len(b) * max(lengths[i] for i in b) <= 80 for b in buckets)
+
+
+def test_same_vocabulary_is_tokenized_once_and_long_inputs_are_pooled():
+    tokenizer = WordTokenizer()
+    mood = SimpleNamespace(tokenizer=tokenizer, model=CountingClassifier())
+    emotion = SimpleNamespace(tokenizer=WordTokenizer(), model=CountingClassifier())  # Same vocab, separate object
+    # 40 tokens: longer than the 16-token limit, mostly happy overall but ending sad
+    long_text = " ".join(["happy"] * 28 + ["sad"] * 12)
+    texts = ["sad song", long_text, "happy"]
+
+    shared = SharedTokenization(texts)
+    moods = classify(mood, shared)
+    emotions = classify(emotion, shared)
+
+    assert moods == emotions == ["sad", "happy", "happy"]
+    assert tokenizer.calls == 1 and emotion.tokenizer.calls == 0
+    assert all(width <= 16 for _, width in mood.model.widths)
+
+
+def test_family_fingerprint_is_dropped_with_its_tokenizer():
+    gc.collect()
+    tracked = len(tokenization._family_keys)
+    tokenizer = WordTokenizer()
+    tokenizer_family(tokenizer)
+    assert len(tokenization._family_keys) == tracked + 1
+
+    del tokenizer
+    gc.collect()
+
+    assert len(tokenization._family_keys) == tracked
+
+
+def test_embedding_pools_over_windows():
+    tokenizer = WordTokenizer()
+    encoder = SimpleNamespace(tokenizer=tokenizer, model=OneHotEncoder(), max_length=8)
+
+    vectors = embed(encoder, SharedTokenization(["happy " * 20, "sad"]))
+
+    assert vectors.shape == (2, 8)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    # Every window of the long input is <s> happy... </s>, so those three token IDs carry all the weight
+    assert set(np.nonzero(vectors[0])[0]) == {0, 2, 3}
+
+
+def test_bucketing_cuts_padding_on_mixed_lengths(monkeypatch):
+    monkeypatch.setattr(tokenization, "MAX_BATCH_TOKENS", 64)
+    tokenization.tokenization_stats.clear()
+    texts = ["happy " * (1 + (i * 7) % 13) for i in range(32)]
+    classify(SimpleNamespace(tokenizer=WordTokenizer(), model=CountingClassifier()), SharedTokenization(texts))
+
+    stats = tokenization.tokenization_stats.snapshot()
+    naive_padded = len(texts) * max(len(t.split()) + 2 for t in texts)
+    assert stats["real_tokens"] == sum(len(t.split()) + 2 for t in texts)
+    assert stats["padded_tokens"] < 0.75 * naive_padded
@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from main import app
+from tests.audio_fixtures import tone, wav_bytes
+from tests.conftest import FakeWhisper
+
+
+class NoisyEncoder:
+    # Zero vectors serialize to almost nothing, which would hide the float16 saving
+    def encode(self, texts, **kwargs):
+        return np.random.default_rng(0).standard_normal((len(texts), 768)).astype(np.float32)
+
+
+@pytest.fixture
+def fake_models(install_models):
+    # Slow enough that a text request arrives while Whisper is still running
+    return install_models(whisper=lambda: FakeWhisper(seconds=1.0), intent_context=NoisyEncoder)
+
+
+@pytest.mark.anyio
+async def test_text_request_finishes_while_audio_is_transcribing(fake_models):
+    transport = httpx.ASGITransport(app=app)
+    finished = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def post_audio():
+            response = await client.post("/user_input/analyze_audio", files={"file": ("clip.wav", wav_bytes(tone(1.0)), "audio/wav")})
+            finished.append("audio")
+            return response
+
+        async def post_text():
+            # Give the audio request a head start so Whisper is already running
+            await asyncio.sleep(0.2)
+            response = await client.post("/user_input/analyze_text", json={"text": "feeling great"})
+            finished.append("text")
+            return response
+
+        audio_response, text_response = await asyncio.gather(post_audio(), post_text())
+
+    assert audio_response.status_code == 200
+    assert text_response.status_code == 200
+    assert text_response.json()["mood"] == "positive"
+    assert finished == ["text", "audio"]
+
+
+@pytest.mark.anyio
+async def test_ready_reports_cold_then_warm_models(fake_models):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        cold = await client.get("/ready")
+        fake_models.warmup()
+        warm = await client.get("/ready")
+
+    assert cold.status_code == 503
+    assert cold.json()["models"]["whisper"]["state"] == "not_loaded"
+    assert warm.status_code == 200
+    assert warm.json()["models"]["whisper"]["state"] == "loaded"
+
+
+@pytest.mark.anyio
+async def test_disabled_models_return_503(install_models):
+    install_models(enabled=[])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/user_input/analyze_text", json={"text": "feeling great"})
+
+    assert response.status_code == 503
+
+
+@pytest.mark.anyio
+async def test_embedding_encoding_is_negotiated(fake_models):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        default = await client.post("/user_input/analyze_text", json={"text": "happy vibes"})
+        compact = await client.post("/user_input/analyze_text?embedding_encoding=float16", json={"text": "happy vibes"})
+        invalid = await client.post("/user_input/analyze_text?embedding_encoding=bf16", json={"text": "happy vibes"})
+
+    assert len(default.json()["intent_context_embedding"]) == 768
+    assert compact.json()["embedding_encoding"] == "float16"
+    assert len(compact.content) < len(default.content) / 2
+    assert invalid.status_code == 400
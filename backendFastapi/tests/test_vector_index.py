@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pytest
+
+from services.vector_index import SongIndex, build_index
+
+DIM = 32
+
+
+def write_catalog(path, vectors, moods=None, mood_labels=()):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors.astype(np.float32).tofile(path / "vectors.f32")
+    (path / "ids.txt").write_text("".join(f"track{i}\n" for i in range(len(vectors))))
+    if moods is not None:
+        moods.astype(np.uint8).tofile(path / "mood.u8")
+    manifest = {"dim": vectors.shape[1], "count": len(vectors), "mood_labels": list(mood_labels), "emotion_labels": []}
+    (path / "manifest.json").write_text(json.dumps(manifest))
+    return vectors
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    rng = np.random.default_rng(0)
+    # Clustered data, like real embeddings
+    centers = rng.standard_normal((50, DIM))
+    vectors = centers[rng.integers(0, 50, 30000)] + 0.3 * rng.standard_normal((30000, DIM))
+    moods = rng.integers(0, 3, 30000)
+    vectors = write_catalog(tmp_path, vectors, moods, ["negative", "neutral", "positive"])
+    build_index(str(tmp_path), nlist=64)
+    return tmp_path, vectors, moods
+
+
+def test_ivf_search_recalls_exact_neighbours(catalog):
+    path, vectors, _ = catalog
+    index = SongIndex(str(path), nprobe=8)
+    rng = np.random.default_rng(1)
+
+    recalls = []
+    for query in vectors[rng.integers(0, len(vectors), 20)]:
+        exact = {f"track{i}" for i in np.argsort(-(vectors @ query))[:10]}
+        found = {track["track_id"] for track in index.search(query, k=10)}
+        recalls.append(len(exact & found) / 10)
+
+    assert np.mean(recalls) >= 0.9
+
+
+def test_results_are_sorted_by_score(catalog):
+    path, vectors, _ = catalog
+    results = SongIndex(str(path)).search(vectors[0], k=5)
+
+    assert results[0]["track_id"] == "track0"
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+
+def test_mood_filter_only_returns_matching_tracks(catalog):
+    path, vectors, moods = catalog
+    results = SongIndex(str(path), nprobe=1).search(vectors[0], k=20, mood="positive")
+
+    assert len(results) == 20
+    assert all(moods[int(r["track_id"][5:])] == 2 for r in results)
+
+
+def test_small_catalog_uses_exact_search(tmp_path):
+    vectors = write_catalog(tmp_path, np.eye(4, DIM))
+    index = SongIndex(str(tmp_path))
+
+    assert index.centroids is None
+    assert index.search(vectors[2], k=1)[0]["track_id"] == "track2"
+
+
+def test_index_built_for_fewer_rows_is_ignored(tmp_path):
+    rng = np.random.default_rng(2)
+    write_catalog(tmp_path, rng.standard_normal((25000, DIM)))
+    build_index(str(tmp_path), nlist=16)
+    vectors = write_catalog(tmp_path, rng.standard_normal((26000, DIM)))
+
+    index = SongIndex(str(tmp_path))
+
+    assert index.centroids is None
+    assert index.search(vectors[25500], k=1)[0]["track_id"] == "track25500"
+
+
+def test_empty_catalog_cannot_be_indexed(tmp_path):
+    write_catalog(tmp_path, np.zeros((0, DIM)))
+
+    with pytest.raises(ValueError, match="empty"):
+        build_index(str(tmp_path))
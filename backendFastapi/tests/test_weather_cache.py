@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from services import weather_cache as weather_cache_module
+from services.weather_cache import WeatherCache
+
+
+class Upstream:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.code = 0
+
+    async def __call__(self, latitude, longitude):
+        self.calls.append((latitude, longitude))
+        await asyncio.sleep(self.delay)
+        return self.code
+
+
+@pytest.mark.anyio
+async def test_nearby_requests_share_a_grid_cell():
+    upstream = Upstream()
+    cache = WeatherCache(upstream, grid_degrees=0.25)
+
+    await cache.get(51.51, -0.12)
+    await cache.get(51.55, -0.20)
+
+    assert len(upstream.calls) == 1
+    # Fetched for the cell center, not the first caller's exact location
+    assert upstream.calls[0] == (51.625, -0.125)
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_are_coalesced():
+    upstream = Upstream(delay=0.05)
+    cache = WeatherCache(upstream)
+
+    results = await asyncio.gather(*[cache.get(40.7, -74.0) for _ in range(10)])
+
+    assert results == [0] * 10
+    assert len(upstream.calls) == 1
+
+
+@pytest.mark.anyio
+async def test_slow_refresh_serves_stale_value_then_updates(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(weather_cache_module.time, "time", lambda: now[0])
+    upstream = Upstream()
+    cache = WeatherCache(upstream, bucket_seconds=900, stale_wait_seconds=0.01)
+    assert await cache.get(40.7, -74.0) == 0
+
+    # Next bucket: upstream is now slow and has a new value
+    now[0] = 1000.0
+    upstream.delay, upstream.code = 0.1, 3
+    assert await cache.get(40.7, -74.0) == 0
+    assert cache.stats()["stale_served"] == 1
+
+    await asyncio.sleep(0.15)
+    assert await cache.get(40.7, -74.0) == 3
+    assert len(upstream.calls) == 2
+
+
+@pytest.mark.anyio
+async def test_lru_eviction_bounds_memory():
+    cache = WeatherCache(Upstream(), grid_degrees=1.0, max_entries=2)
+
+    for longitude in (0.5, 1.5, 2.5):
+        await cache.get(0.5, longitude)
+
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,177 @@
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from main import app
+from services import userinput_service
+from services.model_registry import ModelRegistry
+from services.whisper_tiers import TierSelector, build_tiers
+from tests.audio_fixtures import tone, wav_bytes
+
+
+def make_selector(default_budget_s=None) -> TierSelector:
+    return TierSelector(build_tiers(["tiny", "base"], "small"), default_budget_s=default_budget_s)
+
+
+def test_build_tiers_keeps_main_model_as_most_accurate():
+    tiers = build_tiers(["tiny", "small", "base"], "small")
+    assert [tier.size for tier in tiers] == ["tiny", "base", "small"]
+    assert [tier.model_name for tier in tiers] == ["whisper_tiny", "whisper_base", "whisper"]
+
+
+def test_choose_most_accurate_tier_within_budget():
+    selector = make_selector()
+    # 5s clip: small ~1.35s, base ~0.5s, tiny ~0.25s
+    assert selector.choose(5.0, budget_s=2.0).size == "small"
+    assert selector.choose(5.0, budget_s=1.0).size == "base"
+    # Two clips queued per slot ahead triples the wait
+    assert selector.choose(5.0, budget_s=1.0, queue_depth=2, concurrency=1).size == "tiny"
+    assert selector.choose(5.0, budget_s=1.0, queue_depth=2, concurrency=2).size == "base"
+    # Nothing fits: the fastest tier still answers
+    assert selector.choose(60.0, budget_s=0.1).size == "tiny"
+    # No budget at all: headroom is assumed
+    assert selector.choose(60.0).size == "small"
+    assert selector.chosen == {"tiny": 2, "base": 2, "small": 2}
+
+
+def test_observed_latency_updates_estimates():
+    selector = make_selector()
+    small = selector.most_accurate
+    for _ in range(20):
+        selector.observe(small, duration_s=10.0, seconds=0.6 + 10.0 * 0.05)
+    assert small.seconds_per_audio_second == pytest.approx(0.05, abs=0.01)
+    assert selector.choose(5.0, budget_s=1.0).size == "small"
+
+
+def test_fast_tier_decodes_greedily(monkeypatch):
+    selector = make_selector()
+    monkeypatch.setattr(userinput_service, "whisper_selector", selector)
+    options = userinput_service.decoding_options(selector.fastest, "en")
+    assert options == {
+        "language": "en", "temperature": 0.0, "beam_size": None, "best_of": None, "condition_on_previous_text": False,
+    }
+    assert "temperature" not in userinput_service.decoding_options(selector.most_accurate)
+
+
+class RecordingWhisper:
+    def __init__(self, size, calls):
+        self.size = size
+        self.calls = calls
+
+    def transcribe(self, audio, **options):
+        self.calls.append((self.size, options))
+        return {"text": f"transcribed by {self.size}"}
+
+
+@pytest.fixture
+def tiered_models(install_models, monkeypatch):
+    calls = []
+    install_models(
+        whisper=lambda: RecordingWhisper("small", calls),
+        whisper_tiny=lambda: RecordingWhisper("tiny", calls),
+        whisper_base=lambda: RecordingWhisper("base", calls),
+    )
+    monkeypatch.setattr(userinput_service, "whisper_selector", make_selector(default_budget_s=None))
+    monkeypatch.setattr(userinput_service, "VAD_ENABLED", False)
+    return calls
+
+
+@pytest.mark.anyio
+async def test_latency_budget_picks_fast_tier(tiered_models):
+    transport = httpx.ASGITransport(app=app)
+    clip = wav_bytes(tone(2.0))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        fast = await client.post("/user_input/analyze_audio", params={"latency_budget_ms": 300},
+                                 files={"file": ("clip.wav", clip, "audio/wav")})
+        accurate = await client.post("/user_input/analyze_audio", files={"file": ("clip.wav", clip, "audio/wav")})
+        tiers = (await client.get("/user_input/whisper_tiers")).json()
+
+    assert fast.status_code == 200 and accurate.status_code == 200
+    (fast_size, fast_options), (accurate_size, accurate_options) = tiered_models
+    assert fast_size == "tiny" and fast_options["temperature"] == 0.0
+    assert accurate_size == "small" and "temperature" not in accurate_options
+    assert tiers["tiny"]["chosen"] == 1 and tiers["small"]["chosen"] == 1
+    assert userinput_service.audio_lane.stats()["degraded"] >= 1
+
+
+def test_model_load_is_not_timed_as_compute(monkeypatch):
+    selector = make_selector()
+    registry = ModelRegistry()
+
+    def slow_load(size):
+        time.sleep(0.3)
+        return RecordingWhisper(size, [])
+
+    for tier in selector.tiers:
+        registry.register(tier.model_name, lambda size=tier.size: slow_load(size))
+    monkeypatch.setattr(userinput_service, "model_registry", registry)
+    monkeypatch.setattr(userinput_service, "whisper_selector", selector)
+    monkeypatch.setattr(userinput_service, "VAD_ENABLED", False)
+    observed = []
+    monkeypatch.setattr(selector, "observe", lambda tier, duration_s, seconds: observed.append(seconds))
+
+    userinput_service.transcribe_audio_bytes(wav_bytes(tone(1.0)))
+
+    assert len(observed) == 1 and observed[0] < 0.1
+
+
+@pytest.mark.anyio
+async def test_language_is_validated_against_whisper(tiered_models):
+    pytest.importorskip("whisper.tokenizer")
+    transport = httpx.ASGITransport(app=app)
+    clip = wav_bytes(tone(2.0))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        by_code = await client.post("/user_input/analyze_audio", params={"language": "EN"},
+                                    files={"file": ("clip.wav", clip, "audio/wav")})
+        by_name = await client.post("/user_input/analyze_audio", params={"language": "german"},
+                                    files={"file": ("clip.wav", clip, "audio/wav")})
+        unknown = await client.post("/user_input/analyze_audio", params={"language": "xx"},
+                                    files={"file": ("clip.wav", clip, "audio/wav")})
+
+    assert by_code.status_code == 200 and by_name.status_code == 200
+    assert unknown.status_code == 400
+    assert [options["language"] for _, options in tiered_models] == ["en", "de"]
+
+
+def test_time_already_spent_comes_off_the_budget(monkeypatch):
+    monkeypatch.setattr(userinput_service, "whisper_selector", make_selector())
+    now = time.monotonic()
+    # 2 s clip: small needs ~0.9 s, base ~0.32 s, tiny ~0.16 s
+    assert userinput_service.choose_whisper_tier(2.0, deadline=now + 2.0).size == "small"
+    # Most of the budget went on queueing and decoding
+    assert userinput_service.choose_whisper_tier(2.0, deadline=now + 0.25).size == "tiny"
+    assert userinput_service.choose_whisper_tier(2.0, deadline=now - 1.0).size == "tiny"
+
+
+def test_backlog_comes_from_the_audio_pool_without_admission(monkeypatch):
+    monkeypatch.setattr(userinput_service, "whisper_selector", make_selector())
+    monkeypatch.setattr(userinput_service, "ADMISSION_ENABLED", False)
+    pool = SimpleNamespace(_work_queue=SimpleNamespace(qsize=lambda: 3), _max_workers=1)
+    monkeypatch.setattr(userinput_service, "audio_executor", pool)
+
+    assert userinput_service.audio_backlog() == (3, 1)
+    # Small would fit alone (~0.9 s); three clips waiting behind it make it four rounds' worth
+    assert userinput_service.choose_whisper_tier(2.0, deadline=time.monotonic() + 2.0).size == "base"
+
+
+@pytest.mark.anyio
+async def test_language_without_whisper_is_unavailable_not_an_error(tiered_models, monkeypatch):
+    transport = httpx.ASGITransport(app=app)
+    clip = wav_bytes(tone(1.0))
+    disabled = ModelRegistry(enabled=["mood"])
+    disabled.register("whisper", lambda: None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Whisper package missing: whisper.tokenizer can't be imported
+        monkeypatch.setitem(sys.modules, "whisper.tokenizer", None)
+        missing = await client.post("/user_input/analyze_audio", params={"language": "en"},
+                                    files={"file": ("clip.wav", clip, "audio/wav")})
+        # Whisper switched off for this deployment
+        monkeypatch.setattr(userinput_service, "model_registry", disabled)
+        off = await client.post("/user_input/analyze_audio", params={"language": "en"},
+                                files={"file": ("clip.wav", clip, "audio/wav")})
+
+    assert missing.status_code == 503 and "not installed" in missing.json()["detail"]
+    assert off.status_code == 503 and "not served" in off.json()["detail"]
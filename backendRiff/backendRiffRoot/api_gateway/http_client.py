@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connection pool shared by every gateway -> FastAPI call in this process
+FASTAPI_POOL_SIZE = int(os.getenv("FASTAPI_POOL_SIZE", "20"))
+FASTAPI_CONNECT_TIMEOUT = float(os.getenv("FASTAPI_CONNECT_TIMEOUT", "2"))
+# Read timeouts per endpoint (seconds); audio includes Whisper time
+FASTAPI_TEXT_TIMEOUT = float(os.getenv("FASTAPI_TEXT_TIMEOUT", "10"))
+FASTAPI_AUDIO_TIMEOUT = float(os.getenv("FASTAPI_AUDIO_TIMEOUT", "60"))
+FASTAPI_GEOIP_TIMEOUT = float(os.getenv("FASTAPI_GEOIP_TIMEOUT", "5"))
+
+# Circuit breaker: open after this many consecutive failures (errors, 5xx or slow calls)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+# Calls slower than this fraction of the endpoint's read timeout count as failures
+BREAKER_SLOW_CALL_RATIO = float(os.getenv("BREAKER_SLOW_CALL_RATIO", "0.8"))
+# How long the breaker stays open before letting a trial call through
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit for '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class UpstreamOverloaded(Exception):
+    """FastAPI shed the request (503 + Retry-After); the service is healthy, just busy."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"'{name}' is overloaded")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_load_shed(response):
+    """FastAPI's admission control answers 503 with Retry-After when a queue is full."""
+    return response.status_code == 503 and "Retry-After" in response.headers
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass, consecutive failures are counted.
+    Open: calls fail fast until `reset_seconds` have passed.
+    Half-open: one trial call decides whether to close or re-open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, slow_call_seconds=5.0, reset_seconds=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(self.name, max(1, int(remaining + 0.999)))
+
+    def record_success(self, latency):
+        if latency > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """The call ended without saying anything about the upstream (e.g. the client went away); let another trial through."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+        }
+
+
+def build_session(pool_size):
+    """Keep-alive session whose pool holds up to `pool_size` connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class UpstreamEndpoint:
+    """One FastAPI endpoint: shared pooled session, its own timeout, breaker and counters."""
+
+    def __init__(self, name, url, read_timeout, session):
+        self.name = name
+        self.url = url
+        self.timeout = (FASTAPI_CONNECT_TIMEOUT, read_timeout)
+        self.session = session
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            slow_call_seconds=read_timeout * BREAKER_SLOW_CALL_RATIO,
+            reset_seconds=BREAKER_RESET_SECONDS,
+        )
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.rejected_total = 0
+        self.shed_total = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, **kwargs):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            with self._lock:
+                self.rejected_total += 1
+            raise
+
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.requests_total += 1
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, self.url, timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self._record_error()
+            raise
+        except BaseException:
+            # Not an upstream fault (upload rejected mid-stream, client disconnect), but a half-open trial must not stay taken
+            self.breaker.release_trial()
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        if is_load_shed(response):
+            # Shedding is FastAPI working as intended; counting it would turn a brief overload into an open circuit
+            with self._lock:
+                self.shed_total += 1
+            self.breaker.release_trial()
+        elif response.status_code >= 500:
+            self._record_error()
+        else:
+            self.breaker.record_success(time.monotonic() - started)
+        return response
+
+    def _record_error(self):
+        with self._lock:
+            self.errors_total += 1
+        self.breaker.record_failure()
+
+    def get(self, **kwargs):
+        return self.request("GET", **kwargs)
+
+    def post(self, **kwargs):
+        return self.request("POST", **kwargs)
+
+    def snapshot(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "rejected_total": self.rejected_total,
+            "shed_total": self.shed_total,
+            "breaker": self.breaker.snapshot(),
+        }
+
+
+class FastAPIClient:
+    def __init__(self, user_input_url, geoip_url, pool_size=FASTAPI_POOL_SIZE):
+        self.pool_size = pool_size
+        self.session = build_session(pool_size)
+        user_input_url = user_input_url.rstrip("/")
+        self.analyze_text = UpstreamEndpoint("analyze_text", f"{user_input_url}/analyze_text", FASTAPI_TEXT_TIMEOUT, self.session)
+        self.analyze_audio = UpstreamEndpoint("analyze_audio", f"{user_input_url}/analyze_audio", FASTAPI_AUDIO_TIMEOUT, self.session)
+        self.geoip = UpstreamEndpoint("geoip", geoip_url, FASTAPI_GEOIP_TIMEOUT, self.session)
+
+    @property
+    def endpoints(self):
+        return [self.analyze_text, self.analyze_audio, self.geoip]
+
+    def metrics(self):
+        in_flight = sum(endpoint.in_flight for endpoint in self.endpoints)
+        return {
+            "pool": {"size": self.pool_size, "in_flight": in_flight, "utilization": in_flight / self.pool_size},
+            "endpoints": {endpoint.name: endpoint.snapshot() for endpoint in self.endpoints},
+        }
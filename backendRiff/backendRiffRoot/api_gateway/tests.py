@@ -1,3 +1,254 @@
-from django.test import TestCase
+import struct
+import time
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from . import views
+from .http_client import CircuitBreaker, CircuitOpenError, FastAPIClient
+from .upload_streaming import UploadRejected, wav_duration
+
+
+def fake_response(status_code=200, json_body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'{"mood": "positive"}' if json_body is None else json_body
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=30)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError) as ctx:
+            breaker.before_call()
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, slow_call_seconds=1.0)
+        breaker.record_success(latency=2.0)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial_closes_on_success(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0)
+        breaker.record_failure()
+
+        breaker.before_call()  # Trial call allowed once the reset period has passed
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()  # Only one trial at a time
+        breaker.record_success(latency=0.01)
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_aborted_trial_call_is_released(self):
+        endpoint = FastAPIClient("http://fastapi/user_input/", "http://fastapi/geoip/").analyze_audio
+        endpoint.breaker.reset_seconds = 0
+        endpoint.breaker.record_failure()
+        endpoint.breaker.state = CircuitBreaker.OPEN
+
+        with mock.patch.object(endpoint.session, "request", side_effect=UploadRejected("too big")):
+            with self.assertRaises(UploadRejected):
+                endpoint.post(data=b"audio")
+        with mock.patch.object(endpoint.session, "request", return_value=fake_response()):
+            self.assertEqual(endpoint.post(data=b"audio").status_code, 200)
+
+        self.assertEqual(endpoint.breaker.state, CircuitBreaker.CLOSED)
+
+
+class GatewayViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("listener", password="pw"))
+        self.fastapi = FastAPIClient("http://fastapi/user_input/", "http://fastapi/geoip/")
+        patcher = mock.patch.object(views, "fastapi_client", self.fastapi)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_analyze_text_reuses_pooled_session(self):
+        with mock.patch.object(self.fastapi.session, "request", return_value=fake_response()) as request:
+            response = self.client.post("/api/analyze_text/", {"text": "happy vibes"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        method, url = request.call_args.args
+        self.assertEqual((method, url), ("POST", "http://fastapi/user_input/analyze_text"))
+        self.assertEqual(request.call_args.kwargs["timeout"], self.fastapi.analyze_text.timeout)
+
+    def test_msgpack_accept_is_relayed_as_binary(self):
+        upstream = fake_response(json_body=b"\x83\xa4mood\xa8positive")
+        upstream.headers["Content-Type"] = "application/x-msgpack"
+        with mock.patch.object(self.fastapi.session, "request", return_value=upstream) as request:
+            response = self.client.post(
+                "/api/analyze_text/", {"text": "happy vibes"}, format="json",
+                HTTP_ACCEPT="application/x-msgpack", HTTP_X_EMBEDDING_ENCODING="float16",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-msgpack")
+        self.assertEqual(response.content, b"\x83\xa4mood\xa8positive")
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(request.call_args.kwargs["headers"], {"Accept": "application/x-msgpack"})
+        self.assertEqual(request.call_args.kwargs["params"], {"embedding_encoding": "float16"})
+
+    def test_open_breaker_returns_503_without_calling_fastapi(self):
+        failing = mock.Mock(side_effect=requests.exceptions.ConnectionError("refused"))
+        with mock.patch.object(self.fastapi.session, "request", failing):
+            for _ in range(self.fastapi.analyze_text.breaker.failure_threshold):
+                self.assertEqual(self.client.post("/api/analyze_text/", {"text": "hi"}, format="json").status_code, 502)
+            response = self.client.post("/api/analyze_text/", {"text": "hi"}, format="json")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(failing.call_count, self.fastapi.analyze_text.breaker.failure_threshold)
+
+    def test_load_shedding_is_relayed_and_keeps_breaker_closed(self):
+        shed = fake_response(503, b'{"detail": "The text queue is full, retry in 2s"}')
+        shed.headers["Retry-After"] = "2"
+        with mock.patch.object(self.fastapi.session, "request", return_value=shed) as request:
+            for _ in range(self.fastapi.analyze_text.breaker.failure_threshold + 1):
+                response = self.client.post("/api/analyze_text/", {"text": "hi"}, format="json")
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response["Retry-After"], "2")
+
+        self.assertEqual(request.call_count, self.fastapi.analyze_text.breaker.failure_threshold + 1)
+        self.assertEqual(self.fastapi.analyze_text.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.fastapi.analyze_text.shed_total, request.call_count)
+
+    def test_metrics_report_pool_and_breaker_state(self):
+        self.assertEqual(self.client.get("/api/gateway_metrics/").status_code, 403)
+
+        self.client.force_authenticate(User.objects.create_user("ops", password="pw", is_staff=True))
+        response = self.client.get("/api/gateway_metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["endpoints"]["geoip"]["breaker"]["state"], "closed")
+        self.assertEqual(response.json()["pool"]["size"], self.fastapi.pool_size)
+
+
+class ContextViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("listener", password="pw")
+        self.client = AsyncClient()
+        self.client.force_login(self.user)
+        self.fastapi = FastAPIClient("http://fastapi/user_input/", "http://fastapi/geoip/")
+        patcher = mock.patch.object(views, "fastapi_client", self.fastapi)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def slow_upstream(method, url, **kwargs):
+        time.sleep(0.3)
+        if "geoip" in url:
+            return fake_response(json_body=b'{"weather_code": 3}')
+        return fake_response(json_body=b'{"mood": "positive"}')
+
+    async def test_analysis_and_geoip_run_concurrently(self):
+        with mock.patch.object(self.fastapi.session, "request", side_effect=self.slow_upstream):
+            started = time.monotonic()
+            response = await self.client.post("/api/context/", {"text": "happy vibes"}, content_type="application/json")
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"analysis": {"mood": "positive"}, "geoip": {"weather_code": 3}})
+        self.assertLess(elapsed, 0.55)
+
+    async def test_geoip_failure_still_returns_analysis(self):
+        def upstream(method, url, **kwargs):
+            if "geoip" in url:
+                raise requests.exceptions.ConnectionError("refused")
+            return fake_response()
+
+        with mock.patch.object(self.fastapi.session, "request", side_effect=upstream):
+            response = await self.client.post("/api/context/", {"text": "hi"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["analysis"], {"mood": "positive"})
+        self.assertIsNone(response.json()["geoip"])
+        self.assertIn("geoip_error", response.json())
+
+    async def test_requires_authentication(self):
+        response = await AsyncClient().post("/api/context/", {"text": "hi"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 403)
+
+
+def wav_header(seconds, sample_rate=16000):
+    data_size = int(seconds * sample_rate * 2)
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    return b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE" + b"fmt " + struct.pack("<I", 16) + fmt + b"data" + struct.pack("<I", data_size)
+
+
+class AudioPassthroughTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("listener", password="pw"))
+        self.fastapi = FastAPIClient("http://fastapi/user_input/", "http://fastapi/geoip/")
+        patcher = mock.patch.object(views, "fastapi_client", self.fastapi)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.relayed = []
+
+    def capture(self, method, url, data=None, headers=None, **kwargs):
+        for chunk in data:
+            self.relayed.append(chunk)
+        self.relayed_headers = headers
+        return fake_response()
+
+    def post_audio(self, audio, **extra):
+        file = SimpleUploadedFile("clip.wav", audio, content_type="audio/wav")
+        return self.client.post("/api/analyze_audio/", {"file": file}, format="multipart", **extra)
+
+    def test_body_is_streamed_to_fastapi_in_chunks(self):
+        audio = wav_header(5) + b"\x01" * 160000
+        with mock.patch.object(self.fastapi.session, "request", side_effect=self.capture):
+            response = self.post_audio(audio)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(self.relayed), 1)
+        self.assertTrue(all(len(chunk) <= 64 * 1024 for chunk in self.relayed))
+        body = b"".join(self.relayed)
+        self.assertIn(audio, body)
+        self.assertTrue(self.relayed_headers["Content-Type"].startswith("multipart/form-data; boundary="))
+
+    def test_long_wav_is_rejected_from_its_header(self):
+        request = mock.Mock()
+        with mock.patch.object(self.fastapi.session, "request", request):
+            response = self.post_audio(wav_header(3600) + b"\x00" * 1000)
+
+        self.assertEqual(response.status_code, 413)
+        request.assert_not_called()
+
+    def test_declared_duration_and_size_limits(self):
+        request = mock.Mock()
+        with mock.patch.object(self.fastapi.session, "request", request):
+            too_long = self.post_audio(b"audio", HTTP_X_AUDIO_DURATION="900")
+            with mock.patch("api_gateway.upload_streaming.GATEWAY_MAX_AUDIO_BYTES", 100):
+                too_big = self.post_audio(b"\x00" * 1000)
+
+        self.assertEqual(too_long.status_code, 413)
+        self.assertEqual(too_big.status_code, 413)
+        request.assert_not_called()
+
+    def test_malformed_limit_headers_are_bad_requests(self):
+        request = mock.Mock()
+        with mock.patch.object(self.fastapi.session, "request", request):
+            bad_length = self.post_audio(b"audio", CONTENT_LENGTH="lots")
+            bad_duration = self.post_audio(b"audio", HTTP_X_AUDIO_DURATION="soon")
+
+        self.assertEqual(bad_length.status_code, 400)
+        self.assertEqual(bad_length.json(), {"error": "Invalid Content-Length header"})
+        self.assertEqual(bad_duration.status_code, 400)
+        request.assert_not_called()
+
+    def test_wav_duration_parses_riff_header(self):
+        self.assertAlmostEqual(wav_duration(b"--boundary\r\n\r\n" + wav_header(12.5)), 12.5)
+        self.assertIsNone(wav_duration(b"ID3 not a wav"))
@@ -0,0 +1,84 @@
+import os
+import struct
+
+# Largest audio upload the gateway will relay, and the longest clip (seconds)
+GATEWAY_MAX_AUDIO_BYTES = int(os.getenv("GATEWAY_MAX_AUDIO_BYTES", str(25 * 1024 * 1024)))
+GATEWAY_MAX_AUDIO_SECONDS = float(os.getenv("GATEWAY_MAX_AUDIO_SECONDS", "300"))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Raised when an upload exceeds the size or duration limits, or declares them in malformed headers."""
+
+    def __init__(self, message, status_code=413):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def wav_duration(data):
+    """
+    Duration in seconds of a WAV clip from its RIFF header, if `data` contains one.
+    Lets the gateway reject long clips from the first chunk instead of after the upload.
+    """
+    start = data.find(b"RIFF")
+    if start < 0 or data[start + 8:start + 12] != b"WAVE":
+        return None
+    position = start + 12
+    byte_rate = None
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        (chunk_size,) = struct.unpack("<I", data[position + 4:position + 8])
+        if chunk_id == b"fmt " and position + 16 <= len(data):
+            (byte_rate,) = struct.unpack("<I", data[position + 16:position + 20])
+        elif chunk_id == b"data":
+            # Streaming encoders write 0 or 0xFFFFFFFF when the length is unknown
+            if not byte_rate or chunk_size in (0, 0xFFFFFFFF):
+                return None
+            return chunk_size / byte_rate
+        position += 8 + chunk_size + (chunk_size % 2)
+    return None
+
+
+def check_declared_limits(content_length, declared_duration):
+    """Reject from request headers alone, before reading any of the body."""
+    if content_length:
+        try:
+            size = int(content_length)
+        except ValueError:
+            raise UploadRejected("Invalid Content-Length header", status_code=400)
+        if size > GATEWAY_MAX_AUDIO_BYTES:
+            raise UploadRejected(f"Audio upload exceeds {GATEWAY_MAX_AUDIO_BYTES} bytes")
+    if declared_duration:
+        try:
+            seconds = float(declared_duration)
+        except ValueError:
+            raise UploadRejected("Invalid X-Audio-Duration header", status_code=400)
+        if seconds > GATEWAY_MAX_AUDIO_SECONDS:
+            raise UploadRejected(f"Audio clip exceeds {GATEWAY_MAX_AUDIO_SECONDS:g} seconds")
+
+
+def check_first_chunk(first_chunk):
+    duration = wav_duration(first_chunk)
+    if duration is not None and duration > GATEWAY_MAX_AUDIO_SECONDS:
+        raise UploadRejected(f"Audio clip exceeds {GATEWAY_MAX_AUDIO_SECONDS:g} seconds")
+
+
+def stream_body(stream, first_chunk, chunk_size=UPLOAD_CHUNK_SIZE, max_bytes=None):
+    """
+    Yield the raw request body in fixed-size chunks, so memory per upload
+    stays constant. Raises UploadRejected once more than `max_bytes` were read.
+    """
+    max_bytes = GATEWAY_MAX_AUDIO_BYTES if max_bytes is None else max_bytes
+    total = len(first_chunk)
+    if total > max_bytes:
+        raise UploadRejected(f"Audio upload exceeds {max_bytes} bytes")
+    if first_chunk:
+        yield first_chunk
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadRejected(f"Audio upload exceeds {max_bytes} bytes")
+        yield chunk
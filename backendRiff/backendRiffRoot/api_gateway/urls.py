@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import analyze_text, analyze_audio, fetch_geoip
+from .views import analyze_text, analyze_audio, fetch_geoip, fetch_context, gateway_metrics
 
 urlpatterns = [
     path("analyze_text/", analyze_text, name="analyze_text"),
     path("analyze_audio/", analyze_audio, name="analyze_audio"),
     path("fetch_geoip/", fetch_geoip, name="fetch_geoip"),
+    path("context/", fetch_context, name="fetch_context"),
+    path("gateway_metrics/", gateway_metrics, name="gateway_metrics"),
 ]
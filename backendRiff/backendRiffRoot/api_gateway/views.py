@@ -1,14 +1,83 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import BaseRenderer
 from rest_framework.response import Response
-from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework import exceptions, status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+import asyncio
+import json
 import requests
 import os
+from .http_client import FastAPIClient, CircuitOpenError, UpstreamOverloaded, is_load_shed
+from .upload_streaming import UploadRejected, check_declared_limits, check_first_chunk, stream_body, UPLOAD_CHUNK_SIZE
 
 # URLs for FastAPI services
 USER_INPUT_API_URL = os.getenv("USER_INPUT_API_URL", "http://127.0.0.1:8000/user_input/")
 GEOIP_API_URL = os.getenv("GEOIP_API_URL", "http://127.0.0.1:8000/geoip/")
 
+# Pooled keep-alive client with per-endpoint timeouts and circuit breakers
+fastapi_client = FastAPIClient(USER_INPUT_API_URL, GEOIP_API_URL)
+
+def circuit_open_response(error):
+    response = Response({"error": f"FastAPI service unavailable ({error.name})"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+def overloaded_response(retry_after):
+    """Relay FastAPI's load shedding as-is, so clients back off for Retry-After instead of seeing a 502."""
+    response = Response({"error": "FastAPI service is overloaded, retry later"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+# Negotiation for compact intent_context_embedding encodings (see FastAPI services/encoding.py)
+EMBEDDING_ENCODING_PARAM = "embedding_encoding"
+EMBEDDING_ENCODING_HEADER = "X-Embedding-Encoding"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+class MsgpackPassthroughRenderer(BaseRenderer):
+    """
+    Lets DRF's content negotiation accept `Accept: application/x-msgpack`.
+    Analyses are relayed as FastAPI's msgpack bytes by passthrough_response;
+    only the gateway's own error bodies are packed here.
+    """
+    media_type = MSGPACK_MEDIA_TYPE
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, bytes):
+            return data
+        import msgpack
+        return msgpack.packb(data, use_bin_type=True)
+
+
+ANALYSIS_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, MsgpackPassthroughRenderer]
+
+def embedding_negotiation(request):
+    """Query params and headers that carry the client's embedding encoding choice to FastAPI."""
+    params = {}
+    # The header form is forwarded as the query param, which FastAPI reads first
+    encoding = request.GET.get(EMBEDDING_ENCODING_PARAM) or request.headers.get(EMBEDDING_ENCODING_HEADER)
+    if encoding:
+        params[EMBEDDING_ENCODING_PARAM] = encoding
+    headers = {}
+    if MSGPACK_MEDIA_TYPE in request.headers.get("Accept", ""):
+        headers["Accept"] = MSGPACK_MEDIA_TYPE
+    return params, headers
+
+def passthrough_response(response):
+    """Relay the FastAPI body as-is instead of parsing and re-serializing the embedding."""
+    return HttpResponse(response.content, status=response.status_code, content_type=response.headers.get("Content-Type", "application/json"))
+
+
 def get_client_ip(request):
     """Extract user's IP address from request headers."""
     x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
@@ -21,6 +90,7 @@ def get_client_ip(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(ANALYSIS_RENDERERS)
 def analyze_text(request):
     """Forward text input to FastAPI user input service."""
     try:
@@ -28,29 +98,63 @@ def analyze_text(request):
         if not text:
             return Response({"error": "Text input is required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        response = requests.post(f"{USER_INPUT_API_URL}/analyze_text", json={"text": text})
+        params, headers = embedding_negotiation(request)
+        response = fastapi_client.analyze_text.post(json={"text": text}, params=params, headers=headers)
+        if is_load_shed(response):
+            return overloaded_response(response.headers["Retry-After"])
         response.raise_for_status()
-        return Response(response.json())
+        return passthrough_response(response)
     
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except requests.exceptions.RequestException as e:
         return Response({"error": f"FastAPI service error: {str(e)}"}, status=status.HTTP_502_BAD_GATEWAY)
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(ANALYSIS_RENDERERS)
 def analyze_audio(request):
-    """Forward audio file to FastAPI user input service."""
+    """
+    Forward audio file to FastAPI user input service.
+    The multipart body is relayed to FastAPI in chunks as it arrives, so the
+    gateway never holds or spools the whole clip. Size and duration limits are
+    checked from the headers (Content-Length, X-Audio-Duration, WAV header)
+    before streaming starts.
+    """
     try:
-        if "file" not in request.FILES:
+        django_request = request._request
+        if not request.content_type.startswith("multipart/form-data"):
             return Response({"error": "Audio file is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        file = request.FILES["file"]
-        files = {"file": (file.name, file, file.content_type)}
+        check_declared_limits(request.META.get("CONTENT_LENGTH"), request.headers.get("X-Audio-Duration"))
+        params, headers = embedding_negotiation(request)
 
-        response = requests.post(f"{USER_INPUT_API_URL}/analyze_audio", files=files)
+        if django_request._read_started:
+            # Something (e.g. a CSRF check reading request.POST) already parsed the body: forward the parsed file
+            if "file" not in request.FILES:
+                return Response({"error": "Audio file is required"}, status=status.HTTP_400_BAD_REQUEST)
+            file = request.FILES["file"]
+            files = {"file": (file.name, file, file.content_type)}
+            response = fastapi_client.analyze_audio.post(files=files, params=params, headers=headers)
+        else:
+            first_chunk = django_request.read(UPLOAD_CHUNK_SIZE)
+            check_first_chunk(first_chunk)
+            headers["Content-Type"] = request.content_type
+            response = fastapi_client.analyze_audio.post(data=stream_body(django_request, first_chunk), params=params, headers=headers)
+
+        if response.status_code == 422:
+            # FastAPI's validation error for a multipart body without a `file` part
+            return Response({"error": "Audio file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if is_load_shed(response):
+            return overloaded_response(response.headers["Retry-After"])
         response.raise_for_status()
-        return Response(response.json())
+        return passthrough_response(response)
 
+    except UploadRejected as e:
+        return Response({"error": str(e)}, status=e.status_code)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except requests.exceptions.RequestException as e:
         return Response({"error": f"FastAPI service error: {str(e)}"}, status=status.HTTP_502_BAD_GATEWAY)
 
@@ -71,9 +175,109 @@ def fetch_geoip(request):
         if not user_ip:
             return Response({"error": "Could not detect IP"}, status=status.HTTP_400_BAD_REQUEST)
 
-        response = requests.get(f"{GEOIP_API_URL}", params={"ip": user_ip})
+        response = fastapi_client.geoip.get(params={"ip": user_ip})
         response.raise_for_status()
         return Response(response.json())
 
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except requests.exceptions.RequestException as e:
         return Response({"error": f"FastAPI service error: {str(e)}"}, status=status.HTTP_502_BAD_GATEWAY)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def gateway_metrics(request):
+    """Connection pool usage and circuit breaker state for the FastAPI upstreams."""
+    return Response(fastapi_client.metrics())
+
+
+def authenticate_request(request):
+    """Run the DRF authenticators for a plain (async) Django view; returns None if unauthenticated."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return None
+    return user if user is not None and user.is_authenticated else None
+
+
+def request_analysis(text, audio, params):
+    if audio is not None:
+        files = {"file": (audio.name, audio, audio.content_type)}
+        response = fastapi_client.analyze_audio.post(files=files, params=params)
+    else:
+        response = fastapi_client.analyze_text.post(json={"text": text}, params=params)
+    if is_load_shed(response):
+        raise UpstreamOverloaded("analyze", response.headers["Retry-After"])
+    response.raise_for_status()
+    return response.json()
+
+
+def request_geoip(ip):
+    response = fastapi_client.geoip.get(params={"ip": ip})
+    response.raise_for_status()
+    return response.json()
+
+
+@csrf_exempt
+async def fetch_context(request):
+    """
+    Analyze text or audio and look up GeoIP/weather for the client in one call.
+    Both FastAPI requests run concurrently, so latency is the slower of the two
+    rather than their sum. GeoIP is optional context: if it fails (or
+    `disable_geoip=true`), `geoip` is null and the analysis is still returned.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    user = await sync_to_async(authenticate_request)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_403_FORBIDDEN)
+
+    audio = request.FILES.get("file")
+    if request.content_type == "application/json":
+        try:
+            text = (json.loads(request.body or b"{}").get("text") or "").strip()
+        except (ValueError, AttributeError):
+            return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        text = request.POST.get("text", "").strip()
+    if not text and audio is None:
+        return JsonResponse({"error": "Text input or audio file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    params, _ = embedding_negotiation(request)
+    # The pooled client is blocking, so each leg runs on its own worker thread
+    analysis_call = sync_to_async(request_analysis, thread_sensitive=False)(text, audio, params)
+
+    calls = [analysis_call]
+    disable_geoip = request.GET.get("disable_geoip", "false").lower() == "true"
+    user_ip = get_client_ip(request)
+    if not disable_geoip and user_ip:
+        calls.append(sync_to_async(request_geoip, thread_sensitive=False)(user_ip))
+
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    analysis = results[0]
+    geoip = results[1] if len(results) > 1 else None
+
+    if isinstance(analysis, CircuitOpenError):
+        response = JsonResponse({"error": f"FastAPI service unavailable ({analysis.name})"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response["Retry-After"] = str(analysis.retry_after)
+        return response
+    if isinstance(analysis, UpstreamOverloaded):
+        response = JsonResponse({"error": "FastAPI service is overloaded, retry later"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response["Retry-After"] = str(analysis.retry_after)
+        return response
+    if isinstance(analysis, requests.exceptions.RequestException):
+        return JsonResponse({"error": f"FastAPI service error: {str(analysis)}"}, status=status.HTTP_502_BAD_GATEWAY)
+    if isinstance(analysis, BaseException):
+        raise analysis
+
+    payload = {"analysis": analysis, "geoip": None}
+    if isinstance(geoip, BaseException):
+        payload["geoip_error"] = str(geoip)
+    elif geoip is not None:
+        payload["geoip"] = geoip
+    elif disable_geoip:
+        payload["geoip_disabled"] = True
+    return JsonResponse(payload)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpotifyToken',
+            fields=[
+                ('spotify_user_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('access_token', models.TextField()),
+                ('refresh_token', models.TextField(blank=True, default='')),
+                ('expires_at', models.FloatField()),
+                ('last_used_at', models.FloatField()),
+                ('refresh_claimed_until', models.FloatField(default=0)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SpotifyAccessToken',
+            fields=[
+                ('token_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('expires_at', models.FloatField()),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issued_tokens', to='userauth.spotifytoken')),
+            ],
+        ),
+    ]
@@ -1,3 +1,28 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class SpotifyToken(models.Model):
+    """
+    Latest Spotify tokens for one Spotify user. Kept in the database so every
+    gateway worker, and its refresh scheduler, sees the same record.
+    Times are Unix timestamps, as returned by time.time().
+    """
+
+    spotify_user_id = models.CharField(max_length=255, primary_key=True)
+    # The Django user who completed the Spotify login; only owned records are refreshed
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE)
+    access_token = models.TextField()
+    refresh_token = models.TextField(blank=True, default="")
+    expires_at = models.FloatField()
+    last_used_at = models.FloatField()
+    # Set by the worker refreshing this record, so other workers' schedulers skip it
+    refresh_claimed_until = models.FloatField(default=0)
+
+
+class SpotifyAccessToken(models.Model):
+    """Every access token issued for an account, by hash, so superseded tokens resolve until they expire."""
+
+    token_hash = models.CharField(max_length=64, primary_key=True)
+    account = models.ForeignKey(SpotifyToken, on_delete=models.CASCADE, related_name="issued_tokens")
+    expires_at = models.FloatField()
@@ -1,3 +1,167 @@
+import json
+import time
+from unittest import mock
+
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from . import views
+from .models import SpotifyAccessToken, SpotifyToken
+from .token_store import SpotifyTokenStore, TokenRefreshError
+
+
+def fake_response(status_code=200, body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode()
+    return response
+
+
+class TokenStoreTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("listener", password="pw")
+
+    def make_store(self, refresh_fn, **kwargs):
+        store = SpotifyTokenStore(refresh_fn, refresh_margin=300, **kwargs)
+        store.start = mock.Mock()  # No background thread in tests
+        return store
+
+    def test_refreshes_tokens_close_to_expiry_and_keeps_refresh_token(self):
+        refresh_fn = mock.Mock(return_value={"access_token": "new", "expires_in": 3600})
+        store = self.make_store(refresh_fn)
+        store.save("listener", {"access_token": "old", "refresh_token": "r1", "expires_in": 60}, owner=self.owner.pk)
+
+        store.refresh_expiring()
+
+        refresh_fn.assert_called_once_with("r1")
+        record = store.get("listener")
+        self.assertEqual(record.access_token, "new")
+        self.assertEqual(record.refresh_token, "r1")
+        # The superseded token still resolves to its user until it expires
+        self.assertEqual(store.find_user("old"), "listener")
+        store.start.assert_called()
+
+    def test_failed_refresh_drops_user(self):
+        store = self.make_store(mock.Mock(return_value={"error": "invalid_grant"}))
+        store.save("listener", {"access_token": "old", "refresh_token": "r1", "expires_in": 0}, owner=self.owner.pk)
+
+        with self.assertRaises(TokenRefreshError):
+            store.current_access_token("listener")
+        SpotifyToken.objects.filter(pk="listener").update(expires_at=time.time() + 60)
+        store.refresh_expiring()
+
+        self.assertIsNone(store.get("listener"))
+
+    def test_unowned_tokens_are_never_refreshed_and_dropped_once_expired(self):
+        refresh_fn = mock.Mock()
+        store = self.make_store(refresh_fn)
+        store.save("anonymous", {"access_token": "a", "refresh_token": "r1", "expires_in": 60})
+
+        store.refresh_expiring()
+        self.assertIsNotNone(store.get("anonymous"))
+        store.start.assert_not_called()
+
+        SpotifyToken.objects.filter(pk="anonymous").update(expires_at=time.time() - 1)
+        store.refresh_expiring()
+
+        refresh_fn.assert_not_called()
+        self.assertIsNone(store.get("anonymous"))
+        self.assertFalse(SpotifyAccessToken.objects.exists())
+
+    def test_idle_owned_tokens_are_dropped(self):
+        refresh_fn = mock.Mock(return_value={"access_token": "new", "expires_in": 3600})
+        store = self.make_store(refresh_fn, idle_ttl=3600)
+        store.save("listener", {"access_token": "old", "refresh_token": "r1", "expires_in": 60}, owner=self.owner.pk)
+        # Background refreshes don't count as use
+        store.refresh_expiring()
+        SpotifyToken.objects.filter(pk="listener").update(last_used_at=time.time() - 7200)
+
+        store.refresh_expiring()
+
+        self.assertIsNone(store.get("listener"))
+        refresh_fn.assert_called_once()
+
+    def test_claimed_record_is_refreshed_by_one_worker_only(self):
+        first_worker = self.make_store(mock.Mock(return_value={"access_token": "new", "expires_in": 60}))
+        second_worker = self.make_store(mock.Mock())
+        first_worker.save("listener", {"access_token": "old", "refresh_token": "r1", "expires_in": 60}, owner=self.owner.pk)
+        SpotifyToken.objects.filter(pk="listener").update(refresh_claimed_until=time.time() + 60)
+
+        second_worker.refresh_expiring()
+
+        second_worker.refresh_fn.assert_not_called()
+
+    def test_refresh_request_has_a_timeout(self):
+        with mock.patch.object(views.requests, "post", return_value=fake_response(body={"access_token": "t"})) as post:
+            views.refresh_access_token("r1")
+
+        self.assertEqual(post.call_args.kwargs["timeout"], views.SPOTIFY_API_TIMEOUT)
+
+
+class SpotifyProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user("listener", password="pw")
+        self.client.force_authenticate(self.user)
+        self.store = SpotifyTokenStore(mock.Mock(), refresh_margin=300)
+        self.store.start = mock.Mock()
+        patcher = mock.patch.object(views, "token_store", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_profile_is_served_from_cache(self):
+        profile = fake_response(body={"id": "spotify-user", "display_name": "Listener"})
+        with mock.patch.object(views.requests, "get", return_value=profile) as get:
+            for _ in range(3):
+                response = self.client.get("/api/auth/profile/", HTTP_AUTHORIZATION="Bearer abc")
+                self.assertEqual(response.json(), {"display_name": "Listener"})
+
+        get.assert_called_once()
+
+    @staticmethod
+    def spotify_get(url, headers, timeout):
+        if headers["Authorization"] == "Bearer stale":
+            return fake_response(401, {"error": {"status": 401}})
+        return fake_response(body={"id": "spotify-user", "display_name": "Listener"})
+
+    def test_expired_token_is_refreshed_instead_of_failing(self):
+        self.store.save("spotify-user", {"access_token": "stale", "refresh_token": "r1", "expires_in": 3600}, owner=self.user.pk)
+        self.store.refresh_fn.return_value = {"access_token": "fresh", "expires_in": 3600}
+        spotify_get = self.spotify_get
+
+        with mock.patch.object(views.requests, "get", side_effect=spotify_get):
+            response = self.client.get("/api/auth/profile/", HTTP_AUTHORIZATION="Bearer stale")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"display_name": "Listener", "access_token": "fresh"})
+
+    def test_tokens_are_never_handed_to_other_callers(self):
+        self.store.save("spotify-user", {"access_token": "stale", "refresh_token": "r1", "expires_in": 3600}, owner=self.user.pk)
+        self.store.save("spotify-user", {"access_token": "fresh", "expires_in": 3600})
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("intruder", password="pw"))
+        with mock.patch.object(views.requests, "get", side_effect=self.spotify_get):
+            anonymous = APIClient().get("/api/auth/profile/", HTTP_AUTHORIZATION="Bearer stale")
+            intruder = other.get("/api/auth/profile/", HTTP_AUTHORIZATION="Bearer stale")
+
+        for response in (anonymous, intruder):
+            self.assertEqual(response.status_code, 401)
+            self.assertNotIn("access_token", response.json())
+        self.store.refresh_fn.assert_not_called()
+
+    def test_callback_registers_tokens(self):
+        token_data = {"access_token": "abc", "refresh_token": "r1", "expires_in": 3600}
+        profile = fake_response(body={"id": "spotify-user", "display_name": "Listener"})
+        with mock.patch.object(views.requests, "post", return_value=fake_response(body=token_data)), \
+                mock.patch.object(views.requests, "get", return_value=profile):
+            response = self.client.post("/api/auth/spotify-token/", {"code": "c"}, format="json")
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.store.find_user("abc"), "spotify-user")
+        self.assertTrue(self.store.is_owner("spotify-user", self.user))
+        self.assertGreater(self.store.get("spotify-user").expires_at, time.time())
@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from .models import SpotifyAccessToken, SpotifyToken
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_PREFIX = "spotify_profile:"
+
+
+def token_hash(token):
+    """Key derived from a token, so raw tokens never end up in cache keys or logs."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+# ------------------------ #
+# Profile cache
+# ------------------------ #
+
+def get_cached_profile(access_token):
+    return cache.get(PROFILE_CACHE_PREFIX + token_hash(access_token))
+
+
+def cache_profile(access_token, profile, ttl):
+    if ttl > 0:
+        cache.set(PROFILE_CACHE_PREFIX + token_hash(access_token), profile, ttl)
+
+
+# ------------------------ #
+# Token store
+# ------------------------ #
+
+class TokenRefreshError(Exception):
+    """Raised when there is no refresh token or Spotify rejects it."""
+
+
+class SpotifyTokenStore:
+    """
+    Per-user Spotify tokens with proactive refresh, stored in the database
+    (userauth.models) so every worker shares them.
+
+    Records are keyed by Spotify user ID. A daemon thread, started once an
+    owned record is saved, refreshes owned tokens expiring within
+    `refresh_margin` seconds so profile requests rarely run into an expired
+    token; each record is claimed first so only one worker refreshes it.
+    Unowned records are never refreshed and are dropped once their token
+    expires, and owned ones unused for `idle_ttl` seconds are dropped too.
+    Superseded access tokens keep resolving to their user until they expire,
+    but the newest token is only ever handed to the Django user who owns the
+    record (see `is_owner`), so a leaked token can't be traded for fresh ones.
+    """
+
+    def __init__(self, refresh_fn, refresh_margin=300, interval=60, idle_ttl=7 * 86400):
+        self.refresh_fn = refresh_fn
+        self.refresh_margin = refresh_margin
+        self.interval = interval
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler = None
+
+    def save(self, user_key, token_data, owner=None, touch=True):
+        """
+        Store a Spotify token response from either the code exchange or a refresh.
+        `touch` marks the record as used; background refreshes pass False so idle records still expire.
+        """
+        now = time.time()
+        with transaction.atomic():
+            previous = SpotifyToken.objects.filter(pk=user_key).first()
+            # Refresh responses usually omit the refresh token; keep the old one
+            refresh_token = token_data.get("refresh_token") or (previous.refresh_token if previous else "")
+            record, _ = SpotifyToken.objects.update_or_create(pk=user_key, defaults={
+                "access_token": token_data["access_token"],
+                "refresh_token": refresh_token,
+                "expires_at": now + int(token_data.get("expires_in", 3600)),
+                "owner_id": owner if owner is not None else (previous.owner_id if previous else None),
+                "last_used_at": now if touch or previous is None else previous.last_used_at,
+                "refresh_claimed_until": 0,
+            })
+            SpotifyAccessToken.objects.update_or_create(
+                token_hash=token_hash(record.access_token),
+                defaults={"account": record, "expires_at": record.expires_at},
+            )
+        if record.owner_id is not None:
+            self.start()
+        return record
+
+    def get(self, user_key):
+        return SpotifyToken.objects.filter(pk=user_key).first()
+
+    def find_user(self, access_token):
+        return (
+            SpotifyAccessToken.objects.filter(token_hash=token_hash(access_token), expires_at__gt=time.time())
+            .values_list("account_id", flat=True).first()
+        )
+
+    def is_owner(self, user_key, user):
+        """Whether `user` (a Django user) logged in as this Spotify user and may receive its tokens."""
+        if user is None or not user.is_authenticated:
+            return False
+        return SpotifyToken.objects.filter(pk=user_key, owner_id=user.pk).exists()
+
+    def refresh(self, user_key):
+        record = self.get(user_key)
+        if record is None or not record.refresh_token:
+            raise TokenRefreshError("No refresh token stored for this user")
+        token_data = self.refresh_fn(record.refresh_token)
+        if "access_token" not in token_data:
+            raise TokenRefreshError(str(token_data.get("error", "Failed to refresh token")))
+        return self.save(user_key, token_data, touch=False)
+
+    def current_access_token(self, user_key):
+        """Latest access token for the user, refreshed inline if the scheduler fell behind."""
+        record = self.get(user_key)
+        if record is None:
+            return None
+        SpotifyToken.objects.filter(pk=user_key).update(last_used_at=time.time())
+        if record.expires_at <= time.time():
+            record = self.refresh(user_key)
+        return record.access_token
+
+    def evict(self):
+        """Drop records nobody can use any more, and token hashes that have expired."""
+        now = time.time()
+        SpotifyToken.objects.filter(owner__isnull=True, expires_at__lte=now).delete()
+        SpotifyToken.objects.filter(last_used_at__lt=now - self.idle_ttl).delete()
+        SpotifyAccessToken.objects.filter(expires_at__lte=now).delete()
+
+    def refresh_expiring(self):
+        self.evict()
+        now = time.time()
+        due = SpotifyToken.objects.filter(
+            owner__isnull=False, expires_at__lte=now + self.refresh_margin, refresh_claimed_until__lt=now,
+        ).values_list("pk", flat=True)
+
+        for user_key in list(due):
+            # Conditional update, so of several workers' schedulers only one refreshes each record
+            claimed = SpotifyToken.objects.filter(pk=user_key, refresh_claimed_until__lt=now).update(
+                refresh_claimed_until=now + self.interval,
+            )
+            if not claimed:
+                continue
+            try:
+                self.refresh(user_key)
+            except TokenRefreshError as e:
+                # A revoked refresh token will never work again; the user has to log in
+                logger.warning(f"Dropping Spotify tokens after failed refresh: {e}")
+                SpotifyToken.objects.filter(pk=user_key).delete()
+            except Exception as e:
+                logger.exception(f"Spotify token refresh error: {e}")
+
+    def start(self):
+        with self._lock:
+            if self._scheduler is not None and self._scheduler.is_alive():
+                return
+            self._stop.clear()
+            self._scheduler = threading.Thread(target=self._run, name="spotify-token-refresh", daemon=True)
+            self._scheduler.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh_expiring()
+            except Exception as e:
+                logger.exception(f"Spotify token scheduler error: {e}")
+            finally:
+                close_old_connections()
@@ -8,6 +8,8 @@ from rest_framework.response import Response
 from rest_framework import status
 import logging
 
+from .token_store import SpotifyTokenStore, TokenRefreshError, cache_profile, get_cached_profile
+
 # Load environment variables
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
@@ -16,8 +18,22 @@ SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", "http://localhost:8081/
 SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
 SPOTIFY_PROFILE_URL = "https://api.spotify.com/v1/me"
 
+SPOTIFY_PROFILE_CACHE_TTL = int(os.getenv("SPOTIFY_PROFILE_CACHE_TTL", "300"))
+SPOTIFY_REFRESH_MARGIN_SECONDS = int(os.getenv("SPOTIFY_REFRESH_MARGIN_SECONDS", "300"))
+SPOTIFY_REFRESH_INTERVAL_SECONDS = int(os.getenv("SPOTIFY_REFRESH_INTERVAL_SECONDS", "60"))
+SPOTIFY_API_TIMEOUT = float(os.getenv("SPOTIFY_API_TIMEOUT", "10"))
+# Stored tokens unused for this long are dropped instead of being refreshed forever
+SPOTIFY_TOKEN_IDLE_TTL_SECONDS = int(os.getenv("SPOTIFY_TOKEN_IDLE_TTL_SECONDS", str(7 * 86400)))
+
 logger = logging.getLogger(__name__)
 
+token_store = SpotifyTokenStore(
+    lambda refresh_token: refresh_access_token(refresh_token),
+    refresh_margin=SPOTIFY_REFRESH_MARGIN_SECONDS,
+    interval=SPOTIFY_REFRESH_INTERVAL_SECONDS,
+    idle_ttl=SPOTIFY_TOKEN_IDLE_TTL_SECONDS,
+)
+
 class SpotifyLogin(SocialLoginView):
     adapter_class = SpotifyOAuth2Adapter
 
@@ -67,11 +83,16 @@ def spotify_callback(request):
         "client_secret": SPOTIFY_CLIENT_SECRET,
     }
 
-    response = requests.post(SPOTIFY_TOKEN_URL, data=payload)
+    try:
+        response = requests.post(SPOTIFY_TOKEN_URL, data=payload, timeout=SPOTIFY_API_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        logger.exception(f"Spotify token exchange error: {e}")
+        return Response({"error": "Spotify service unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
     try:
         token_data = response.json()
         if response.status_code == 200:
+            remember_tokens(token_data, owner=request.user.pk if request.user.is_authenticated else None)
             return Response(token_data)  # Successfully authenticated
         else:
             return Response({"error": "Failed to exchange token", "details": token_data}, status=response.status_code)
@@ -80,6 +101,43 @@ def spotify_callback(request):
         return Response({"error": "Invalid response from Spotify"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def fetch_profile(access_token):
+    """
+    Fetch the Spotify profile for a token, serving repeats from the profile cache.
+    Returns (profile, response); response is None on a cache hit or success.
+    """
+    profile = get_cached_profile(access_token)
+    if profile is not None:
+        return profile, None
+
+    headers = {"Authorization": f"Bearer {access_token}"}
+    spotify_response = requests.get(SPOTIFY_PROFILE_URL, headers=headers, timeout=SPOTIFY_API_TIMEOUT)
+    if spotify_response.status_code != 200:
+        return None, spotify_response
+
+    profile = spotify_response.json()
+    cache_profile(access_token, profile, SPOTIFY_PROFILE_CACHE_TTL)
+    return profile, None
+
+
+def remember_tokens(token_data, owner=None):
+    """
+    Register freshly exchanged tokens. `owner` is the logged-in Django user's pk:
+    only owned tokens are refreshed before they expire, and only that user is
+    handed refreshed tokens later. Without a session the record just maps the
+    token to its Spotify user until it expires.
+    """
+    if not token_data.get("access_token") or not token_data.get("refresh_token"):
+        return
+    try:
+        profile, _ = fetch_profile(token_data["access_token"])
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not fetch Spotify profile for token store: {e}")
+        return
+    if profile and profile.get("id"):
+        token_store.save(profile["id"], token_data, owner=owner)
+
+
 @api_view(["GET"])
 def spotify_profile(request):
     token = request.headers.get("Authorization")
@@ -91,14 +149,34 @@ def spotify_profile(request):
     if not access_token:
         return Response({"error": "Invalid token format"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Use Spotify API to fetch the user's profile
-    headers = {"Authorization": f"Bearer {access_token}"}
-    spotify_response = requests.get(SPOTIFY_PROFILE_URL, headers=headers)
+    # Tokens we issued are refreshed in the background. Only the signed-in owner of the
+    # Spotify account is switched to (and handed) the newest one; anyone else just
+    # gets the profile for the token they presented.
+    current_token = access_token
+    user_key = token_store.find_user(access_token)
+    owner = user_key is not None and token_store.is_owner(user_key, request.user)
+    try:
+        if owner:
+            current_token = token_store.current_access_token(user_key) or access_token
+
+        profile_data, spotify_response = fetch_profile(current_token)
+        if spotify_response is not None and spotify_response.status_code == 401 and owner:
+            current_token = token_store.refresh(user_key).access_token
+            profile_data, spotify_response = fetch_profile(current_token)
+    except TokenRefreshError as e:
+        logger.warning(f"Spotify token refresh failed: {e}")
+        return Response({"error": "Spotify session expired, please log in again"}, status=status.HTTP_401_UNAUTHORIZED)
+    except requests.exceptions.RequestException as e:
+        logger.exception(f"Spotify profile request error: {e}")
+        return Response({"error": "Spotify service unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-    if spotify_response.status_code == 200:
-        profile_data = spotify_response.json()
+    if profile_data is not None:
         display_name = profile_data.get("display_name") or profile_data.get("id")  # Fallback to user ID
-        return Response({"display_name": display_name})
+        data = {"display_name": display_name}
+        if current_token != access_token:
+            # Hand the refreshed token back so the client can drop the stale one
+            data["access_token"] = current_token
+        return Response(data)
     elif spotify_response.status_code == 403:
         return Response({"error": "Access denied. Check Spotify developer settings."}, status=status.HTTP_403_FORBIDDEN)
     else:
@@ -119,7 +197,11 @@ def refresh_access_token(refresh_token):
         "client_secret": SPOTIFY_CLIENT_SECRET,
     }
 
-    response = requests.post(SPOTIFY_TOKEN_URL, data=payload, headers={"Content-Type": "application/x-www-form-urlencoded"})
+    # Bounded, so one hung call can't stall the scheduler's other refreshes; RequestException propagates
+    response = requests.post(
+        SPOTIFY_TOKEN_URL, data=payload,
+        headers={"Content-Type": "application/x-www-form-urlencoded"}, timeout=SPOTIFY_API_TIMEOUT,
+    )
 
     try:
         if response.status_code == 200: